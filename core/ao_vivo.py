@@ -0,0 +1,290 @@
+"""
+Eventos ao vivo para o navegador (server-sent events).
+
+Cada conexão é uma corrotina com a sua fila ``asyncio``: conexões ociosas
+não ocupam threads, apenas aguardam a fila. Os signals de Consulta e Agenda
+publicam as alterações após o commit, a partir das threads das views
+síncronas; ``publicar`` entrega o evento no loop de cada conexão com
+``call_soon_threadsafe``. A troca das dicas não passa pelo hub: como a dica
+é função pura do período (core/pet_tips.py), cada conexão a calcula.
+
+O hub é por processo. Com vários workers, cada conexão recebe as alterações
+feitas no worker em que está conectada; as dicas são as mesmas em todos.
+
+O envio contínuo exige um servidor ASGI (uvicorn, daphne). Sob WSGI a
+resposta traz apenas o início do fluxo (``inicio``) e o evento
+``encerrado``, que indica ao navegador para não reconectar e voltar ao modo
+sem push (lotes de dicas em static/js/pet-tips.js).
+
+Sob ASGI o fluxo é atendido por ``com_eventos_ao_vivo`` (ver
+pet_vet_project/asgi.py), antes do Django. O tratamento de requisições do
+Django mantém, enquanto a resposta não termina, a thread em que rodaram as
+partes síncronas (sessão, usuário, middlewares); com um fluxo sem fim seria
+uma thread por conexão. A rota autentica pela sessão em uma thread do pool
+padrão do loop, que é liberada em seguida, e a conexão fica só com a
+corrotina. Parâmetros inválidos e usuários não autenticados seguem para a
+view ``eventos_ao_vivo``, que responde o erro ou redireciona ao login.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from functools import lru_cache, partial
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpRequest, QueryDict
+from django.http.cookie import parse_cookie
+from django.urls import reverse
+
+from . import pet_tips
+from .models import Agenda, Consulta
+
+CANAIS = ('dicas', 'dashboard')
+
+_assinaturas = set()
+_trava = threading.Lock()
+_ids = itertools.count(1)
+
+
+def _config(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def parametros(get):
+    """Canais e espécie pedidos (QueryDict), ou None se nenhum canal é válido"""
+    canais = [canal for canal in get.get('canais', 'dicas').split(',') if canal in CANAIS]
+    if not canais:
+        return None
+    return canais, get.get('especie') or None
+
+
+def formatar_evento(tipo, dados, id_evento=None):
+    """Evento no formato text/event-stream"""
+    linhas = [f'id: {id_evento}'] if id_evento is not None else []
+    linhas += [f'event: {tipo}', f'data: {json.dumps(dados, cls=DjangoJSONEncoder)}']
+    return '\n'.join(linhas) + '\n\n'
+
+
+class Assinatura:
+    """Fila de eventos de uma conexão, ligada ao loop em que ela é atendida"""
+
+    def __init__(self, canais):
+        self.canais = frozenset(canais)
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=_config('SSE_FILA_MAXIMA', 100))
+
+    def entregar(self, evento):
+        # Executado no loop da conexão
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: a conexão é encerrada e, ao reconectar, o
+            # navegador recarrega os dados em vez de receber eventos velhos
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait(None)
+
+
+def assinar(canais):
+    assinatura = Assinatura(canais)
+    with _trava:
+        _assinaturas.add(assinatura)
+    return assinatura
+
+
+def cancelar(assinatura):
+    with _trava:
+        _assinaturas.discard(assinatura)
+
+
+def conexoes():
+    """Número de conexões abertas neste processo"""
+    return len(_assinaturas)
+
+
+def publicar(canal, tipo, dados):
+    """
+    Envia um evento às conexões inscritas no canal. Pode ser chamada de
+    qualquer thread; retorna o número de conexões alcançadas.
+    """
+    evento = formatar_evento(tipo, dados, next(_ids))
+    with _trava:
+        destinos = [assinatura for assinatura in _assinaturas if canal in assinatura.canais]
+    for assinatura in destinos:
+        try:
+            assinatura.loop.call_soon_threadsafe(assinatura.entregar, evento)
+        except RuntimeError:
+            # Loop já encerrado
+            cancelar(assinatura)
+    return len(destinos)
+
+
+def _evento_dica(periodo, especie):
+    dica = pet_tips.dica_do_periodo(periodo, especie)
+    return formatar_evento('dica', {
+        'tip': dica.texto,
+        'categoria': dica.categoria,
+        'fim': (periodo + 1) * pet_tips.intervalo(),
+    })
+
+
+def inicio(canais, especie=None, periodo=None):
+    """Início do fluxo: o tempo de reconexão e a dica atual (canal 'dicas')"""
+    partes = [f"retry: {_config('SSE_RECONEXAO_MS', 5000)}\n\n"]
+    if 'dicas' in canais:
+        partes.append(_evento_dica(pet_tips.periodo_atual() if periodo is None else periodo, especie))
+    return partes
+
+
+def encerrado(motivo):
+    """Evento final das respostas que não continuam (sem servidor ASGI)"""
+    return formatar_evento('encerrado', {'motivo': motivo})
+
+
+async def fluxo(canais, especie=None):
+    """Corpo da resposta: ``inicio`` e depois as dicas seguintes e os eventos publicados, até o cliente desconectar"""
+    periodo = pet_tips.periodo_atual()
+    for parte in inicio(canais, especie, periodo):
+        yield parte
+
+    keepalive = _config('SSE_KEEPALIVE', 15)
+    assinatura = assinar(canais)
+    ultimo_envio = time.monotonic()
+    try:
+        while True:
+            espera = keepalive - (time.monotonic() - ultimo_envio)
+            if 'dicas' in canais:
+                espera = min(espera, (periodo + 1) * pet_tips.intervalo() - time.time())
+            try:
+                evento = await asyncio.wait_for(assinatura.fila.get(), timeout=max(espera, 0))
+            except asyncio.TimeoutError:
+                evento = ''
+            if evento is None:
+                return
+
+            if 'dicas' in canais and pet_tips.periodo_atual() != periodo:
+                periodo = pet_tips.periodo_atual()
+                evento += _evento_dica(periodo, especie)
+            if not evento and time.monotonic() - ultimo_envio >= keepalive:
+                # Comentário: mantém a conexão aberta em proxies
+                evento = ': keepalive\n\n'
+            if evento:
+                ultimo_envio = time.monotonic()
+                yield evento
+    finally:
+        cancelar(assinatura)
+
+
+# --- Rota ASGI ---
+
+CABECALHOS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    # Desliga o buffer de proxies (nginx)
+    (b'x-accel-buffering', b'no'),
+]
+
+
+@lru_cache(maxsize=1)
+def _caminho():
+    return reverse('core:eventos_ao_vivo')
+
+
+def _usuario_da_sessao(chave_sessao):
+    """Usuário autenticado da sessão, ou None; roda fora do loop"""
+    try:
+        request = HttpRequest()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(chave_sessao)
+        usuario = get_user(request)
+        return usuario if usuario.is_authenticated else None
+    finally:
+        # A thread volta ao pool padrão do loop
+        connections.close_all()
+
+
+async def _transmitir(receive, send, canais, especie):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': CABECALHOS})
+    corpo = fluxo(canais, especie)
+
+    async def enviar():
+        async for parte in corpo:
+            await send({'type': 'http.response.body', 'body': parte.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def aguardar_desconexao():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tarefas = [asyncio.create_task(enviar()), asyncio.create_task(aguardar_desconexao())]
+    try:
+        await asyncio.wait(tarefas, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        await corpo.aclose()
+
+
+def com_eventos_ao_vivo(aplicacao):
+    """Envolve a aplicação ASGI do Django, atendendo antes dela o fluxo de eventos"""
+    async def rota(scope, receive, send):
+        caminho = scope.get('path', '')[len(scope.get('root_path', '')):]
+        if scope['type'] == 'http' and scope['method'] == 'GET' and caminho == _caminho():
+            pedidos = parametros(QueryDict(scope.get('query_string', b'').decode('latin-1')))
+            cookies = parse_cookie(b'; '.join(
+                valor for nome, valor in scope['headers'] if nome == b'cookie'
+            ).decode('latin-1'))
+            chave_sessao = cookies.get(settings.SESSION_COOKIE_NAME)
+            if pedidos and chave_sessao and await sync_to_async(
+                _usuario_da_sessao, thread_sensitive=False
+            )(chave_sessao):
+                return await _transmitir(receive, send, *pedidos)
+        return await aplicacao(scope, receive, send)
+    return rota
+
+
+MODELOS = {Consulta: 'consulta', Agenda: 'agenda'}
+
+
+def _dados(instance, acao, status_anterior=None):
+    return {
+        'modelo': MODELOS[type(instance)],
+        'acao': acao,
+        'id': instance.pk,
+        'status': instance.status,
+        'status_anterior': status_anterior,
+        'data_hora': instance.data_hora,
+        'veterinario': instance.veterinario,
+    }
+
+
+@receiver(post_save, sender=Consulta)
+@receiver(post_save, sender=Agenda)
+def publicar_alteracao(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not _assinaturas:
+        return
+    # Chave anterior guardada pelo pre_save de core/resumos.py
+    anterior = getattr(instance, '_chave_resumo_anterior', None)
+    if created:
+        dados = _dados(instance, 'criado')
+    elif anterior is not None and anterior['status'] != instance.status:
+        dados = _dados(instance, 'status', anterior['status'])
+    else:
+        dados = _dados(instance, 'alterado')
+    transaction.on_commit(partial(publicar, 'dashboard', 'dashboard', dados))
+
+
+@receiver(post_delete, sender=Consulta)
+@receiver(post_delete, sender=Agenda)
+def publicar_exclusao(sender, instance, **kwargs):
+    if _assinaturas:
+        transaction.on_commit(partial(publicar, 'dashboard', 'dashboard', _dados(instance, 'excluido')))
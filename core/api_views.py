@@ -1,57 +1,40 @@
+import time
+
+from django.conf import settings
 from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
 from django.views.decorators.http import require_GET
-from django.views.decorators.cache import cache_page
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from django.conf import settings
-from .pet_tips import get_random_pet_tip, DEFAULT_PET_TIPS
-import json
-import random
 
-@csrf_exempt
-@require_http_methods(["GET"])
-@cache_page(30)  # Cache de 30 segundos
+from .pet_tips import intervalo, proximas_dicas
+
+# Máximo de dicas por requisição
+PET_TIPS_LOTE_MAXIMO = 50
+
+
 @require_GET
 def pet_tip_api(request):
     """
-    API endpoint que retorna uma dica aleatória de cuidados com pets.
+    Dica do período atual e as seguintes, para o navegador alternar sozinho.
+
+    Parâmetros: ``quantidade`` (padrão ``PET_TIPS_LOTE``), ``especie`` e
+    ``categoria``. A resposta vale até o fim do período atual, quando o lote
+    passa a começar na dica seguinte.
     """
     try:
-        # Tenta obter uma dica usando a função principal
-        tip = get_random_pet_tip()
-        
-        # Garante que a dica não está vazia
-        if not tip or not tip.strip():
-            tip = random.choice(DEFAULT_PET_TIPS)
-            
-        # Adiciona headers para evitar cache do navegador
-        response = JsonResponse({'tip': tip})
-        response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response['Pragma'] = 'no-cache'
-        response['Expires'] = '0'
-        return response
-        
-    except Exception as e:
-        # Log do erro para debug
-        print(f"Erro na API de dicas: {str(e)}")
-        
-        # Retorna uma dica padrão em caso de erro
-        default_tips = [
-            "A escovação diária dos dentes do seu pet pode prevenir doenças periodontais graves.",
-            "A vacinação anual é essencial para prevenir doenças como raiva e cinomose.",
-            "Mantenha sempre água limpa e fresca disponível para o seu pet.",
-            "A obesidade em pets pode reduzir significativamente a expectativa de vida.",
-            "Consulte regularmente um médico veterinário para check-ups preventivos."
-        ]
-        
-        response = JsonResponse({
-            'tip': random.choice(default_tips),
-            'error': str(e)
-        }, status=500)
-        
-        # Headers para evitar cache em caso de erro
-        response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response['Pragma'] = 'no-cache'
-        response['Expires'] = '0'
-        
-        return response
+        quantidade = int(request.GET.get('quantidade', getattr(settings, 'PET_TIPS_LOTE', 12)))
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetro quantidade inválido'}, status=400)
+    quantidade = min(max(quantidade, 1), PET_TIPS_LOTE_MAXIMO)
+
+    dicas = proximas_dicas(quantidade, request.GET.get('especie') or None, request.GET.get('categoria') or None)
+    validade = dicas[0]['fim']
+    response = JsonResponse({
+        # ``tip`` mantém o formato anterior (apenas a dica atual)
+        'tip': dicas[0]['tip'],
+        'intervalo': intervalo(),
+        'dicas': dicas,
+    })
+    patch_cache_control(response, public=True, max_age=max(0, int(validade - time.time())))
+    response['Expires'] = http_date(validade)
+    return response
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Registra os signals que mantêm os resumos, o cache do dashboard, as
+        # versões dos fragmentos de template, os gatilhos da busca textual e
+        # os eventos ao vivo
+        from . import ao_vivo, busca, dashboard_cache, fragmentos, resumos  # noqa: F401
@@ -0,0 +1,310 @@
+"""
+Geração de dados sintéticos e medição do dashboard e das listagens.
+
+Usado pelos comandos ``python manage.py benchmark`` e ``plano_consultas``. Os dados são gerados de
+forma determinística a partir de uma semente, com quantidades proporcionais
+ao número de consultas, para que resultados de versões diferentes possam ser
+comparados.
+"""
+
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from .dashboard_cache import invalidar_dashboard
+from .dashboard_views import WIDGETS
+from .executor_testes import caches_de_teste
+from .models import Agenda, Consulta, Dono, Medicacao, Pet, Prescricao
+from .resumos import reconstruir_resumos
+from .timeseries import intervalo_do_dia
+
+# Quantidade de cada modelo por consulta gerada
+PROPORCOES = {
+    'donos': 1 / 20,
+    'pets': 1 / 8,
+    'agendamentos': 1 / 2,
+    'prescricoes': 1 / 4,
+}
+MEDICACOES = 50
+DIAS_HISTORICO = 730
+LOTE = 5000
+
+LISTAGENS = ['core:pet_list', 'core:consulta_list', 'core:agenda_list']
+
+MOTIVOS = ['Rotina', 'Vacinação', 'Vômito', 'Check-up', 'Dermatite', 'Retorno', 'Castração', 'Claudicação']
+RACAS = ['SRD', 'Labrador', 'Poodle', 'Siamês', 'Persa', 'Calopsita', 'Hamster', 'Jabuti']
+
+
+def cache_isolado():
+    """
+    Cache em memória no lugar do configurado (ver core/executor_testes.py):
+    resultados calculados sobre dados sintéticos não chegam ao L2 do servidor
+    """
+    return override_settings(CACHES=caches_de_teste(settings.CACHES, prefixo='benchmark'))
+
+
+@contextmanager
+def banco_temporario():
+    """Banco de teste novo e cache isolado durante o bloco; o banco e o cache reais não são tocados"""
+    setup_test_environment()
+    nome_original = connection.settings_dict['NAME']
+    with cache_isolado():
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+
+def quantidades(consultas):
+    """Número de registros de cada modelo para ``consultas`` consultas"""
+    totais = {nome: max(1, int(consultas * fator)) for nome, fator in PROPORCOES.items()}
+    totais['consultas'] = consultas
+    totais['medicacoes'] = MEDICACOES
+    return totais
+
+
+def _data_hora(rnd, referencia):
+    """Data e hora (horário comercial) até DIAS_HISTORICO dias antes da referência,
+    com 10% no futuro para alimentar agendas e consultas agendadas"""
+    dias = rnd.randint(-DIAS_HISTORICO // 10, DIAS_HISTORICO)
+    momento = datetime.combine(referencia - timedelta(days=dias), datetime.min.time())
+    momento += timedelta(hours=rnd.randint(8, 18), minutes=rnd.choice((0, 15, 30, 45)))
+    return timezone.make_aware(momento)
+
+
+def gerar_dados(consultas, semente=42, referencia=None):
+    """
+    Gera um conjunto sintético determinístico em um banco vazio.
+
+    Args:
+        consultas (int): número de consultas; os demais modelos são proporcionais
+        semente (int): semente do gerador pseudoaleatório
+        referencia (date): data de referência (padrão: hoje)
+
+    Returns:
+        dict: quantidade gerada de cada modelo
+    """
+    rnd = random.Random(semente)
+    referencia = referencia or timezone.localdate()
+    totais = quantidades(consultas)
+    veterinarios = [valor for valor, _ in Consulta.VETERINARIOS]
+    status_consulta = [valor for valor, _ in Consulta.STATUS]
+    especies = [valor for valor, _ in Pet.ESPECIES]
+
+    with transaction.atomic():
+        Dono.objects.bulk_create((
+            Dono(
+                nome=f'Dono {indice:07d}',
+                cpf=f'{indice:011d}',
+                telefone=f'11{rnd.randint(900000000, 999999999)}',
+                email=f'dono{indice}@exemplo.com',
+                endereco=f'Rua {rnd.randint(1, 500)}, {rnd.randint(1, 2000)}',
+            )
+            for indice in range(totais['donos'])
+        ), batch_size=LOTE)
+        dono_ids = list(Dono.objects.values_list('id', flat=True))
+
+        Pet.objects.bulk_create((
+            Pet(
+                nome=f'Pet {indice:07d}',
+                dono_id=rnd.choice(dono_ids),
+                especie=rnd.choice(especies),
+                raca=rnd.choice(RACAS),
+                sexo=rnd.choice('MF'),
+                data_nascimento=referencia - timedelta(days=rnd.randint(30, 365 * 15)),
+                peso=round(rnd.uniform(0.1, 45), 2),
+            )
+            for indice in range(totais['pets'])
+        ), batch_size=LOTE)
+        pet_ids = list(Pet.objects.values_list('id', flat=True))
+
+        Medicacao.objects.bulk_create(
+            Medicacao(nome=f'Medicação {indice:03d}', descricao='Gerada para benchmark')
+            for indice in range(totais['medicacoes'])
+        )
+        medicacao_ids = list(Medicacao.objects.values_list('id', flat=True))
+
+        Consulta.objects.bulk_create((
+            Consulta(
+                pet_id=rnd.choice(pet_ids),
+                veterinario=rnd.choice(veterinarios),
+                data_hora=_data_hora(rnd, referencia),
+                motivo=rnd.choice(MOTIVOS),
+                status=rnd.choice(status_consulta),
+            )
+            for _ in range(consultas)
+        ), batch_size=LOTE)
+
+        Agenda.objects.bulk_create((
+            Agenda(
+                pet_id=rnd.choice(pet_ids),
+                veterinario=rnd.choice(veterinarios),
+                tipo=rnd.choice(Agenda.TIPO)[0],
+                titulo=rnd.choice(MOTIVOS),
+                data_hora=_data_hora(rnd, referencia),
+                status=rnd.choice(Agenda.STATUS)[0],
+                concluido=rnd.random() < 0.3,
+            )
+            for _ in range(totais['agendamentos'])
+        ), batch_size=LOTE)
+
+        consulta_ids = list(Consulta.objects.order_by('id').values_list('id', flat=True))
+        Prescricao.objects.bulk_create((
+            Prescricao(
+                consulta_id=consulta_id,
+                medicacao_id=rnd.choice(medicacao_ids),
+                dosagem=f'{rnd.randint(1, 20)} mg',
+                frequencia=rnd.choice(Prescricao.FREQUENCIA)[0],
+                duracao=duracao,
+                data_inicio=referencia,
+                data_fim=referencia + timedelta(days=duracao),
+            )
+            for consulta_id, duracao in (
+                (rnd.choice(consulta_ids), rnd.randint(1, 30))
+                for _ in range(totais['prescricoes'])
+            )
+        ), batch_size=LOTE)
+
+    # bulk_create não dispara os signals que mantêm os resumos
+    reconstruir_resumos()
+    return totais
+
+
+def medir(client, url, params=None, repeticoes=3):
+    """
+    Mede uma URL sem o cache do dashboard.
+
+    Returns:
+        dict: status, número de consultas SQL e tempos (ms) de cada repetição
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        invalidar_dashboard()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            response = client.get(url, params or {})
+            tempos.append(round((time.perf_counter() - inicio) * 1000, 2))
+    return {
+        'status': response.status_code,
+        'consultas': len(consultas),
+        'tempos_ms': tempos,
+        'mediana_ms': round(statistics.median(tempos), 2),
+        'min_ms': min(tempos),
+    }
+
+
+def medir_alvos(repeticoes=3):
+    """Mede cada tipo do ``dashboard_api`` e as principais listagens"""
+    usuario, _ = User.objects.get_or_create(username='benchmark', defaults={'is_staff': True})
+    client = Client()
+    client.force_login(usuario)
+
+    resultados = {}
+    url_api = reverse('core:dashboard_api')
+    for tipo in WIDGETS:
+        resultados[f'dashboard_api:{tipo}'] = medir(client, url_api, {'type': tipo}, repeticoes)
+    resultados['dashboard_api:lote'] = medir(client, url_api, {'types': ','.join(WIDGETS)}, repeticoes)
+    for nome in LISTAGENS:
+        resultados[nome] = medir(client, reverse(nome), repeticoes=repeticoes)
+    return resultados
+
+
+def consultas_quentes():
+    """
+    Consultas frequentes das views e do dashboard, pelo nome ``view:consulta``.
+
+    Reproduzem os filtros e ordenações usados no código, para que o plano de
+    execução de cada uma justifique os índices declarados nos modelos.
+    """
+    agora = timezone.now()
+    inicio, fim = intervalo_do_dia(timezone.localdate())
+    pet_id = Pet.objects.order_by('id').values_list('id', flat=True).first()
+    veterinario = Consulta.VETERINARIOS[0][0]
+    return {
+        'index:proximas_consultas': Consulta.objects.filter(
+            data_hora__gte=agora, status__in=['AGENDADA', 'CONFIRMADA']).order_by('data_hora')[:5],
+        'index:proximos_agendamentos': Agenda.objects.filter(
+            data_hora__gte=agora, concluido=False).order_by('data_hora')[:5],
+        'dashboard:consultas_hoje': Consulta.objects.filter(
+            data_hora__gte=inicio, data_hora__lt=fim).order_by('data_hora'),
+        'dashboard:agendamentos_hoje': Agenda.objects.filter(
+            data_hora__gte=inicio, data_hora__lt=fim, concluido=False).order_by('data_hora'),
+        'dashboard_home:agendamentos_pendentes': Agenda.objects.filter(
+            status='PENDENTE', data_hora__gte=agora).values('id'),
+        'consulta_list:agendamentos_confirmados': Agenda.objects.filter(
+            status='CONFIRMADO').order_by('-data_hora', '-id').values('id', 'data_hora')[:7],
+        'pet_detail:consultas': Consulta.objects.filter(pet_id=pet_id).order_by('-data_hora')[:5],
+        'pet_detail:agendamentos': Agenda.objects.filter(pet_id=pet_id).order_by('-data_hora')[:5],
+        'estatisticas:por_veterinario': Consulta.objects.values('veterinario').annotate(
+            total=Count('id')).order_by(),
+        'estatisticas:veterinario_realizadas': Consulta.objects.filter(
+            veterinario=veterinario, status='REALIZADA').values('id').order_by(),
+        'saude:especies': Pet.objects.values('especie').annotate(total=Count('id')).order_by('-total'),
+        'saude:racas': Pet.objects.values('raca').annotate(
+            total=Count('id')).exclude(raca='').order_by('-total')[:10],
+    }
+
+
+def indices_declarados():
+    """Pares (modelo, índice) de todos os ``Meta.indexes`` do app core"""
+    return [(modelo, indice) for modelo in apps.get_app_config('core').get_models()
+            for indice in modelo._meta.indexes]
+
+
+def medir_consulta(queryset, repeticoes=5):
+    """Plano de execução (EXPLAIN QUERY PLAN no SQLite) e tempos de uma consulta"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        list(queryset.all())
+        tempos.append(round((time.perf_counter() - inicio) * 1000, 3))
+    return {
+        'plano': queryset.explain().splitlines(),
+        'mediana_ms': round(statistics.median(tempos), 3),
+    }
+
+
+def comparar_indices(repeticoes=5):
+    """
+    Mede as consultas quentes com e sem os índices declarados nos modelos.
+
+    Os índices são removidos e recriados no banco atual (use um banco de
+    teste), de modo que o antes/depois sai da mesma execução e dos mesmos
+    dados.
+
+    Returns:
+        dict: {nome: {'com_indices': {...}, 'sem_indices': {...}}}
+    """
+    consultas = consultas_quentes()
+    resultados = {nome: {'com_indices': medir_consulta(queryset, repeticoes)}
+                  for nome, queryset in consultas.items()}
+
+    indices = indices_declarados()
+    with connection.schema_editor() as editor:
+        for modelo, indice in indices:
+            editor.remove_index(modelo, indice)
+    try:
+        for nome, queryset in consultas.items():
+            resultados[nome]['sem_indices'] = medir_consulta(queryset, repeticoes)
+    finally:
+        with connection.schema_editor() as editor:
+            for modelo, indice in indices:
+                editor.add_index(modelo, indice)
+    return resultados
+
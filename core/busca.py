@@ -0,0 +1,372 @@
+"""
+Busca textual com índices FTS5 do SQLite.
+
+Tabelas virtuais espelham os campos de texto pesquisados nas listagens e são
+mantidas por gatilhos no banco, de modo que ``bulk_create``, ``update()`` e
+alterações feitas fora do Django também são indexadas. O tokenizador
+``unicode61 remove_diacritics 2`` torna a busca insensível a acentos
+("vacinacao" encontra "Vacinação") e os índices de prefixo atendem a
+buscas por início de palavra.
+
+Em outros bancos, ou antes da migração que cria as tabelas, as funções
+deste módulo recorrem a ``icontains``.
+
+``sugestoes`` atende a busca rápida da barra de navegação.
+"""
+
+import re
+import time
+import unicodedata
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_migrate, pre_migrate
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+
+from .dashboard_cache import geracao_atual
+from .models import Agenda, Dono, Pet
+
+TOKENIZADOR = "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'"
+
+# Tabelas com conteúdo externo: o FTS lê o texto da própria tabela do modelo
+CONTEUDO_EXTERNO = {
+    'busca_consulta': ('core_consulta', ['motivo', 'diagnostico']),
+    'busca_agenda': ('core_agenda', ['titulo', 'descricao']),
+    'busca_medicacao': ('core_medicacao', ['nome', 'descricao']),
+}
+
+
+def _so_digitos(coluna):
+    """Expressão SQL que remove a pontuação usual de CPF e telefone"""
+    for caractere in '.-()/+ ':
+        coluna = f"replace({coluna}, '{caractere}', '')"
+    return coluna
+
+
+def _sql_tabelas():
+    comandos = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{', '.join(colunas)}, content='{tabela}', content_rowid='id', {TOKENIZADOR})"
+        for fts, (tabela, colunas) in CONTEUDO_EXTERNO.items()
+    ]
+    comandos += [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS busca_pet USING fts5(nome, dono, especie, raca, {TOKENIZADOR})",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS busca_dono USING fts5(nome, cpf, email, digitos, {TOKENIZADOR})",
+    ]
+    return comandos
+
+
+def _sql_gatilhos():
+    comandos = []
+    for fts, (tabela, colunas) in CONTEUDO_EXTERNO.items():
+        lista = ', '.join(colunas)
+        novos = ', '.join(f'new.{coluna}' for coluna in colunas)
+        antigos = ', '.join(f'old.{coluna}' for coluna in colunas)
+        inserir = f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos});"
+        remover = f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos});"
+        comandos += [
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN {inserir} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN {remover} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tabela} BEGIN {remover} {inserir} END",
+        ]
+
+    inserir_pet = (
+        "INSERT INTO busca_pet(rowid, nome, dono, especie, raca) "
+        "SELECT new.id, new.nome, d.nome, new.especie, new.raca FROM core_dono d WHERE d.id = new.dono_id;"
+    )
+    inserir_dono = (
+        "INSERT INTO busca_dono(rowid, nome, cpf, email, digitos) VALUES (new.id, new.nome, new.cpf, new.email, "
+        f"{_so_digitos('new.cpf')} || ' ' || {_so_digitos('new.telefone')});"
+    )
+    comandos += [
+        f"CREATE TRIGGER IF NOT EXISTS busca_pet_ai AFTER INSERT ON core_pet BEGIN {inserir_pet} END",
+        "CREATE TRIGGER IF NOT EXISTS busca_pet_ad AFTER DELETE ON core_pet "
+        "BEGIN DELETE FROM busca_pet WHERE rowid = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS busca_pet_au AFTER UPDATE ON core_pet "
+        f"BEGIN DELETE FROM busca_pet WHERE rowid = old.id; {inserir_pet} END",
+        f"CREATE TRIGGER IF NOT EXISTS busca_dono_ai AFTER INSERT ON core_dono BEGIN {inserir_dono} END",
+        "CREATE TRIGGER IF NOT EXISTS busca_dono_ad AFTER DELETE ON core_dono "
+        "BEGIN DELETE FROM busca_dono WHERE rowid = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS busca_dono_au AFTER UPDATE ON core_dono "
+        f"BEGIN DELETE FROM busca_dono WHERE rowid = old.id; {inserir_dono} "
+        "UPDATE busca_pet SET dono = new.nome WHERE rowid IN (SELECT id FROM core_pet WHERE dono_id = new.id); END",
+    ]
+    return comandos
+
+
+def _sql_reconstruir():
+    comandos = [f"INSERT INTO {fts}({fts}) VALUES ('rebuild')" for fts in CONTEUDO_EXTERNO]
+    comandos += [
+        "DELETE FROM busca_pet",
+        "INSERT INTO busca_pet(rowid, nome, dono, especie, raca) "
+        "SELECT p.id, p.nome, d.nome, p.especie, p.raca FROM core_pet p JOIN core_dono d ON d.id = p.dono_id",
+        "DELETE FROM busca_dono",
+        "INSERT INTO busca_dono(rowid, nome, cpf, email, digitos) "
+        f"SELECT id, nome, cpf, email, {_so_digitos('cpf')} || ' ' || {_so_digitos('telefone')} FROM core_dono",
+    ]
+    return comandos
+
+
+def _executar(connection, comandos):
+    with connection.cursor() as cursor:
+        for comando in comandos:
+            cursor.execute(comando)
+
+
+def instalar_busca(connection, gatilhos=True, reconstruir=False):
+    """Cria (se preciso) as tabelas FTS e os gatilhos; opcionalmente reindexa tudo"""
+    if connection.vendor != 'sqlite':
+        return
+    _executar(connection, _sql_tabelas())
+    if gatilhos:
+        _executar(connection, _sql_gatilhos())
+    if reconstruir:
+        _executar(connection, _sql_reconstruir())
+
+
+def remover_gatilhos(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'busca\\_%' ESCAPE '\\'"
+        )
+        gatilhos = [nome for (nome,) in cursor.fetchall()]
+    _executar(connection, [f'DROP TRIGGER IF EXISTS {nome}' for nome in gatilhos])
+
+
+_bancos_com_fts = set()
+
+
+def fts_disponivel(using='default'):
+    """Indica se o banco tem as tabelas de busca (criadas pela migração 0012)"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    chave = (using, connection.settings_dict['NAME'])
+    if chave not in _bancos_com_fts:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'busca_pet'")
+            if cursor.fetchone() is None:
+                return False
+        _bancos_com_fts.add(chave)
+    return True
+
+
+def expressao_fts(termo, colunas=None, digitos=False):
+    """
+    Converte o texto digitado em uma consulta FTS5.
+
+    Cada palavra vira um prefixo (``"vac"*``) e todas precisam estar
+    presentes. Com ``digitos``, um termo com ao menos 3 números também é
+    procurado, sem pontuação, na coluna ``digitos`` (CPF e telefone).
+    Retorna None quando não há palavras.
+    """
+    palavras = re.findall(r'\w+', termo)
+    if not palavras:
+        return None
+    expressao = ' AND '.join(f'"{palavra}"*' for palavra in palavras)
+    if colunas:
+        expressao = f"{{{' '.join(colunas)}}} : ({expressao})"
+    numeros = re.sub(r'\D', '', termo)
+    if digitos and len(numeros) >= 3:
+        expressao = f'({expressao}) OR digitos : "{numeros}"*'
+    return expressao
+
+
+def _ids(tabela, expressao):
+    return RawSQL(f'SELECT rowid FROM {tabela} WHERE {tabela} MATCH %s', [expressao])
+
+
+def filtro_busca(tabela, termo, campos, campo_id='pk', colunas=None, digitos=False):
+    """
+    Condição (Q) dos registros cujo texto corresponde ao termo.
+
+    Args:
+        tabela (str): tabela FTS (ex: 'busca_pet')
+        termo (str): texto digitado pelo usuário
+        campos (list): campos usados no ``icontains`` quando não há FTS
+        campo_id (str): campo comparado ao rowid da tabela FTS (ex: 'pet_id')
+        colunas (list): restringe a busca a estas colunas da tabela FTS
+        digitos (bool): procura também os números do termo em ``digitos``
+    """
+    if not fts_disponivel():
+        filtro = Q()
+        for campo in campos:
+            filtro |= Q(**{f'{campo}__icontains': termo})
+        return filtro
+    expressao = expressao_fts(termo, colunas, digitos)
+    if expressao is None:
+        return Q(**{f'{campo_id}__in': []})
+    return Q(**{f'{campo_id}__in': _ids(tabela, expressao)})
+
+
+def buscar(queryset, tabela, termo, campos, digitos=False):
+    """
+    Filtra o queryset pelo termo e anota ``relevancia`` (BM25: menor é melhor).
+
+    Com FTS, a tabela de busca entra na própria consulta (junção pelo rowid):
+    o MATCH roda uma única vez e filtra e pontua as linhas ao mesmo tempo.
+    Sem FTS, a relevância é 0 para todos e a ordem fica a cargo dos demais
+    campos de ordenação.
+    """
+    expressao = expressao_fts(termo, digitos=digitos) if fts_disponivel() else None
+    if expressao is None:
+        return queryset.filter(filtro_busca(tabela, termo, campos, digitos=digitos)).annotate(
+            relevancia=Value(0.0, output_field=FloatField())
+        )
+    tabela_modelo = queryset.model._meta.db_table
+    return queryset.extra(
+        tables=[tabela],
+        where=[f'{tabela}.rowid = "{tabela_modelo}"."id"', f'{tabela} MATCH %s'],
+        params=[expressao],
+    ).annotate(relevancia=RawSQL(f'bm25({tabela})', [], output_field=FloatField()))
+
+
+# Migrações que alteram colunas no SQLite recriam a tabela inteira (cópia,
+# DROP e RENAME), o que falha enquanto houver gatilhos que citam a tabela
+# removida. Por isso os gatilhos saem antes de ``migrate`` e voltam ao final.
+# Como o ``migrate`` pode criar ou remover as tabelas FTS (0012), a presença
+# delas é verificada de novo ao final.
+# A recriação preserva ids e textos, então o conteúdo indexado continua
+# válido e não é reconstruído aqui: a indexação completa é feita pela
+# migração que cria as tabelas (0012) e pelo comando ``reconstruir_busca``,
+# a ser usado após migrações de dados que alterem os textos indexados.
+
+@receiver(pre_migrate)
+def remover_gatilhos_antes_de_migrar(sender, using=DEFAULT_DB_ALIAS, plan=None, **kwargs):
+    if sender.name != 'core':
+        return
+    if plan and fts_disponivel(using):
+        remover_gatilhos(connections[using])
+    _bancos_com_fts.discard((using, connections[using].settings_dict['NAME']))
+
+
+@receiver(post_migrate)
+def recriar_gatilhos(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.name == 'core' and fts_disponivel(using):
+        instalar_busca(connections[using])
+
+
+# --- Busca rápida (typeahead) ---
+
+# Termos mais curtos que isso não consultam o banco (o menor índice de prefixo tem 2)
+SUGESTOES_MINIMO = 2
+
+
+def _normalizar(termo):
+    """Forma canônica do termo para a chave de cache: sem acentos, minúsculo"""
+    termo = unicodedata.normalize('NFKD', ' '.join(termo.split()).lower())
+    return ''.join(caractere for caractere in termo if not unicodedata.combining(caractere))
+
+
+@contextmanager
+def _prazo(limite, using=DEFAULT_DB_ALIAS):
+    """
+    Interrompe a consulta SQLite em andamento quando ``limite``
+    (``time.monotonic()``) é ultrapassado; ela falha com OperationalError.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    connection.ensure_connection()
+    connection.connection.set_progress_handler(lambda: time.monotonic() > limite, 1000)
+    try:
+        yield
+    finally:
+        connection.connection.set_progress_handler(None, 0)
+
+
+def _sugestoes_donos(termo, limite):
+    donos = buscar(Dono.objects.all(), 'busca_dono', termo, ['nome', 'cpf', 'telefone', 'email'], digitos=True)
+    return [{
+        'tipo': 'dono',
+        'id': dono['id'],
+        'titulo': dono['nome'],
+        'detalhe': f"CPF {dono['cpf']} · {dono['telefone']}",
+        'url': reverse('core:dono_detail', args=[dono['id']]),
+    } for dono in donos.order_by('relevancia', 'nome', 'id').values('id', 'nome', 'cpf', 'telefone')[:limite]]
+
+
+def _sugestoes_pets(termo, limite):
+    especies = dict(Pet.ESPECIES)
+    pets = buscar(Pet.objects.all(), 'busca_pet', termo, ['nome', 'dono__nome'])
+    return [{
+        'tipo': 'pet',
+        'id': pet['id'],
+        'titulo': pet['nome'],
+        'detalhe': f"{especies.get(pet['especie'], pet['especie'])} · {pet['dono__nome']}",
+        'url': reverse('core:pet_detail', args=[pet['id']]),
+    } for pet in pets.order_by('relevancia', 'nome', 'id').values('id', 'nome', 'especie', 'dono__nome')[:limite]]
+
+
+def _sugestoes_agendamentos(termo, limite):
+    agendamentos = Agenda.objects.filter(data_hora__gte=timezone.now(), concluido=False).filter(
+        filtro_busca('busca_agenda', termo, ['titulo']) |
+        filtro_busca('busca_pet', termo, ['pet__nome'], campo_id='pet_id', colunas=['nome'])
+    )
+    return [{
+        'tipo': 'agendamento',
+        'id': agenda['id'],
+        'titulo': agenda['titulo'],
+        'detalhe': f"{timezone.localtime(agenda['data_hora']):%d/%m %H:%M} · {agenda['pet__nome']}",
+        'url': reverse('core:agenda_detail', args=[agenda['id']]),
+    } for agenda in agendamentos.order_by('data_hora', 'id').values('id', 'titulo', 'data_hora', 'pet__nome')[:limite]]
+
+
+# Grupos na ordem em que aparecem (e são consultados)
+GRUPOS_SUGESTOES = (
+    _sugestoes_donos,
+    _sugestoes_pets,
+    _sugestoes_agendamentos,
+)
+
+
+def sugestoes(termo, limite=5):
+    """
+    Donos, pets e próximos agendamentos que correspondem ao termo.
+
+    Cada grupo traz no máximo ``limite`` itens. A resposta respeita o prazo
+    BUSCA_RAPIDA_ORCAMENTO_MS: ao estourá-lo os grupos restantes são
+    omitidos e ``completo`` vem False (e o resultado não vai para o cache).
+    Resultados completos ficam em cache por termo normalizado, na mesma
+    geração usada pelo dashboard, que muda a cada alteração de Dono, Pet,
+    Consulta ou Agenda.
+
+    Returns:
+        dict: {'termo', 'resultados': [{'tipo', 'id', 'titulo', 'detalhe', 'url'}], 'completo'}
+    """
+    termo = ' '.join(termo.split())
+    if len(termo) < SUGESTOES_MINIMO:
+        return {'termo': termo, 'resultados': [], 'completo': True}
+
+    chave = f'busca:{geracao_atual()}:{limite}:{_normalizar(termo)}'
+    resposta = cache.get(chave)
+    if resposta is not None:
+        return {**resposta, 'termo': termo}
+
+    limite_tempo = time.monotonic() + getattr(settings, 'BUSCA_RAPIDA_ORCAMENTO_MS', 150) / 1000
+    resultados, completo = [], True
+    with _prazo(limite_tempo):
+        for grupo in GRUPOS_SUGESTOES:
+            if time.monotonic() > limite_tempo:
+                completo = False
+                break
+            try:
+                resultados += grupo(termo, limite)
+            except OperationalError:
+                # Consulta interrompida pelo prazo
+                completo = False
+                break
+
+    resposta = {'termo': termo, 'resultados': resultados, 'completo': completo}
+    if completo:
+        cache.set(chave, resposta, getattr(settings, 'BUSCA_RAPIDA_CACHE_TIMEOUT', 30))
+    return resposta
@@ -0,0 +1,395 @@
+"""
+Backends de cache compartilhados entre os processos do servidor.
+
+``CacheEmCamadas`` combina um L1 em memória (LRU limitado, por processo) com
+um L2 compartilhado por todos os workers, que é outro alias de
+``settings.CACHES``: ``CacheSQLite`` (um arquivo SQLite, funciona sem
+serviços externos) ou um memcached. Leituras consultam o L1 e, na falta, o
+L2; escritas vão para os dois.
+
+Como o L1 de um processo não vê as escritas dos outros, cada entrada fica
+nele por no máximo ``L1_TIMEOUT`` segundos. Contadores que precisam estar
+sempre atualizados (geração do dashboard, versões dos fragmentos) são
+configurados com ``l1_timeout`` 0 e vão direto ao L2; ``incr``/``decr``
+sempre vão ao L2.
+
+Exemplo::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.CacheEmCamadas',
+            'LOCATION': 'petvet',
+            'OPTIONS': {
+                'L2': 'compartilhado',
+                'L1_MAX_ENTRADAS': 1000,
+                'L1_TIMEOUT': 5,
+                'NAMESPACES': {
+                    'dashboard:geracao': {'l1_timeout': 0},
+                    'busca:': {'timeout': 30},
+                },
+            },
+        },
+        'compartilhado': {
+            'BACKEND': 'core.cache_backends.CacheSQLite',
+            'LOCATION': '/var/tmp/petvet-cache.sqlite3',
+        },
+    }
+
+Em ``NAMESPACES`` a chave é um prefixo das chaves do cache (vale o prefixo
+mais longo); ``timeout`` é usado quando a chamada não informa um e
+``l1_timeout`` substitui o ``L1_TIMEOUT``.
+"""
+
+import itertools
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Namespace das estatísticas para chaves fora de NAMESPACES
+OUTROS = 'outros'
+
+
+class _L1:
+    """LRU em memória compartilhado pelas threads de um processo"""
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()
+        self.lock = threading.Lock()
+        self.estatisticas = {}
+
+    def get(self, chave):
+        with self.lock:
+            entrada = self.entradas.get(chave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira <= time.monotonic():
+                del self.entradas[chave]
+                return None
+            self.entradas.move_to_end(chave)
+        return pickle.loads(valor)
+
+    def set(self, chave, valor, ttl):
+        if ttl <= 0:
+            self.delete(chave)
+            return
+        dados = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entradas[chave] = (dados, time.monotonic() + ttl)
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.max_entradas:
+                self.entradas.popitem(last=False)
+
+    def delete(self, chave):
+        with self.lock:
+            self.entradas.pop(chave, None)
+
+    def clear(self):
+        with self.lock:
+            self.entradas.clear()
+
+    def contar(self, namespace, campo, quantidade=1):
+        with self.lock:
+            contadores = self.estatisticas.setdefault(namespace, {'l1': 0, 'l2': 0, 'falhas': 0})
+            contadores[campo] += quantidade
+
+
+# Um L1 por LOCATION e por processo (``caches`` cria uma instância do
+# backend por thread, como no LocMemCache)
+_l1s = {}
+_l1s_lock = threading.Lock()
+
+
+class CacheEmCamadas(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        opcoes = params.get('OPTIONS', {})
+        self._alias_l2 = opcoes.get('L2', 'compartilhado')
+        self._l1_timeout = opcoes.get('L1_TIMEOUT', 5)
+        # Prefixos do mais longo para o mais curto
+        self._namespaces = sorted(opcoes.get('NAMESPACES', {}).items(), key=lambda item: -len(item[0]))
+        with _l1s_lock:
+            self._l1 = _l1s.setdefault(location, _L1(opcoes.get('L1_MAX_ENTRADAS', 1000)))
+
+    @property
+    def l2(self):
+        return caches[self._alias_l2]
+
+    def _namespace(self, key):
+        for prefixo, config in self._namespaces:
+            if key.startswith(prefixo):
+                return prefixo, config
+        return OUTROS, {}
+
+    def _timeout(self, key, timeout):
+        """Timeout efetivo no L2 e tempo de vida no L1"""
+        namespace, config = self._namespace(key)
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = config.get('timeout', self.l2.default_timeout)
+        ttl = config.get('l1_timeout', self._l1_timeout)
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        return timeout, ttl, namespace
+
+    def get(self, key, default=None, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        namespace, config = self._namespace(key)
+        usa_l1 = config.get('l1_timeout', self._l1_timeout) > 0
+        if usa_l1:
+            valor = self._l1.get(chave)
+            if valor is not None:
+                self._l1.contar(namespace, 'l1')
+                return valor
+
+        sentinela = object()
+        valor = self.l2.get(key, sentinela, version=version)
+        if valor is sentinela:
+            self._l1.contar(namespace, 'falhas')
+            return default
+        self._l1.contar(namespace, 'l2')
+        if usa_l1:
+            self._l1.set(chave, valor, config.get('l1_timeout', self._l1_timeout))
+        return valor
+
+    def get_many(self, keys, version=None):
+        resultado = {}
+        faltando = []
+        for key in keys:
+            chave = self.make_and_validate_key(key, version=version)
+            namespace, config = self._namespace(key)
+            valor = self._l1.get(chave) if config.get('l1_timeout', self._l1_timeout) > 0 else None
+            if valor is None:
+                faltando.append(key)
+            else:
+                self._l1.contar(namespace, 'l1')
+                resultado[key] = valor
+        if faltando:
+            do_l2 = self.l2.get_many(faltando, version=version)
+            for key in faltando:
+                namespace, config = self._namespace(key)
+                if key not in do_l2:
+                    self._l1.contar(namespace, 'falhas')
+                    continue
+                self._l1.contar(namespace, 'l2')
+                resultado[key] = do_l2[key]
+                self._l1.set(self.make_and_validate_key(key, version=version), do_l2[key],
+                             config.get('l1_timeout', self._l1_timeout))
+        return resultado
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        timeout, ttl, _ = self._timeout(key, timeout)
+        self.l2.set(key, value, timeout, version=version)
+        self._l1.set(chave, value, ttl)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        timeout, ttl, _ = self._timeout(key, timeout)
+        if not self.l2.add(key, value, timeout, version=version):
+            return False
+        self._l1.set(chave, value, ttl)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout, _, _ = self._timeout(key, timeout)
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._l1.delete(self.make_and_validate_key(key, version=version))
+        self.l2.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        return self._l1.get(chave) is not None or self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Sempre no L2, que é atômico; a cópia local deixa de valer
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        self._l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def estatisticas(self):
+        """Acertos no L1 e no L2 e falhas por namespace (deste processo)"""
+        with self._l1.lock:
+            namespaces = {nome: dict(contadores) for nome, contadores in self._l1.estatisticas.items()}
+            entradas = len(self._l1.entradas)
+        for contadores in namespaces.values():
+            total = sum(contadores.values())
+            contadores['taxa_acerto'] = round((contadores['l1'] + contadores['l2']) / total * 100, 1) if total else 0
+        return {
+            'l1': {'entradas': entradas, 'max_entradas': self._l1.max_entradas, 'timeout': self._l1_timeout},
+            'l2': type(self.l2).__name__,
+            'namespaces': namespaces,
+        }
+
+    def zerar_estatisticas(self):
+        with self._l1.lock:
+            self._l1.estatisticas.clear()
+
+
+class CacheSQLite(BaseCache):
+    """
+    Cache em um arquivo SQLite (modo WAL), compartilhado pelos processos.
+
+    Inteiros são gravados como INTEGER, o que torna ``incr`` um único UPDATE
+    atômico; os demais valores são serializados com pickle.
+    """
+
+    # Linhas lidas por comando em get_many (limite de parâmetros do SQLite)
+    LOTE = 500
+    # Escritas entre duas limpezas de entradas expiradas/excedentes
+    ESCRITAS_POR_LIMPEZA = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._arquivo = str(location)
+        self._local = threading.local()
+        # next() em itertools.count é atômico: o backend é usado por várias threads
+        self._escritas = itertools.count(1)
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self._arquivo, timeout=5, isolation_level=None)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            conexao.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'chave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira REAL) WITHOUT ROWID'
+            )
+            conexao.execute('CREATE INDEX IF NOT EXISTS cache_expira ON cache (expira)')
+            self._local.conexao = conexao
+        return conexao
+
+    def _expira(self, timeout):
+        # Instante absoluto (time.time()) ou None para nunca expirar
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _serializar(valor):
+        if type(valor) is int:
+            return valor
+        return pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _desserializar(valor):
+        return valor if isinstance(valor, int) else pickle.loads(valor)
+
+    def _escreveu(self):
+        if next(self._escritas) % self.ESCRITAS_POR_LIMPEZA == 0:
+            self._limpar()
+
+    def _limpar(self):
+        conexao = self._conexao()
+        conexao.execute('DELETE FROM cache WHERE expira <= ?', [time.time()])
+        (total,) = conexao.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if total > self._max_entries:
+            excedente = total - self._max_entries + self._max_entries // self._cull_frequency
+            conexao.execute(
+                'DELETE FROM cache WHERE chave IN ('
+                'SELECT chave FROM cache ORDER BY expira IS NULL, expira LIMIT ?)', [excedente]
+            )
+
+    def get(self, key, default=None, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        linha = self._conexao().execute(
+            'SELECT valor FROM cache WHERE chave = ? AND (expira IS NULL OR expira > ?)', [chave, time.time()]
+        ).fetchone()
+        return default if linha is None else self._desserializar(linha[0])
+
+    def get_many(self, keys, version=None):
+        chaves = {self.make_and_validate_key(key, version=version): key for key in keys}
+        resultado = {}
+        lista = list(chaves)
+        for inicio in range(0, len(lista), self.LOTE):
+            lote = lista[inicio:inicio + self.LOTE]
+            linhas = self._conexao().execute(
+                f"SELECT chave, valor FROM cache WHERE chave IN ({', '.join('?' * len(lote))}) "
+                'AND (expira IS NULL OR expira > ?)', [*lote, time.time()]
+            )
+            for chave, valor in linhas:
+                resultado[chaves[chave]] = self._desserializar(valor)
+        return resultado
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        self._conexao().execute(
+            'INSERT OR REPLACE INTO cache (chave, valor, expira) VALUES (?, ?, ?)',
+            [chave, self._serializar(value), self._expira(timeout)],
+        )
+        self._escreveu()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        # Insere, ou substitui apenas uma entrada já expirada
+        cursor = self._conexao().execute(
+            'INSERT INTO cache (chave, valor, expira) VALUES (?, ?, ?) '
+            'ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor, expira = excluded.expira '
+            'WHERE cache.expira <= ?',
+            [chave, self._serializar(value), self._expira(timeout), time.time()],
+        )
+        self._escreveu()
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        cursor = self._conexao().execute(
+            'UPDATE cache SET expira = ? WHERE chave = ? AND (expira IS NULL OR expira > ?)',
+            [self._expira(timeout), chave, time.time()],
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        return self._conexao().execute('DELETE FROM cache WHERE chave = ?', [chave]).rowcount > 0
+
+    def has_key(self, key, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        return self._conexao().execute(
+            'SELECT 1 FROM cache WHERE chave = ? AND (expira IS NULL OR expira > ?)', [chave, time.time()]
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        linhas = self._conexao().execute(
+            'UPDATE cache SET valor = valor + ? '
+            "WHERE chave = ? AND (expira IS NULL OR expira > ?) AND typeof(valor) = 'integer' "
+            'RETURNING valor',
+            [delta, chave, time.time()],
+        ).fetchall()
+        # fetchall() conclui o comando e libera a trava de escrita
+        if not linhas:
+            raise ValueError(f"Key '{key}' not found")
+        return linhas[0][0]
+
+    def clear(self):
+        self._conexao().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # A conexão da thread é mantida entre requisições
+        pass
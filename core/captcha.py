@@ -0,0 +1,134 @@
+"""
+Captchas de imagem do login, pré-gerados.
+
+Gerar um captcha (desenho, ruído e codificação PNG) leva milissegundos de
+CPU; em vez de fazê-lo a cada requisição, um estoque de captchas prontos é
+mantido em memória e ``obter`` apenas retira o próximo. Uma thread por
+processo repõe o estoque em segundo plano, até CAPTCHA_POOL_TAMANHO,
+gerando no máximo CAPTCHA_POOL_REPOSICAO captchas por segundo. Com o
+estoque vazio (pico de acessos) o captcha é gerado na própria requisição.
+
+Cada captcha sai do estoque uma única vez. A fonte é carregada uma vez por
+processo e o ruído é gerado com NumPy, sobre os pixels da imagem.
+"""
+
+import base64
+import io
+import os
+import secrets
+import string
+import threading
+import time
+from collections import deque, namedtuple
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+Captcha = namedtuple('Captcha', 'texto imagem')
+
+CARACTERES = string.ascii_uppercase + string.digits
+TAMANHO_TEXTO = 6
+LARGURA, ALTURA = 200, 80
+PONTOS_RUIDO = 1000
+LINHAS_RUIDO = 5
+
+_estoque = deque()
+_repor = threading.Event()
+_trava = threading.Lock()
+_thread = None
+_pid = None
+
+
+def _config(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+@lru_cache(maxsize=1)
+def fonte():
+    try:
+        return ImageFont.truetype(
+            _config('CAPTCHA_FONTE', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'), 32
+        )
+    except OSError:
+        # Fallback para fonte padrão
+        return ImageFont.load_default()
+
+
+def gerar(rng=None):
+    """Gera um captcha novo: texto aleatório e imagem PNG em data URI"""
+    rng = rng or np.random.default_rng()
+    texto = ''.join(secrets.choice(CARACTERES) for _ in range(TAMANHO_TEXTO))
+
+    # Preto e branco: um canal basta
+    imagem = Image.new('L', (LARGURA, ALTURA), color=255)
+    draw = ImageDraw.Draw(imagem)
+
+    # Linhas distorcidas
+    for x1, y1, x2, y2 in rng.integers(0, (LARGURA, ALTURA, LARGURA, ALTURA), size=(LINHAS_RUIDO, 4)):
+        draw.line([(x1, y1), (x2, y2)], fill=0, width=2)
+
+    # Texto centralizado, com cada caractere deslocado na vertical
+    bbox = draw.textbbox((0, 0), texto, font=fonte())
+    largura_texto = bbox[2] - bbox[0]
+    x = (LARGURA - largura_texto) // 2
+    y = (ALTURA - (bbox[3] - bbox[1])) // 2
+    for i, (caractere, deslocamento) in enumerate(zip(texto, rng.integers(-5, 6, size=TAMANHO_TEXTO))):
+        draw.text((x + i * (largura_texto // TAMANHO_TEXTO), y + deslocamento), caractere, fill=0, font=fonte())
+
+    # Ruído: pontos pretos em posições aleatórias, de uma vez sobre os pixels
+    pixels = np.array(imagem)
+    pixels.flat[rng.integers(0, pixels.size, size=PONTOS_RUIDO)] = 0
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return Captcha(texto, 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode())
+
+
+def tamanho_estoque():
+    return len(_estoque)
+
+
+def encher(quantidade=None):
+    """Gera captchas até completar o estoque (ou ``quantidade`` deles)"""
+    rng = np.random.default_rng()
+    faltam = _config('CAPTCHA_POOL_TAMANHO', 50) - len(_estoque)
+    for _ in range(faltam if quantidade is None else min(quantidade, faltam)):
+        _estoque.append(gerar(rng))
+
+
+def _reabastecer():
+    rng = np.random.default_rng()
+    while True:
+        _repor.wait()
+        _repor.clear()
+        pausa = 1 / _config('CAPTCHA_POOL_REPOSICAO', 20)
+        while len(_estoque) < _config('CAPTCHA_POOL_TAMANHO', 50):
+            _estoque.append(gerar(rng))
+            # Limita o uso de CPU enquanto o servidor atende requisições
+            time.sleep(pausa)
+
+
+def _iniciar_reposicao():
+    global _thread, _pid
+    with _trava:
+        # Após um fork (workers do gunicorn) a thread do processo pai não existe
+        if _pid != os.getpid():
+            if _pid is not None:
+                # O estoque herdado é o mesmo dos outros workers
+                _estoque.clear()
+            _thread = threading.Thread(target=_reabastecer, name='captcha-reposicao', daemon=True)
+            _thread.start()
+            _pid = os.getpid()
+
+
+def obter():
+    """Retira um captcha do estoque e agenda a reposição"""
+    _iniciar_reposicao()
+    try:
+        captcha = _estoque.popleft()
+    except IndexError:
+        captcha = gerar()
+    _repor.set()
+    return captcha
@@ -0,0 +1,146 @@
+"""
+Respostas condicionais (ETag/Last-Modified) para páginas de detalhe e feeds.
+
+Cada view decorada com ``condicional`` informa uma função de versão barata
+(uma consulta com MAX(updated_at) e contagens, ou o contador de geração do
+dashboard). Se o navegador já tem a versão atual, a resposta é um 304 antes
+de qualquer consulta da view ou renderização de template.
+
+Nas páginas HTML o ETag também inclui o usuário e o token CSRF, pois elas
+exibem o usuário logado e formulários; com mensagens pendentes a resposta
+nunca é condicional, para que elas sejam exibidas. Os feeds JSON usam
+``por_usuario=False`` e não tocam na sessão.
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.contrib import messages
+from django.middleware.csrf import get_token
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .dashboard_cache import geracao_atual
+from .models import Agenda, Consulta, Dono, Pet, Prescricao
+
+
+def _assinatura(*partes):
+    return hashlib.md5(repr(partes).encode(), usedforsecurity=False).hexdigest()
+
+
+def condicional(versao, por_usuario=True):
+    """
+    Decorator que responde 304 quando a versão do recurso não mudou.
+
+    Args:
+        versao: função ``(request, *args, **kwargs)`` que retorna
+            ``(ultima_alteracao, partes)`` ou None (recurso inexistente: a
+            view é executada normalmente). ``ultima_alteracao`` pode ser None
+            quando só há ETag.
+        por_usuario: inclui usuário, token CSRF e mensagens pendentes (HTML)
+    """
+    def obter(request, *args, **kwargs):
+        # condition() chama as funções de ETag e de Last-Modified separadamente
+        if not hasattr(request, '_versao_condicional'):
+            resultado = versao(request, *args, **kwargs)
+            if resultado is None or (por_usuario and len(messages.get_messages(request))):
+                request._versao_condicional = (None, None)
+            else:
+                ultima_alteracao, partes = resultado
+                if por_usuario:
+                    # get_token() garante o cookie já na primeira resposta;
+                    # o valor retornado é mascarado (muda a cada chamada)
+                    get_token(request)
+                    partes = (partes, request.user.pk, request.META['CSRF_COOKIE'])
+                request._versao_condicional = (_assinatura(partes), ultima_alteracao)
+        return request._versao_condicional
+
+    def decorator(view):
+        condicionada = condition(
+            etag_func=lambda request, *args, **kwargs: obter(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: obter(request, *args, **kwargs)[1],
+        )(view)
+
+        def sem_validadores_em_erro(response):
+            if response.status_code not in (200, 304):
+                # Erros não devem ser revalidados como se fossem a versão atual
+                del response['ETag']
+                del response['Last-Modified']
+            return response
+
+        # no-cache: o navegador guarda a resposta, mas sempre revalida
+        if iscoroutinefunction(view):
+            @wraps(view)
+            @cache_control(private=True, no_cache=True)
+            async def _view(request, *args, **kwargs):
+                return sem_validadores_em_erro(await condicionada(request, *args, **kwargs))
+        else:
+            @wraps(view)
+            @cache_control(private=True, no_cache=True)
+            def _view(request, *args, **kwargs):
+                return sem_validadores_em_erro(condicionada(request, *args, **kwargs))
+        return _view
+    return decorator
+
+
+def _ultima_e_total(modelo, campo):
+    """Subconsultas com MAX(updated_at) e a contagem dos registros relacionados"""
+    relacionados = modelo.objects.filter(**{campo: OuterRef('pk')}).order_by().values(campo)
+    return (
+        Subquery(relacionados.annotate(ultima=Max('updated_at')).values('ultima')),
+        Subquery(relacionados.annotate(total=Count('pk')).values('total')),
+    )
+
+
+def _versao_linha(queryset, **relacionados):
+    """
+    Versão de um registro e de seus relacionados em uma única consulta.
+
+    ``queryset.values()`` deve trazer os ``updated_at`` exibidos; cada item
+    de ``relacionados`` (nome=(modelo, campo)) acrescenta a última alteração
+    e a contagem dos registros ligados, o que também detecta exclusões.
+    """
+    anotacoes = {}
+    for nome, (modelo, campo) in relacionados.items():
+        anotacoes[f'{nome}_ultima'], anotacoes[f'{nome}_total'] = _ultima_e_total(modelo, campo)
+    linha = queryset.annotate(**anotacoes).first()
+    if linha is None:
+        return None
+    datas = [valor for chave, valor in linha.items() if chave.endswith(('updated_at', '_ultima')) and valor]
+    return max(datas, default=None), sorted(linha.items())
+
+
+def versao_pet(request, pk):
+    return _versao_linha(
+        Pet.objects.filter(pk=pk).values('updated_at', 'dono__updated_at'),
+        consultas=(Consulta, 'pet'),
+        agendamentos=(Agenda, 'pet'),
+    )
+
+
+def versao_dono(request, pk):
+    return _versao_linha(
+        Dono.objects.filter(pk=pk).values('updated_at'),
+        pets=(Pet, 'dono'),
+    )
+
+
+def versao_consulta(request, pk):
+    return _versao_linha(
+        Consulta.objects.filter(pk=pk).values('updated_at', 'pet__updated_at', 'pet__dono__updated_at'),
+        prescricoes=(Prescricao, 'consulta'),
+    )
+
+
+def versao_por_geracao(request, *args, **kwargs):
+    """
+    Versão dos dados agregados (feed do calendário, dashboard_api): o
+    contador de geração muda a cada alteração de Dono, Pet, Consulta ou
+    Agenda. A data entra porque os widgets são relativos ao dia atual.
+    """
+    parametros = sorted(request.GET.lists())
+    return None, (geracao_atual(), timezone.localdate().isoformat(), request.path, parametros)
@@ -0,0 +1,116 @@
+"""
+Cache dos resultados dos widgets do dashboard.
+
+As chaves incluem um contador de geração que é incrementado sempre que um
+Dono, Pet, Consulta ou Agenda é salvo ou excluído. Assim, nenhuma entrada
+precisa ser apagada: após qualquer alteração as chaves antigas deixam de ser
+consultadas e expiram sozinhas.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .models import Agenda, Consulta, Dono, Pet
+
+CHAVE_GERACAO = 'dashboard:geracao'
+CHAVE_ACERTOS = 'dashboard:acertos'
+CHAVE_FALHAS = 'dashboard:falhas'
+
+
+def _timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def geracao_atual():
+    """Retorna a geração atual dos dados do dashboard"""
+    geracao = cache.get(CHAVE_GERACAO)
+    if geracao is None:
+        # Um valor novo (e não 1) evita reaproveitar entradas de uma
+        # geração anterior caso o contador tenha sido descartado do cache
+        cache.add(CHAVE_GERACAO, time.time_ns(), None)
+        geracao = cache.get(CHAVE_GERACAO)
+    return geracao
+
+
+def invalidar_dashboard():
+    """Descarta logicamente todos os resultados em cache"""
+    try:
+        cache.incr(CHAVE_GERACAO)
+    except ValueError:
+        cache.add(CHAVE_GERACAO, time.time_ns(), None)
+
+
+def _contar(chave):
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, 1, None)
+
+
+def chave_widget(tipo, params, geracao):
+    """Monta a chave de cache de um widget"""
+    # A data entra na chave porque os widgets são relativos ao dia atual
+    hoje = timezone.localdate().isoformat()
+    return f'dashboard:widget:{geracao}:{hoje}:{tipo}:{urlencode(sorted(params.items()))}'
+
+
+def widget_em_cache(tipo, params, calcular):
+    """
+    Retorna o resultado de ``calcular()`` para o widget, usando o cache.
+
+    Args:
+        tipo (str): nome do widget (ex: 'overview')
+        params (dict): parâmetros que alteram o resultado (ex: ``{'days': 30}``)
+        calcular: função sem argumentos que calcula os dados do widget
+    """
+    chave = chave_widget(tipo, params, geracao_atual())
+    resultado = cache.get(chave)
+    if resultado is not None:
+        _contar(CHAVE_ACERTOS)
+        return resultado
+
+    _contar(CHAVE_FALHAS)
+    resultado = calcular()
+    # Respostas de erro não são guardadas
+    if not (isinstance(resultado, dict) and 'error' in resultado):
+        cache.set(chave, resultado, _timeout())
+    return resultado
+
+
+def estatisticas_cache():
+    """Acertos, falhas e taxa de acerto do cache do dashboard"""
+    valores = cache.get_many([CHAVE_ACERTOS, CHAVE_FALHAS])
+    acertos = valores.get(CHAVE_ACERTOS, 0)
+    falhas = valores.get(CHAVE_FALHAS, 0)
+    total = acertos + falhas
+    return {
+        'acertos': acertos,
+        'falhas': falhas,
+        'taxa_acerto': round(acertos / total * 100, 1) if total else 0,
+        'geracao': geracao_atual(),
+    }
+
+
+def zerar_estatisticas():
+    cache.delete_many([CHAVE_ACERTOS, CHAVE_FALHAS])
+
+
+@receiver(post_save, sender=Dono)
+@receiver(post_save, sender=Pet)
+@receiver(post_save, sender=Consulta)
+@receiver(post_save, sender=Agenda)
+@receiver(post_delete, sender=Dono)
+@receiver(post_delete, sender=Pet)
+@receiver(post_delete, sender=Consulta)
+@receiver(post_delete, sender=Agenda)
+def invalidar_ao_alterar(sender, **kwargs):
+    # Após o commit, para que nenhuma requisição concorrente guarde dados
+    # anteriores à alteração sob a nova geração
+    transaction.on_commit(invalidar_dashboard)
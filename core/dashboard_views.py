@@ -1,50 +1,153 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
-from django.db.models import Count, Avg, Sum, Q, F
-from django.db.models.functions import TruncMonth, TruncYear, ExtractYear
+from django.db.models import Count, Avg, Sum, Q, F, Window
+from django.db.models.functions import Coalesce, ExtractMonth, TruncMonth, TruncYear, ExtractYear
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from .models import Dono, Pet, Consulta, Agenda, Prescricao, Medicacao
+from .models import Dono, Pet, Consulta, Agenda, Prescricao, Medicacao, ResumoDiario
+from .dashboard_cache import estatisticas_cache, widget_em_cache
+from .condicional import condicional, versao_por_geracao
+from .instrumentacao import instrumentar, medir_consultas
+from .timeseries import PASSOS, contar_por_periodo, somar_meses
+
+def _resumos_consultas():
+    """Resumos diários das consultas (ver core/resumos.py)"""
+    return ResumoDiario.objects.filter(origem='CONSULTA')
+
+def _resumos_agenda():
+    """Resumos diários dos agendamentos (ver core/resumos.py)"""
+    return ResumoDiario.objects.filter(origem='AGENDA')
+
+def _soma(**filtros):
+    """Soma das quantidades do resumo, com filtro opcional e zero quando vazio"""
+    return Coalesce(Sum('quantidade', filter=Q(**filtros) if filtros else None), 0)
+
+def _consultas_por_veterinario():
+    """Consultas por veterinário e status, compartilhadas pelos widgets de veterinários"""
+    return _compartilhado('consultas_por_veterinario', lambda: list(
+        _resumos_consultas()
+        .values('veterinario', 'status')
+        .annotate(total=Sum('quantidade'))
+        .order_by()
+    ))
+
+def _agendamentos_por_tipo():
+    """Agendamentos por tipo, compartilhados pelos widgets de procedimentos"""
+    return _compartilhado('agendamentos_por_tipo', lambda: list(
+        _resumos_agenda()
+        .values('tipo')
+        .annotate(total=Sum('quantidade'))
+        .order_by('-total')
+    ))
+
+def _pets_por_especie():
+    """Pets por espécie, compartilhados pelos widgets de espécies"""
+    return _compartilhado('pets_por_especie', lambda: list(
+        Pet.objects.values('especie').annotate(total=Count('id')).order_by('-total')
+    ))
+
+def _dashboard_data_em_cache():
+    """
+    Dados principais do dashboard, usando o cache de resultados. Com DEBUG
+    ativo, inclui em ``debug_consultas`` a quantidade de consultas SQL e o
+    tempo gasto nesta requisição (zero consultas quando vem do cache).
+    """
+    with medir_consultas() as medicao:
+        context = widget_em_cache('dashboard', {}, get_dashboard_data)
+    if settings.DEBUG:
+        # Fora do valor em cache, que é o mesmo para todas as requisições
+        context = {**context, 'debug_consultas': medicao}
+    return context
 
 def dashboard_home(request):
     """Dashboard principal com visão geral"""
-    context = get_dashboard_data()
+    context = _dashboard_data_em_cache()
     return render(request, 'dashboard/dashboard_home.html', context)
 
+# Widgets disponíveis na API
+WIDGETS = {
+    'overview': lambda: get_overview_data(),
+    'consultas_periodo': lambda days=7: get_consultas_periodo_data(days),
+    'especies_racas': lambda: get_especies_racas_data(),
+    'veterinarios_performance': lambda: get_veterinarios_performance_data(),
+    'procedimentos_tipos': lambda: get_procedimentos_tipos_data(),
+    'clientes_fidelizacao': lambda: get_clientes_fidelizacao_data(),
+    'saude_animal': lambda: get_saude_animal_data(),
+    # Novos endpoints financeiros
+    'procedimentos_financeiro': lambda: get_procedimentos_financeiro_data(),
+    'veterinarios_financeiro': lambda: get_veterinarios_financeiro_data(),
+    'clientes_valor': lambda alto=None, medio=None: get_clientes_valor_data(alto, medio),
+    'tendencias_financeiro': lambda: get_tendencias_financeiro_data(),
+}
+
+# Parâmetros da requisição aceitos por cada widget, com seus conversores
+PARAMETROS_WIDGET = {
+    'consultas_periodo': {'days': int},
+    'clientes_valor': {'alto': int, 'medio': int},
+}
+
+# Consultas compartilhadas entre os widgets de um mesmo lote (ver lote_de_widgets)
+_lote_atual = ContextVar('dashboard_lote', default=None)
+
+@contextmanager
+def lote_de_widgets():
+    """Dentro do bloco, cada consulta base é executada uma única vez"""
+    token = _lote_atual.set({})
+    try:
+        yield
+    finally:
+        _lote_atual.reset(token)
+
+def _compartilhado(chave, calcular):
+    """Retorna o resultado de ``calcular()``, reaproveitado dentro do lote atual"""
+    lote = _lote_atual.get()
+    if lote is None:
+        return calcular()
+    # Na API assíncrona os widgets do lote são calculados em threads
+    with lote.setdefault(('trava', chave), threading.Lock()):
+        if chave not in lote:
+            lote[chave] = calcular()
+    return lote[chave]
+
+def calcular_widget(data_type, params):
+    """Calcula os dados de um widget do dashboard, usando o cache de resultados"""
+    widget = WIDGETS.get(data_type)
+    if widget is None:
+        return {'error': 'Tipo de dados não reconhecido'}
+    kwargs = {
+        nome: converter(params[nome])
+        for nome, converter in PARAMETROS_WIDGET.get(data_type, {}).items()
+        if nome in params
+    }
+    return widget_em_cache(data_type, kwargs, lambda: widget(**kwargs))
+
 @csrf_exempt
+@condicional(versao_por_geracao, por_usuario=False)
 def dashboard_api(request):
-    """API para dados do dashboard (AJAX)"""
+    """API para dados do dashboard (AJAX)
+    
+    Aceita um único widget (``?type=overview``) ou um lote
+    (``?types=overview,especies_racas``); no segundo caso a resposta traz
+    os dados de cada widget sob a chave do respectivo tipo.
+    """
+    if request.GET.get('types'):
+        return dashboard_api_lote(request)
+    
     try:
         data_type = request.GET.get('type', 'overview')
-        
-        if data_type == 'overview':
-            data = get_overview_data()
-        elif data_type == 'consultas_periodo':
-            days = int(request.GET.get('days', 7))
-            data = get_consultas_periodo_data(days)
-        elif data_type == 'especies_racas':
-            data = get_especies_racas_data()
-        elif data_type == 'veterinarios_performance':
-            data = get_veterinarios_performance_data()
-        elif data_type == 'procedimentos_tipos':
-            data = get_procedimentos_tipos_data()
-        elif data_type == 'clientes_fidelizacao':
-            data = get_clientes_fidelizacao_data()
-        elif data_type == 'saude_animal':
-            data = get_saude_animal_data()
-        # Novos endpoints financeiros
-        elif data_type == 'procedimentos_financeiro':
-            data = get_procedimentos_financeiro_data()
-        elif data_type == 'veterinarios_financeiro':
-            data = get_veterinarios_financeiro_data()
-        elif data_type == 'clientes_valor':
-            data = get_clientes_valor_data()
-        elif data_type == 'tendencias_financeiro':
-            data = get_tendencias_financeiro_data()
-        else:
-            data = {'error': 'Tipo de dados não reconhecido'}
-        
+        data = calcular_widget(data_type, request.GET)
         return JsonResponse(data)
     except Exception as e:
         # Retornar erro em formato JSON
@@ -53,6 +156,130 @@ def dashboard_api(request):
             'type': data_type if 'data_type' in locals() else 'unknown'
         }, status=500)
 
+def dashboard_api_lote(request):
+    """Calcula vários widgets em uma única requisição"""
+    tipos = [tipo.strip() for tipo in request.GET['types'].split(',') if tipo.strip()]
+    
+    resultado = {}
+    with lote_de_widgets():
+        for data_type in dict.fromkeys(tipos):
+            try:
+                resultado[data_type] = calcular_widget(data_type, request.GET)
+            except Exception as e:
+                # O erro de um widget não impede o carregamento dos demais
+                resultado[data_type] = {
+                    'error': f'Erro interno da API: {str(e)}',
+                    'type': data_type
+                }
+    return JsonResponse(resultado)
+
+# Threads que calculam os widgets da API assíncrona
+_executor = None
+_executor_trava = threading.Lock()
+
+def _pool_widgets():
+    global _executor
+    with _executor_trava:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'DASHBOARD_WIDGETS_THREADS', 4),
+                thread_name_prefix='dashboard-widget',
+            )
+    return _executor
+
+def _prazo_widget(data_type):
+    prazos = getattr(settings, 'DASHBOARD_WIDGET_TIMEOUTS', {})
+    return prazos.get(data_type, getattr(settings, 'DASHBOARD_WIDGET_TIMEOUT', 5))
+
+def _calcular_widget_em_thread(data_type, params):
+    try:
+        return calcular_widget(data_type, params)
+    except Exception as e:
+        return {'error': f'Erro interno da API: {str(e)}', 'type': data_type}
+    finally:
+        # As threads do pool são reaproveitadas; a conexão não fica aberta
+        connections.close_all()
+
+# Cálculos em andamento no pool, por widget e parâmetros. Um widget que
+# passou do prazo continua ocupando uma thread; as requisições seguintes
+# esperam o mesmo cálculo em vez de enfileirar outro, de modo que widgets
+# lentos ocupam no máximo uma thread cada e não esgotam o pool
+_em_andamento = {}
+_em_andamento_trava = threading.Lock()
+
+def _chave_calculo(data_type, params):
+    return (data_type, tuple((nome, params.get(nome)) for nome in PARAMETROS_WIDGET.get(data_type, {})))
+
+def _calculo_concluido(chave, futuro):
+    with _em_andamento_trava:
+        if _em_andamento.get(chave) is futuro:
+            del _em_andamento[chave]
+
+def _calculo_do_widget(data_type, params):
+    """Future do cálculo do widget: o que já está em andamento ou um novo"""
+    chave = _chave_calculo(data_type, params)
+    with _em_andamento_trava:
+        futuro = _em_andamento.get(chave)
+        if futuro is not None:
+            return futuro
+        # A cópia do contexto leva o lote atual (consultas compartilhadas)
+        futuro = _pool_widgets().submit(
+            contextvars.copy_context().run, _calcular_widget_em_thread, data_type, params,
+        )
+        _em_andamento[chave] = futuro
+    # Fora da trava: em um future já concluído o callback roda na hora
+    futuro.add_done_callback(partial(_calculo_concluido, chave))
+    return futuro
+
+def widgets_em_andamento():
+    """Widgets sendo calculados no pool, com seus parâmetros"""
+    with _em_andamento_trava:
+        return [{'type': data_type, 'params': dict(params)} for data_type, params in _em_andamento]
+
+async def _widget_com_prazo(data_type, params):
+    """Calcula o widget no pool de threads, esperando no máximo o prazo dele"""
+    futuro = asyncio.wrap_future(_calculo_do_widget(data_type, params))
+    try:
+        # shield: esgotado o prazo, o cálculo continua e grava o resultado
+        # no cache, de onde a próxima requisição o lê
+        return await asyncio.wait_for(asyncio.shield(futuro), _prazo_widget(data_type))
+    except asyncio.TimeoutError:
+        return {'error': 'Tempo esgotado', 'type': data_type, 'pendente': True}
+
+@csrf_exempt
+@condicional(versao_por_geracao, por_usuario=False)
+async def dashboard_api_async(request):
+    """API do dashboard com os widgets calculados em paralelo
+
+    Mesmos parâmetros de ``dashboard_api``. Cada widget tem um prazo
+    (DASHBOARD_WIDGET_TIMEOUT, ou DASHBOARD_WIDGET_TIMEOUTS por tipo); os
+    que não terminam a tempo vêm com ``pendente: true`` e os demais são
+    retornados normalmente.
+    """
+    if request.GET.get('types'):
+        tipos = [tipo.strip() for tipo in request.GET['types'].split(',') if tipo.strip()]
+    else:
+        tipos = [request.GET.get('type', 'overview')]
+    tipos = list(dict.fromkeys(tipos))
+
+    with lote_de_widgets():
+        dados = await asyncio.gather(*(_widget_com_prazo(tipo, request.GET) for tipo in tipos))
+    resultado = dict(zip(tipos, dados))
+
+    if not request.GET.get('types'):
+        return JsonResponse(resultado[tipos[0]])
+    return JsonResponse(resultado)
+
+@login_required
+def dashboard_cache_stats(request):
+    """Estatísticas do cache de resultados do dashboard"""
+    dados = estatisticas_cache()
+    if hasattr(cache, 'estatisticas'):
+        # Acertos no L1/L2 por namespace (core/cache_backends.py)
+        dados['camadas'] = cache.estatisticas()
+    dados['widgets_em_andamento'] = widgets_em_andamento()
+    return JsonResponse(dados)
+
 def dashboard_financeiro(request):
     """Dashboard financeiro da clínica"""
     return render(request, 'dashboard/dashboard_financeiro.html')
@@ -63,41 +290,58 @@ def dashboard_saude(request):
 
 def dashboard_debug(request):
     """Dashboard de debug para testar APIs"""
-    context = get_dashboard_data()
+    context = _dashboard_data_em_cache()
     return render(request, 'dashboard/dashboard_debug.html', context)
 
 def dashboard_simple(request):
     """Dashboard simples para teste"""
-    context = get_dashboard_data()
+    context = _dashboard_data_em_cache()
     return render(request, 'dashboard/dashboard_simple.html', context)
 
 def get_dashboard_data():
-    """Dados principais para o dashboard"""
+    """Dados principais para o dashboard
+    
+    Usa um número fixo de consultas: resumos de consultas, pets por
+    espécie, donos e agendamentos pendentes.
+    """
     hoje = timezone.now()
-    inicio_mes = hoje.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    inicio_ano = hoje.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Métricas gerais
-    total_donos = Dono.objects.count()
-    total_pets = Pet.objects.count()
-    total_consultas = Consulta.objects.count()
-    consultas_mes = Consulta.objects.filter(data_hora__gte=inicio_mes).count()
-    consultas_ano = Consulta.objects.filter(data_hora__gte=inicio_ano).count()
-    
-    # Consultas por status
-    consultas_agendadas = Consulta.objects.filter(status='AGENDADA').count()
-    consultas_realizadas = Consulta.objects.filter(status='REALIZADA').count()
-    consultas_canceladas = Consulta.objects.filter(status='CANCELADA').count()
-    
-    # Distribuição por espécie
-    especies_count = Pet.objects.values('especie').annotate(
-        total=Count('id')
-    ).order_by('-total')
+    data_hoje = timezone.localdate(hoje)
+    inicio_mes = data_hoje.replace(day=1)
+    inicio_ano = data_hoje.replace(month=1, day=1)
+    
+    # Consultas por veterinário e status, com os totais do mês e do ano
+    consultas = _resumos_consultas().values('veterinario', 'status').annotate(
+        total=_soma(),
+        mes=_soma(dia__gte=inicio_mes),
+        ano=_soma(dia__gte=inicio_ano),
+    ).order_by()
+    
+    total_consultas = consultas_mes = consultas_ano = 0
+    por_status = {}
+    por_veterinario = {}
+    for item in consultas:
+        total_consultas += item['total']
+        consultas_mes += item['mes']
+        consultas_ano += item['ano']
+        por_status[item['status']] = por_status.get(item['status'], 0) + item['total']
+        por_veterinario[item['veterinario']] = por_veterinario.get(item['veterinario'], 0) + item['total']
     
     # Veterinários mais ativos
-    veterinarios_count = Consulta.objects.values('veterinario').annotate(
-        total=Count('id')
-    ).order_by('-total')[:5]
+    veterinarios_count = [
+        {'veterinario': veterinario, 'total': total}
+        for veterinario, total in sorted(por_veterinario.items(), key=lambda item: item[1], reverse=True)[:5]
+    ]
+    
+    # Distribuição por espécie (a soma é o total de pets)
+    especies_count = _pets_por_especie()
+    total_pets = sum(especie['total'] for especie in especies_count)
+    
+    # Pets por dono; a janela traz o total de donos na mesma consulta
+    pets_por_dono = list(Dono.objects.annotate(
+        total_pets=Count('pets'),
+        total_donos=Window(Count('id'))
+    ).order_by('-total_pets')[:5])
+    total_donos = pets_por_dono[0].total_donos if pets_por_dono else 0
     
     # Agendamentos pendentes
     agendamentos_pendentes = Agenda.objects.filter(
@@ -105,20 +349,15 @@ def get_dashboard_data():
         data_hora__gte=hoje
     ).count()
     
-    # Pets por dono
-    pets_por_dono = Dono.objects.annotate(
-        total_pets=Count('pets')
-    ).order_by('-total_pets')[:5]
-    
     context = {
         'total_donos': total_donos,
         'total_pets': total_pets,
         'total_consultas': total_consultas,
         'consultas_mes': consultas_mes,
         'consultas_ano': consultas_ano,
-        'consultas_agendadas': consultas_agendadas,
-        'consultas_realizadas': consultas_realizadas,
-        'consultas_canceladas': consultas_canceladas,
+        'consultas_agendadas': por_status.get('AGENDADA', 0),
+        'consultas_realizadas': por_status.get('REALIZADA', 0),
+        'consultas_canceladas': por_status.get('CANCELADA', 0),
         'especies_count': especies_count,
         'veterinarios_count': veterinarios_count,
         'agendamentos_pendentes': agendamentos_pendentes,
@@ -129,27 +368,21 @@ def get_dashboard_data():
 
 def get_overview_data():
     """Dados para visão geral"""
-    hoje = timezone.now()
-    inicio_mes = hoje.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Crescimento mensal
-    meses = []
-    consultas_mensais = []
-    
-    for i in range(6):
-        data = inicio_mes - timedelta(days=30*i)
-        mes = data.strftime('%b/%Y')
-        consultas = Consulta.objects.filter(
-            data_hora__year=data.year,
-            data_hora__month=data.month
-        ).count()
-        
-        meses.append(mes)
-        consultas_mensais.append(consultas)
+    hoje = timezone.localdate()
+    
+    # Crescimento mensal: os últimos seis meses do calendário, incluindo o atual
+    serie = contar_por_periodo(
+        _resumos_consultas(),
+        somar_meses(hoje, -5),
+        hoje,
+        granularidade='month',
+        campo='dia',
+        agregado=Sum('quantidade')
+    )
     
     return {
-        'meses': meses[::-1],
-        'consultas_mensais': consultas_mensais[::-1]
+        'meses': [intervalo['inicio'].strftime('%b/%Y') for intervalo in serie],
+        'consultas_mensais': [intervalo['total'] for intervalo in serie]
     }
 
 def get_consultas_periodo_data(days=7):
@@ -158,74 +391,85 @@ def get_consultas_periodo_data(days=7):
     Args:
         days (int): Número de dias para o período (7, 15, 30, 90, 180, 365)
     """
-    hoje = timezone.now()
+    hoje = timezone.localdate()
     
-    # Definir o formato da data baseado no período
+    # Definir a granularidade e o formato da data baseado no período
     if days <= 30:  # Até 30 dias: mostrar por dia
         date_format = '%d/%m'
-        step = 1
+        granularidade = 'day'
     elif days <= 90:  # Até 3 meses: mostrar por semana
         date_format = '%d/%m'
-        step = 7
+        granularidade = 'week'
     elif days <= 180:  # Até 6 meses: mostrar por 2 semanas
         date_format = '%b'
-        step = 14
+        granularidade = 'fortnight'
     else:  # Mais de 6 meses: mostrar por mês
         date_format = '%b/%y'
-        step = 30
+        granularidade = 'month'
+    
+    serie = contar_por_periodo(
+        _resumos_consultas(),
+        hoje - timedelta(days=days),
+        hoje,
+        granularidade=granularidade,
+        campo='dia',
+        agregado=Sum('quantidade')
+    )
     
     consultas_periodo = []
     datas_periodo = []
-    
-    # Ajustar para o início do dia
-    hoje = hoje.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    for i in range(0, days + 1, step):
-        data_fim = hoje - timedelta(days=i)
-        data_inicio = data_fim - timedelta(days=step-1) if i + step <= days else hoje - timedelta(days=days)
-        
-        consultas = Consulta.objects.filter(
-            data_hora__date__range=(data_inicio.date(), data_fim.date())
-        ).count()
-        
-        # Se for o último período (mais antigo), ajustar o rótulo
-        if i + step > days:
-            label = f"{data_inicio.strftime(date_format)} - {data_fim.strftime(date_format)}"
+    passo = PASSOS.get(granularidade)
+    
+    for intervalo in serie:
+        inicio, fim = intervalo['inicio'], intervalo['fim']
+        if granularidade == 'month':
+            label = inicio.strftime(date_format)
+        elif (fim - inicio).days + 1 < passo:
+            # Intervalo parcial (o mais antigo): mostrar o período completo
+            label = f"{inicio.strftime(date_format)} - {fim.strftime(date_format)}"
         else:
-            label = data_fim.strftime(date_format)
+            label = fim.strftime(date_format)
         
-        consultas_periodo.append(consultas)
+        consultas_periodo.append(intervalo['total'])
         datas_periodo.append(label)
     
-    # Inverter as listas para mostrar do mais antigo para o mais recente
+    # As listas já estão do mais antigo para o mais recente
     return {
-        'consultas_periodo': consultas_periodo[::-1],
-        'datas_periodo': datas_periodo[::-1],
+        'consultas_periodo': consultas_periodo,
+        'datas_periodo': datas_periodo,
         'total_dias': days
     }
 
 def get_especies_racas_data():
     """Dados de distribuição por espécie e raça"""
-    especies = Pet.objects.values('especie').annotate(
-        total=Count('id')
-    ).order_by('-total')
+    especies = _pets_por_especie()
     
     racas = Pet.objects.values('raca').annotate(
         total=Count('id')
     ).filter(raca__isnull=False).exclude(raca='').order_by('-total')[:10]
     
     return {
-        'especies': list(especies),
+        'especies': especies,
         'racas': list(racas)
     }
 
 def get_veterinarios_performance_data():
     """Dados de performance dos veterinários"""
-    veterinarios = Consulta.objects.values('veterinario').annotate(
-        total_consultas=Count('id'),
-        consultas_realizadas=Count('id', filter=Q(status='REALIZADA')),
-        consultas_agendadas=Count('id', filter=Q(status='AGENDADA'))
-    ).order_by('-total_consultas')
+    por_veterinario = {}
+    for item in _consultas_por_veterinario():
+        vet = por_veterinario.setdefault(item['veterinario'], {
+            'veterinario': item['veterinario'],
+            'total_consultas': 0,
+            'consultas_realizadas': 0,
+            'consultas_agendadas': 0,
+        })
+        vet['total_consultas'] += item['total']
+        if item['status'] == 'REALIZADA':
+            vet['consultas_realizadas'] += item['total']
+        elif item['status'] == 'AGENDADA':
+            vet['consultas_agendadas'] += item['total']
+    
+    veterinarios = sorted(por_veterinario.values(), key=lambda vet: vet['total_consultas'], reverse=True)
     
     # Calcular taxa de realização
     for vet in veterinarios:
@@ -237,29 +481,26 @@ def get_veterinarios_performance_data():
             vet['taxa_realizacao'] = 0
     
     return {
-        'veterinarios': list(veterinarios)
+        'veterinarios': veterinarios
     }
 
 def get_procedimentos_tipos_data():
     """Dados de tipos de procedimentos"""
-    tipos_agenda = Agenda.objects.values('tipo').annotate(
-        total=Count('id')
-    ).order_by('-total')
+    tipos_agenda = _agendamentos_por_tipo()
     
     # Status dos agendamentos
-    status_agenda = Agenda.objects.values('status').annotate(
-        total=Count('id')
+    status_agenda = _resumos_agenda().values('status').annotate(
+        total=Sum('quantidade')
     ).order_by('-total')
     
     return {
-        'tipos': list(tipos_agenda),
+        'tipos': tipos_agenda,
         'status': list(status_agenda)
     }
 
+@instrumentar(linhas=lambda data: len(data['tabela']))
 def get_procedimentos_financeiro_data():
     """Retorna dados financeiros por tipo de procedimento (proxy por preço fixo)."""
-    print("\n=== INÍCIO get_procedimentos_financeiro_data() ===")
-    
     # Preços médios por tipo (R$)
     precos = {
         'CONSULTA': 80,
@@ -276,15 +517,8 @@ def get_procedimentos_financeiro_data():
         'OUTRO': 'Outro',
     }
     
-    print("Buscando todos os agendamentos, independentemente da data...")
-    
     # Consulta para obter a contagem de agendamentos por tipo (sem filtrar por data)
-    agg = (Agenda.objects
-           .values('tipo')
-           .annotate(qtd=Count('id'))
-           .order_by('-qtd'))
-    
-    print(f"Total de registros encontrados: {agg.count()}")
+    agg = _agendamentos_por_tipo()
     
     labels = []
     faturamentos = []
@@ -292,8 +526,7 @@ def get_procedimentos_financeiro_data():
     tabela = []
     
     # Se não houver dados, retornar dados vazios para evitar erros
-    if not agg.exists():
-        print("Nenhum agendamento encontrado no mês atual.")
+    if not agg:
         # Adicionar valores zerados para todos os tipos
         for tipo, legenda in tipos_legenda.items():
             labels.append(legenda)
@@ -309,12 +542,10 @@ def get_procedimentos_financeiro_data():
         # Processar os dados encontrados
         for item in agg:
             tipo = item['tipo']
-            qtd = item['qtd'] or 0
+            qtd = item['total'] or 0
             preco = precos.get(tipo, 0)
             faturamento = qtd * preco
             
-            print(f"Tipo: {tipo}, Quantidade: {qtd}, Preço: {preco}, Faturamento: {faturamento}")
-            
             labels.append(tipos_legenda.get(tipo, tipo))
             quantidades.append(qtd)
             faturamentos.append(faturamento)
@@ -327,11 +558,6 @@ def get_procedimentos_financeiro_data():
                 'ticket_medio': ticket,
             })
     
-    print(f"Labels: {labels}")
-    print(f"Faturamentos: {faturamentos}")
-    print(f"Quantidades: {quantidades}")
-    print("=== FIM get_procedimentos_financeiro_data() ===\n")
-    
     return {
         'labels': labels,
         'faturamentos': faturamentos,
@@ -339,24 +565,22 @@ def get_procedimentos_financeiro_data():
         'tabela': tabela,
     }
 
+@instrumentar(linhas=lambda data: len(data['labels']))
 def get_veterinarios_financeiro_data():
     """Faturamento por veterinário (proxy: consultas REALIZADAS x preço médio)."""
-    print("\n=== INÍCIO get_veterinarios_financeiro_data() ===")
-    
     preco_consulta = 150  # Aumentando o valor para um valor mais realista
     
     # Consulta para obter a contagem de consultas realizadas por veterinário
-    agg = (Consulta.objects
-           .filter(status='REALIZADA')
-           .values('veterinario')
-           .annotate(qtd=Count('id'))
-           .order_by('-qtd'))
-    
-    print(f"Total de veterinários com consultas realizadas: {agg.count()}")
+    agg = sorted(
+        ({'veterinario': item['veterinario'], 'qtd': item['total']}
+         for item in _consultas_por_veterinario()
+         if item['status'] == 'REALIZADA'),
+        key=lambda item: item['qtd'],
+        reverse=True
+    )
     
     # Se não houver dados, retornar dados vazios para evitar erros
-    if not agg.exists():
-        print("Nenhuma consulta realizada encontrada.")
+    if not agg:
         return {
             'labels': [],
             'faturamentos': [],
@@ -371,67 +595,48 @@ def get_veterinarios_financeiro_data():
         qtd = item['qtd'] or 0
         faturamento = qtd * preco_consulta
         
-        print(f"Veterinário: {vet}, Consultas: {qtd}, Faturamento: {faturamento}")
-        
         labels.append(vet)
         faturamentos.append(faturamento)
     
-    print(f"Labels: {labels}")
-    print(f"Faturamentos: {faturamentos}")
-    print("=== FIM get_veterinarios_financeiro_data() ===\n")
-    
     return {
         'labels': labels,
         'faturamentos': faturamentos,
     }
 
-def get_clientes_valor_data():
-    """Distribuição de clientes por valor (proxy por frequência de consultas)."""
-    print("\n=== INÍCIO get_clientes_valor_data() ===")
-    
-    # Obter todos os donos
-    donos = Dono.objects.all()
-    print(f"Total de donos: {donos.count()}")
+@instrumentar(linhas=lambda data: sum(data['values']))
+def get_clientes_valor_data(alto=None, medio=None):
+    """Distribuição de clientes por valor (proxy por frequência de consultas).
     
-    alto = medio = baixo = 0
-    
-    for i, d in enumerate(donos, 1):
-        # Contar o total de consultas de todos os pets do dono
-        total_consultas = d.pets.aggregate(total=Count('consultas'))['total'] or 0
-        
-        # Classificar o cliente com base no total de consultas
-        if total_consultas >= 5:
-            categoria = 'Alto Valor'
-            alto += 1
-        elif total_consultas >= 2:
-            categoria = 'Médio Valor'
-            medio += 1
-        else:
-            categoria = 'Baixo Valor'
-            baixo += 1
-        
-        print(f"Dono {i}: {d.nome}, Consultas: {total_consultas}, Categoria: {categoria}")
+    Args:
+        alto (int): mínimo de consultas para "Alto Valor"
+        medio (int): mínimo de consultas para "Médio Valor"
     
-    print(f"\nResumo:")
-    print(f"- Alto Valor: {alto} clientes")
-    print(f"- Médio Valor: {medio} clientes")
-    print(f"- Baixo Valor: {baixo} clientes")
-    print("=== FIM get_clientes_valor_data() ===\n")
+    Os limites padrão vêm de ``settings.DASHBOARD_CLIENTES_VALOR_LIMITES``.
+    """
+    limites = getattr(settings, 'DASHBOARD_CLIENTES_VALOR_LIMITES', {})
+    alto = limites.get('alto', 5) if alto is None else alto
+    medio = limites.get('medio', 2) if medio is None else medio
+    
+    # Uma única consulta: total de consultas por dono e contagem por faixa
+    faixas = Dono.objects.annotate(
+        total_consultas=Count('pets__consultas')
+    ).aggregate(
+        alto=Count('id', filter=Q(total_consultas__gte=alto)),
+        medio=Count('id', filter=Q(total_consultas__gte=medio, total_consultas__lt=alto)),
+        baixo=Count('id', filter=Q(total_consultas__lt=medio)),
+    )
     
     return {
         'labels': ['Alto Valor', 'Médio Valor', 'Baixo Valor'],
-        'values': [alto, medio, baixo],
+        'values': [faixas['alto'], faixas['medio'], faixas['baixo']],
+        'limites': {'alto': alto, 'medio': medio},
     }
 
+@instrumentar(linhas=lambda data: sum(1 for valor in data['valores'] if valor))
 def get_tendencias_financeiro_data():
     """Tendência mensal de faturamento (proxy: consultas REALIZADAS x preço médio por mês do ano atual)."""
-    print("\n=== INÍCIO get_tendencias_financeiro_data() ===")
-    
     preco_consulta = 150  # Aumentando o valor para um valor mais realista
-    hoje = timezone.now()
-    ano = hoje.year
-    
-    print(f"Ano de referência: {ano}")
+    ano = timezone.localdate().year
     
     # Nomes dos meses em português
     meses_nomes = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
@@ -439,28 +644,20 @@ def get_tendencias_financeiro_data():
     # Inicializar lista de valores com zeros
     valores = [0] * 12
     
-    # Obter contagem de consultas por mês
-    from django.db.models.functions import ExtractMonth
-    
     # Consulta para obter o número de consultas realizadas por mês no ano atual
-    consultas_por_mes = (Consulta.objects
-                         .filter(status='REALIZADA', data_hora__year=ano)
-                         .annotate(mes=ExtractMonth('data_hora'))
+    consultas_por_mes = (_resumos_consultas()
+                         .filter(status='REALIZADA', dia__year=ano)
+                         .annotate(mes=ExtractMonth('dia'))
                          .values('mes')
-                         .annotate(total=Count('id'))
+                         .annotate(total=Sum('quantidade'))
                          .order_by('mes'))
     
-    print(f"Consultas por mês: {list(consultas_por_mes)}")
-    
     # Preencher os valores com base nos dados reais
     for item in consultas_por_mes:
         mes = item['mes'] - 1  # Ajustar para índice baseado em 0
         if 0 <= mes < 12:  # Garantir que o mês esteja no intervalo válido
             valores[mes] = item['total'] * preco_consulta
     
-    print(f"Valores de faturamento por mês: {valores}")
-    print("=== FIM get_tendencias_financeiro_data() ===\n")
-    
     return {
         'labels': meses_nomes,
         'valores': valores,
@@ -474,31 +671,13 @@ def get_clientes_fidelizacao_data():
             total_pets=Count('pets')
         ).filter(total_pets__gt=1).order_by('-total_pets')[:10]
         
-        # Donos com mais consultas - usar subquery para calcular corretamente
-        from django.db.models import Subquery, OuterRef
-        
-        # Primeiro, vamos pegar os donos com mais consultas
-        donos_consultas_raw = Dono.objects.annotate(
-            total_consultas=Count('pets__consultas')
-        ).filter(total_consultas__gt=0).order_by('-total_consultas')[:10]
-        
-        # Agora vamos criar uma lista com os dados corretos
-        donos_consultas = []
-        for dono in donos_consultas_raw:
-            total_pets = dono.pets.count()
-            total_consultas = dono.pets.aggregate(
-                total=Count('consultas')
-            )['total'] or 0
-            
-            donos_consultas.append({
-                'id': dono.id,
-                'nome': dono.nome,
-                'total_consultas': total_consultas,
-                'total_pets': total_pets
-            })
-        
-        # Ordenar por total de consultas
-        donos_consultas.sort(key=lambda x: x['total_consultas'], reverse=True)
+        # Donos com mais consultas (pets e consultas contados na mesma consulta)
+        donos_consultas = list(Dono.objects.annotate(
+            total_consultas=Count('pets__consultas'),
+            total_pets=Count('pets', distinct=True)
+        ).filter(total_consultas__gt=0).order_by('-total_consultas').values(
+            'id', 'nome', 'total_consultas', 'total_pets'
+        )[:10])
         
         # Taxa de retorno (clientes com + de 1 consulta)
         total_donos_consultas = Dono.objects.filter(pets__consultas__isnull=False).distinct().count()
@@ -518,7 +697,7 @@ def get_clientes_fidelizacao_data():
                     'total_pets': dono.total_pets
                 } for dono in donos_multiplos_pets
             ],
-            'donos_consultas': donos_consultas,  # Já está no formato correto
+            'donos_consultas': donos_consultas,
             'taxa_retorno': taxa_retorno,
             'total_donos_consultas': total_donos_consultas,
             'donos_retorno': donos_retorno
@@ -534,40 +713,59 @@ def get_clientes_fidelizacao_data():
             'donos_retorno': 0
         }
 
-def get_saude_animal_data():
-    """Dados de saúde animal"""
-    # Distribuição por idade
-    pets_idade = []
-    for i in range(5):
-        idade_min = i * 2
-        idade_max = (i + 1) * 2
-        if i == 4:  # Último grupo: 8+ anos
-            count = Pet.objects.filter(
-                data_nascimento__lte=timezone.now().date() - timedelta(days=365*idade_min)
-            ).count()
-        else:
-            count = Pet.objects.filter(
-                data_nascimento__lte=timezone.now().date() - timedelta(days=365*idade_min),
-                data_nascimento__gt=timezone.now().date() - timedelta(days=365*idade_max)
-            ).count()
-        
-        pets_idade.append({
-            'faixa': f'{idade_min}-{idade_max if i < 4 else "+"} anos',
-            'total': count
-        })
+def _percentil(valores, percentual):
+    """Percentil com interpolação linear sobre uma lista já ordenada"""
+    posicao = (len(valores) - 1) * percentual / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (posicao - inferior)
+
+def get_saude_animal_data(faixas_idade=None):
+    """Dados de saúde animal
     
-    # Distribuição por peso (para cães e gatos)
+    Args:
+        faixas_idade (list[int]): limites das faixas de idade em anos; o
+            padrão vem de ``settings.DASHBOARD_FAIXAS_IDADE``
+    """
+    hoje = timezone.localdate()
+    if faixas_idade is None:
+        faixas_idade = getattr(settings, 'DASHBOARD_FAIXAS_IDADE', [0, 2, 4, 6, 8])
+    faixas_idade = sorted(faixas_idade)
+    
+    # Distribuição por idade: todas as faixas em uma única agregação
+    faixas = []
+    for i, idade_min in enumerate(faixas_idade):
+        idade_max = faixas_idade[i + 1] if i + 1 < len(faixas_idade) else None
+        filtro = Q(data_nascimento__lte=hoje - timedelta(days=365 * idade_min))
+        if idade_max is not None:
+            filtro &= Q(data_nascimento__gt=hoje - timedelta(days=365 * idade_max))
+        faixas.append((f'{idade_min}-{idade_max if idade_max is not None else "+"} anos', filtro))
+    
+    totais_idade = Pet.objects.aggregate(**{
+        f'faixa_{i}': Count('id', filter=filtro) for i, (faixa, filtro) in enumerate(faixas)
+    }) if faixas else {}
+    pets_idade = [
+        {'faixa': faixa, 'total': totais_idade[f'faixa_{i}']}
+        for i, (faixa, filtro) in enumerate(faixas)
+    ]
+    
+    # Estatísticas de peso de todas as espécies em uma única leitura
+    pesos = {}
+    for especie, peso in Pet.objects.filter(peso__isnull=False).values_list('especie', 'peso').order_by():
+        pesos.setdefault(especie, []).append(float(peso))
+    
+    ordem_especies = [codigo for codigo, nome in Pet.ESPECIES]
     pets_peso = []
-    especies_peso = ['CACHORRO', 'GATO']
-    
-    for especie in especies_peso:
-        pets = Pet.objects.filter(especie=especie, peso__isnull=False)
-        if pets.exists():
-            peso_medio = pets.aggregate(Avg('peso'))['peso__avg']
-            pets_peso.append({
-                'especie': especie,
-                'peso_medio': round(peso_medio, 1)
-            })
+    for especie in sorted(pesos, key=lambda e: ordem_especies.index(e) if e in ordem_especies else len(ordem_especies)):
+        valores = sorted(pesos[especie])
+        pets_peso.append({
+            'especie': especie,
+            'total': len(valores),
+            'peso_medio': round(sum(valores) / len(valores), 1),
+            'peso_mediano': round(_percentil(valores, 50), 1),
+            'peso_p10': round(_percentil(valores, 10), 1),
+            'peso_p90': round(_percentil(valores, 90), 1),
+        })
     
     # Consultas por motivo
     motivos_consultas = Consulta.objects.values('motivo').annotate(
@@ -0,0 +1,39 @@
+"""
+Executor dos testes (``manage.py test``) com cache isolado.
+
+O L2 configurado em ``settings.CACHES`` é o arquivo (ou memcached) usado
+pelo servidor; os testes limpam e preenchem o cache com dados do banco de
+teste. Durante os testes cada alias que não é ``CacheEmCamadas`` vira um
+``LocMemCache`` próprio, e os ``CacheEmCamadas`` recebem outro LOCATION
+(outro L1), mantendo as opções de camadas e namespaces.
+"""
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+CAMADAS = 'core.cache_backends.CacheEmCamadas'
+
+
+def caches_de_teste(configurados, prefixo='testes'):
+    caches = {}
+    for alias, configuracao in configurados.items():
+        if configuracao.get('BACKEND') == CAMADAS:
+            caches[alias] = {**configuracao, 'LOCATION': f"{prefixo}-{configuracao.get('LOCATION', alias)}"}
+        else:
+            caches[alias] = {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'{prefixo}-{alias}',
+            }
+    return caches
+
+
+class ExecutorTestes(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_isolado = override_settings(CACHES=caches_de_teste(settings.CACHES))
+        self._cache_isolado.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_isolado.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,201 @@
+"""
+Listagens que combinam consultas e agendamentos em uma única consulta SQL.
+
+``feed_consultas`` alimenta a listagem de consultas e ``historico_pet`` a
+linha do tempo de um pet. ``eventos_calendario`` monta os eventos do
+calendário da agenda para o intervalo visível.
+
+Os dois lados são projetados nas mesmas colunas e unidos com UNION ALL, de
+modo que a ordenação e o LIMIT/OFFSET da paginação acontecem no banco e
+apenas as linhas da página são trazidas para o Python.
+"""
+
+from datetime import datetime
+
+from django.db.models import CharField, F, Value
+from django.urls import reverse
+from django.utils import timezone
+
+from .busca import filtro_busca
+from .models import Agenda, Consulta
+
+ORIGEM_CONSULTA = 'consulta'
+ORIGEM_AGENDA = 'agenda'
+
+# Colunas comuns às linhas do feed; a ordem precisa ser a mesma nos dois lados
+CAMPOS_FEED = ['id', 'data_hora', 'veterinario', 'status']
+
+
+def _projetar(queryset, origem, resumo, filtro=None):
+    queryset = queryset.annotate(
+        origem=Value(origem, output_field=CharField()),
+        resumo=F(resumo),
+        pet_nome=F('pet__nome'),
+        pet_foto=F('pet__foto'),
+        dono_nome=F('pet__dono__nome'),
+    )
+    if filtro is not None:
+        queryset = queryset.filter(filtro)
+    return queryset.values(*CAMPOS_FEED, 'origem', 'resumo', 'pet_nome', 'pet_foto', 'dono_nome').order_by()
+
+
+def _filtro_pet(query):
+    return filtro_busca('busca_pet', query, ['pet__nome'], campo_id='pet_id', colunas=['nome'])
+
+
+# Ordenação do feed; ``id`` desempata dentro de cada origem
+ORDENACAO_FEED = ['-data_hora', 'origem', '-id']
+
+
+def feed_consultas(status='', query='', filtro=None):
+    """
+    Consultas e agendamentos confirmados, dos mais recentes para os mais antigos.
+
+    Cada linha é um dicionário com ``id``, ``data_hora``, ``veterinario``,
+    ``status``, ``origem`` ('consulta' ou 'agenda'), ``resumo`` (motivo ou
+    título), ``pet_nome``, ``pet_foto`` e ``dono_nome``.
+
+    Args:
+        status (str): filtra as consultas pelo status
+        query (str): texto buscado no pet, motivo/título e diagnóstico/descrição
+        filtro (Q): condição extra aplicada aos dois lados da união, sobre as
+            colunas do feed (usada pela paginação por cursor)
+    """
+    consultas = Consulta.objects.all()
+    if status:
+        consultas = consultas.filter(status=status)
+    if query:
+        consultas = consultas.filter(
+            filtro_busca('busca_consulta', query, ['motivo', 'diagnostico']) | _filtro_pet(query)
+        )
+
+    agendamentos = Agenda.objects.filter(status='CONFIRMADO')
+    if query:
+        agendamentos = agendamentos.filter(
+            filtro_busca('busca_agenda', query, ['titulo', 'descricao']) | _filtro_pet(query)
+        )
+
+    return _projetar(consultas, ORIGEM_CONSULTA, 'motivo', filtro).union(
+        _projetar(agendamentos, ORIGEM_AGENDA, 'titulo', filtro), all=True
+    ).order_by(*ORDENACAO_FEED)
+
+
+# Colunas da linha do tempo de um pet; ``resumo`` é o motivo da consulta ou
+# o título do agendamento, ``detalhe`` o diagnóstico ou a descrição e
+# ``categoria`` o tipo do agendamento (vazio nas consultas)
+CAMPOS_HISTORICO = ['id', 'data_hora', 'status', 'veterinario', 'origem', 'categoria', 'resumo', 'detalhe']
+
+
+def _projetar_historico(queryset, origem, categoria, resumo, detalhe, filtro=None):
+    queryset = queryset.annotate(
+        origem=Value(origem, output_field=CharField()),
+        categoria=categoria,
+        resumo=F(resumo),
+        detalhe=F(detalhe),
+    )
+    if filtro is not None:
+        queryset = queryset.filter(filtro)
+    return queryset.values(*CAMPOS_HISTORICO).order_by()
+
+
+def historico_pet(pet_id, ano=None, origem='', filtro=None):
+    """
+    Consultas e agendamentos do pet, dos mais recentes para os mais antigos.
+
+    Args:
+        pet_id (int): pet cujo histórico é listado
+        ano (int): restringe ao ano (no fuso local)
+        origem (str): 'consulta' ou 'agenda' para listar apenas um dos tipos
+        filtro (Q): condição extra sobre as colunas do histórico (paginação)
+    """
+    consultas = Consulta.objects.filter(pet_id=pet_id)
+    agendamentos = Agenda.objects.filter(pet_id=pet_id)
+    if ano:
+        # Intervalo em vez de data_hora__year, para usar o índice (pet, data_hora)
+        inicio = timezone.make_aware(datetime(ano, 1, 1))
+        fim = timezone.make_aware(datetime(ano + 1, 1, 1))
+        consultas = consultas.filter(data_hora__gte=inicio, data_hora__lt=fim)
+        agendamentos = agendamentos.filter(data_hora__gte=inicio, data_hora__lt=fim)
+
+    consultas = _projetar_historico(
+        consultas, ORIGEM_CONSULTA, Value('', output_field=CharField()), 'motivo', 'diagnostico', filtro
+    )
+    agendamentos = _projetar_historico(agendamentos, ORIGEM_AGENDA, F('tipo'), 'titulo', 'descricao', filtro)
+    if origem == ORIGEM_CONSULTA:
+        return consultas.order_by(*ORDENACAO_FEED)
+    if origem == ORIGEM_AGENDA:
+        return agendamentos.order_by(*ORDENACAO_FEED)
+    return consultas.union(agendamentos, all=True).order_by(*ORDENACAO_FEED)
+
+
+def descrever_historico(linha):
+    """Acrescenta rótulos e URL de detalhe a uma linha de ``historico_pet``"""
+    if linha['origem'] == ORIGEM_CONSULTA:
+        status = dict(Consulta.STATUS)
+        linha['tipo_display'] = 'Consulta'
+        linha['url'] = reverse('core:consulta_detail', args=[linha['id']])
+    else:
+        status = dict(Agenda.STATUS)
+        linha['tipo_display'] = f"Agendamento - {dict(Agenda.TIPO).get(linha['categoria'], linha['categoria'])}"
+        linha['url'] = reverse('core:agenda_detail', args=[linha['id']])
+    linha['status_display'] = status.get(linha['status'], linha['status'])
+    return linha
+
+
+# Cores dos eventos do calendário
+COR_AGENDA = '#007bff'
+COR_AGENDA_CONCLUIDA = '#28a745'
+CORES_CONSULTA = {
+    'AGENDADA': '#007bff',
+    'CONFIRMADA': '#fd7e14',
+    'REALIZADA': '#28a745',
+    'CANCELADA': '#dc3545',
+}
+DETALHE_MAXIMO = 200
+
+
+def eventos_calendario(inicio, fim, veterinario='', tipo=''):
+    """
+    Eventos do calendário (formato do FullCalendar) com início em [inicio, fim).
+
+    Faz uma consulta ``values()`` por modelo. ``tipo`` filtra os agendamentos
+    pelo tipo; as consultas só entram sem filtro de tipo ou com 'CONSULTA'.
+    Campos além de id/title/start/url/color vão para ``extendedProps``.
+    """
+    agendamentos = Agenda.objects.filter(data_hora__gte=inicio, data_hora__lt=fim)
+    consultas = Consulta.objects.filter(data_hora__gte=inicio, data_hora__lt=fim)
+    if veterinario:
+        agendamentos = agendamentos.filter(veterinario=veterinario)
+        consultas = consultas.filter(veterinario=veterinario)
+    if tipo:
+        agendamentos = agendamentos.filter(tipo=tipo)
+
+    tipos = dict(Agenda.TIPO)
+    eventos = [{
+        'id': f"a{agenda['id']}",
+        'title': f"{agenda['titulo']} ({agenda['pet__nome']}) - {agenda['veterinario']}",
+        'start': timezone.localtime(agenda['data_hora']).isoformat(),
+        'url': reverse('core:agenda_detail', args=[agenda['id']]),
+        'color': COR_AGENDA_CONCLUIDA if agenda['concluido'] else COR_AGENDA,
+        'tipo': tipos.get(agenda['tipo'], agenda['tipo']),
+        'pet': agenda['pet__nome'],
+        'detalhe': agenda['descricao'][:DETALHE_MAXIMO],
+    } for agenda in agendamentos.order_by('data_hora', 'id').values(
+        'id', 'titulo', 'data_hora', 'tipo', 'concluido', 'veterinario', 'descricao', 'pet__nome',
+    )]
+
+    if tipo in ('', 'CONSULTA'):
+        eventos += [{
+            'id': f"c{consulta['id']}",
+            'title': f"Consulta: {consulta['pet__nome']}",
+            'start': timezone.localtime(consulta['data_hora']).isoformat(),
+            'url': reverse('core:consulta_detail', args=[consulta['id']]),
+            'color': CORES_CONSULTA.get(consulta['status'], COR_AGENDA),
+            'tipo': 'Consulta',
+            'pet': consulta['pet__nome'],
+            'detalhe': consulta['observacoes'][:DETALHE_MAXIMO],
+        } for consulta in consultas.order_by('data_hora', 'id').values(
+            'id', 'data_hora', 'status', 'observacoes', 'pet__nome',
+        )]
+    return eventos
+
@@ -0,0 +1,55 @@
+"""
+Versões por modelo para o cache de fragmentos de template.
+
+Cada modelo listado em ``MODELOS_VERSIONADOS`` tem um contador no cache,
+incrementado após o commit de qualquer save/delete. Os templates usam as
+versões dos modelos que exibem como parte da chave do ``{% cache %}``; após
+uma alteração a chave antiga deixa de ser usada e expira sozinha, como no
+cache do dashboard (core/dashboard_cache.py).
+"""
+
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Agenda, Consulta, Dono, Pet
+
+MODELOS_VERSIONADOS = (Dono, Pet, Consulta, Agenda)
+
+
+def _chave(modelo):
+    return f'fragmentos:versao:{modelo._meta.model_name}'
+
+
+def versoes_modelos():
+    """
+    Versão atual de cada modelo, pelo nome (ex: ``{'pet': ..., 'dono': ...}``).
+
+    Uma única leitura do cache; contadores ausentes recebem um valor novo
+    (e não 1), para não reaproveitar fragmentos de uma versão anterior.
+    """
+    chaves = {_chave(modelo): modelo._meta.model_name for modelo in MODELOS_VERSIONADOS}
+    valores = cache.get_many(chaves)
+    for chave in chaves.keys() - valores.keys():
+        cache.add(chave, time.time_ns(), None)
+        valores[chave] = cache.get(chave)
+    return {nome: valores[chave] for chave, nome in chaves.items()}
+
+
+def incrementar_versao(modelo):
+    try:
+        cache.incr(_chave(modelo))
+    except ValueError:
+        cache.add(_chave(modelo), time.time_ns(), None)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def versionar_ao_alterar(sender, **kwargs):
+    if sender in MODELOS_VERSIONADOS:
+        # Após o commit, pelo mesmo motivo do cache do dashboard
+        transaction.on_commit(partial(incrementar_versao, sender))
@@ -0,0 +1,76 @@
+"""
+Medição de tempo e de consultas SQL executadas por um trecho de código.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import connections
+
+
+@contextmanager
+def medir_consultas(using='default'):
+    """
+    Conta as consultas SQL e o tempo gasto dentro do bloco.
+
+    Funciona com ou sem DEBUG, pois usa ``execute_wrapper`` em vez de
+    ``connection.queries``::
+
+        with medir_consultas() as medicao:
+            ...
+        medicao['consultas'], medicao['tempo_ms']
+    """
+    medicao = {'consultas': 0, 'tempo_ms': 0.0}
+
+    def contar(execute, sql, params, many, context):
+        medicao['consultas'] += 1
+        return execute(sql, params, many, context)
+
+    inicio = time.perf_counter()
+    try:
+        with connections[using].execute_wrapper(contar):
+            yield medicao
+    finally:
+        medicao['tempo_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+
+
+def instrumentar(linhas=None, logger_name='core.dashboard'):
+    """
+    Decorador que registra, em nível DEBUG, o tempo, as consultas SQL e a
+    quantidade de linhas de cada chamada da função decorada.
+
+    Os valores seguem como atributos do registro de log (``funcao``,
+    ``tempo_ms``, ``consultas``, ``linhas``), prontos para formatadores
+    estruturados. Com DEBUG desabilitado para o logger, a função é chamada
+    diretamente, sem custo de medição.
+
+    Args:
+        linhas: função que recebe o resultado e retorna o número de linhas
+        logger_name (str): nome do logger usado
+    """
+    logger = logging.getLogger(logger_name)
+
+    def decorador(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not logger.isEnabledFor(logging.DEBUG):
+                return func(*args, **kwargs)
+
+            with medir_consultas() as medicao:
+                resultado = func(*args, **kwargs)
+            total_linhas = linhas(resultado) if linhas is not None else None
+            logger.debug(
+                '%s: %.2f ms, %d consultas, %s linhas',
+                func.__name__, medicao['tempo_ms'], medicao['consultas'], total_linhas,
+                extra={
+                    'funcao': func.__name__,
+                    'tempo_ms': medicao['tempo_ms'],
+                    'consultas': medicao['consultas'],
+                    'linhas': total_linhas,
+                },
+            )
+            return resultado
+        return wrapper
+    return decorador
@@ -0,0 +1,91 @@
+import json
+import platform
+import subprocess
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.benchmark import banco_temporario, gerar_dados, medir_alvos
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos (10k/100k/1M consultas) em um banco temporário e mede '
+        'os tipos do dashboard_api e as listagens, gravando os resultados em JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos', nargs='+', type=int, default=[10_000, 100_000, 1_000_000],
+            help='Números de consultas dos conjuntos de dados (padrão: 10000 100000 1000000)',
+        )
+        parser.add_argument('--repeticoes', type=int, default=3, help='Medições por URL')
+        parser.add_argument('--semente', type=int, default=42, help='Semente dos dados gerados')
+        parser.add_argument(
+            '--saida', default='benchmark.json',
+            help='Arquivo JSON de resultados (use "-" para a saída padrão)',
+        )
+
+    def handle(self, *args, **options):
+        referencia = timezone.localdate()
+        relatorio = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit_atual(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'banco': connection.vendor,
+            'semente': options['semente'],
+            'referencia': referencia.isoformat(),
+            'repeticoes': options['repeticoes'],
+            'conjuntos': [],
+        }
+
+        for tamanho in options['tamanhos']:
+            relatorio['conjuntos'].append(self.medir_conjunto(tamanho, referencia, options))
+
+        conteudo = json.dumps(relatorio, indent=2, ensure_ascii=False)
+        if options['saida'] == '-':
+            self.stdout.write(conteudo)
+        else:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(conteudo + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {options['saida']}"))
+
+    def medir_conjunto(self, tamanho, referencia, options):
+        # Cada conjunto usa um banco de teste novo e um cache em memória; o
+        # banco e o cache do servidor não são tocados
+        with banco_temporario():
+            self.stderr.write(f'Gerando {tamanho} consultas...')
+            inicio = timezone.now()
+            totais = gerar_dados(tamanho, options['semente'], referencia)
+            geracao_s = round((timezone.now() - inicio).total_seconds(), 1)
+
+            # Excessos de orçamento entram no resultado em vez de interromper a medição
+            with override_settings(ORCAMENTO_CONSULTAS_ERRO=False):
+                resultados = medir_alvos(options['repeticoes'])
+
+        for alvo, medicao in resultados.items():
+            self.stderr.write(
+                f"  {alvo:45} {medicao['mediana_ms']:>10.2f} ms  {medicao['consultas']:>4} consultas"
+            )
+        return {
+            'consultas': tamanho,
+            'registros': totais,
+            'geracao_s': geracao_s,
+            'resultados': resultados,
+        }
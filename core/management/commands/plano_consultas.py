@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.benchmark import banco_temporario, comparar_indices, gerar_dados
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos em um banco temporário e mostra o plano de execução '
+        '(EXPLAIN QUERY PLAN) e o tempo das consultas frequentes, com e sem os índices dos modelos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consultas', type=int, default=100_000, help='Número de consultas geradas')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Execuções por consulta')
+        parser.add_argument('--semente', type=int, default=42, help='Semente dos dados gerados')
+        parser.add_argument('--saida', help='Grava também os resultados neste arquivo JSON')
+
+    def handle(self, *args, **options):
+        # Banco de teste novo e cache em memória; o banco e o cache do servidor não são tocados
+        with banco_temporario():
+            self.stderr.write(f"Gerando {options['consultas']} consultas...")
+            gerar_dados(options['consultas'], options['semente'], timezone.localdate())
+            resultados = comparar_indices(options['repeticoes'])
+
+        for nome, medicoes in resultados.items():
+            com, sem = medicoes['com_indices'], medicoes['sem_indices']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{nome}: {sem['mediana_ms']:.2f} ms sem índices -> {com['mediana_ms']:.2f} ms com índices"
+            ))
+            for rotulo, medicao in (('sem', sem), ('com', com)):
+                for linha in medicao['plano']:
+                    self.stdout.write(f'  [{rotulo}] {linha}')
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump({
+                    'consultas': options['consultas'],
+                    'semente': options['semente'],
+                    'resultados': resultados,
+                }, arquivo, indent=2, ensure_ascii=False)
+                arquivo.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {options['saida']}"))
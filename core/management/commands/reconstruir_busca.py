@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.busca import fts_disponivel, instalar_busca
+
+
+class Command(BaseCommand):
+    help = 'Recria os gatilhos e reindexa as tabelas de busca textual (FTS5)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not fts_disponivel(using):
+            self.stdout.write(self.style.WARNING('Busca FTS indisponível neste banco; nada a fazer.'))
+            return
+        instalar_busca(connections[using], reconstruir=True)
+        self.stdout.write(self.style.SUCCESS('Índices de busca reconstruídos.'))
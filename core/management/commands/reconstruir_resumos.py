@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.resumos import reconstruir_resumos
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a tabela de resumos diários do dashboard a partir de Consulta e Agenda'
+
+    def handle(self, *args, **options):
+        total = reconstruir_resumos()
+        self.stdout.write(self.style.SUCCESS(f'{total} linhas de resumo geradas.'))
@@ -0,0 +1,265 @@
+"""
+Orçamento de consultas SQL por requisição.
+
+Para cada requisição com URL nomeada, o middleware conta as consultas, soma
+o tempo gasto no banco e agrupa as consultas repetidas por "impressão
+digital" (o SQL com parâmetros e listas IN normalizados). Consultas
+repetidas muitas vezes costumam indicar N+1, como ``item.pet.dono.nome``
+dentro de um laço no template.
+
+Configuração (settings.py):
+
+    ORCAMENTO_CONSULTAS = {'core:pet_list': 10}   # limite por nome de URL
+    ORCAMENTO_CONSULTAS_PADRAO = 50               # demais URLs (None = sem limite)
+    ORCAMENTO_CONSULTAS_ERRO = DEBUG              # levanta exceção em vez de registrar
+
+A exceção vale apenas para as URLs listadas em ORCAMENTO_CONSULTAS. As
+demais (admin, views de terceiros) usam o orçamento padrão só para o
+registro e o log, mesmo com ORCAMENTO_CONSULTAS_ERRO.
+
+As medições mais recentes ficam em memória (por processo) e são resumidas
+na página ``core:orcamento_consultas``, restrita à equipe.
+
+A medição da requisição fica em uma ContextVar, lida por um wrapper
+instalado em todas as conexões. Assim são contadas também as consultas de
+outras threads que recebem o contexto da requisição: as de views síncronas
+sob ASGI e as do pool de widgets de ``dashboard_api_async``. Não entram as
+consultas feitas depois da resposta (widgets que passaram do prazo e
+terminam em segundo plano).
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('core.orcamento')
+
+MAX_REGISTROS = 500
+
+_registros = deque(maxlen=MAX_REGISTROS)
+_trava = threading.Lock()
+
+_LISTA_IN = re.compile(r'\bIN \((?:%s, )*%s\)')
+_NUMEROS = re.compile(r'\b\d+\b')
+_TEXTOS = re.compile(r"'(?:[^']|'')*'")
+
+
+class OrcamentoConsultasExcedido(Exception):
+    """Levantada quando uma view excede seu orçamento de consultas"""
+
+
+def impressao_digital(sql):
+    """Normaliza o SQL para agrupar consultas que só diferem nos parâmetros"""
+    normalizado = _LISTA_IN.sub('IN (...)', sql)
+    normalizado = _TEXTOS.sub('?', normalizado)
+    normalizado = _NUMEROS.sub('?', normalizado)
+    return normalizado
+
+
+def orcamento_da_url(nome_url):
+    """Limite de consultas da URL, ou None se não houver"""
+    orcamentos = getattr(settings, 'ORCAMENTO_CONSULTAS', {})
+    if nome_url in orcamentos:
+        return orcamentos[nome_url]
+    return getattr(settings, 'ORCAMENTO_CONSULTAS_PADRAO', None)
+
+
+def orcamento_obrigatorio(nome_url):
+    """Indica se exceder o orçamento da URL levanta exceção (só URLs com orçamento próprio)"""
+    return getattr(settings, 'ORCAMENTO_CONSULTAS_ERRO', False) and nome_url in getattr(
+        settings, 'ORCAMENTO_CONSULTAS', {}
+    )
+
+
+def registros_recentes():
+    with _trava:
+        return list(_registros)
+
+
+def limpar_registros():
+    with _trava:
+        _registros.clear()
+
+
+def resumo_por_url(limite=20):
+    """
+    Agrupa as medições recentes por URL, das piores para as melhores.
+
+    A ordenação considera o maior número de consultas observado e, em
+    seguida, o tempo médio no banco.
+    """
+    agrupado = {}
+    for registro in registros_recentes():
+        item = agrupado.setdefault(registro['url'], {
+            'url': registro['url'],
+            'requisicoes': 0,
+            'excedidas': 0,
+            'max_consultas': 0,
+            'soma_consultas': 0,
+            'soma_tempo_ms': 0.0,
+            'max_tempo_ms': 0.0,
+            'orcamento': registro['orcamento'],
+            'repetidas': Counter(),
+            'exemplos': {},
+        })
+        item['requisicoes'] += 1
+        item['excedidas'] += registro['excedeu']
+        item['max_consultas'] = max(item['max_consultas'], registro['consultas'])
+        item['soma_consultas'] += registro['consultas']
+        item['soma_tempo_ms'] += registro['tempo_ms']
+        item['max_tempo_ms'] = max(item['max_tempo_ms'], registro['tempo_ms'])
+        for repetida in registro['repetidas']:
+            chave = repetida['chave']
+            item['repetidas'][chave] = max(item['repetidas'][chave], repetida['vezes'])
+            item['exemplos'][chave] = repetida['sql']
+
+    resumo = []
+    for item in agrupado.values():
+        requisicoes = item['requisicoes']
+        resumo.append({
+            'url': item['url'],
+            'requisicoes': requisicoes,
+            'excedidas': item['excedidas'],
+            'orcamento': item['orcamento'],
+            'max_consultas': item['max_consultas'],
+            'media_consultas': round(item['soma_consultas'] / requisicoes, 1),
+            'media_tempo_ms': round(item['soma_tempo_ms'] / requisicoes, 2),
+            'max_tempo_ms': item['max_tempo_ms'],
+            'repetidas': [
+                {'sql': item['exemplos'][chave], 'vezes': vezes}
+                for chave, vezes in item['repetidas'].most_common(3)
+            ],
+        })
+    resumo.sort(key=lambda item: (item['max_consultas'], item['media_tempo_ms']), reverse=True)
+    return resumo[:limite]
+
+
+class _Medicao:
+    """Consultas e tempo no banco de uma requisição, somados de qualquer thread"""
+
+    def __init__(self):
+        self.consultas = Counter()
+        self.tempo = 0.0
+        self.trava = threading.Lock()
+
+    def somar(self, sql, tempo):
+        chave = impressao_digital(sql)
+        with self.trava:
+            self.consultas[chave] += 1
+            self.tempo += tempo
+
+
+_medicao_atual = ContextVar('orcamento_medicao', default=None)
+
+
+def _medir(execute, sql, params, many, context):
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.somar(sql, time.perf_counter() - inicio)
+
+
+def _instalar(connection):
+    if _medir not in connection.execute_wrappers:
+        # No início da lista: execute_wrapper() remove sempre o último
+        connection.execute_wrappers.insert(0, _medir)
+
+
+@receiver(connection_created)
+def instalar_medicao(sender, connection, **kwargs):
+    _instalar(connection)
+
+
+class OrcamentoConsultasMiddleware:
+    """Mede as consultas SQL de cada requisição e aplica o orçamento da view"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Conexão aberta antes de o middleware ser carregado
+        _instalar(connections['default'])
+        medicao = _Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        return self.concluir(request, response, medicao)
+
+    async def __acall__(self, request):
+        medicao = _Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        return self.concluir(request, response, medicao)
+
+    def concluir(self, request, response, medicao):
+        match = getattr(request, 'resolver_match', None)
+        if match is None or not match.view_name:
+            return response
+
+        with medicao.trava:
+            consultas, tempo = Counter(medicao.consultas), medicao.tempo
+        self.registrar(match.view_name, consultas, tempo * 1000)
+        return response
+
+    def registrar(self, nome_url, consultas, tempo_ms):
+        total = sum(consultas.values())
+        orcamento = orcamento_da_url(nome_url)
+        excedeu = orcamento is not None and total > orcamento
+        repetidas = [
+            {
+                'chave': hashlib.sha1(sql.encode()).hexdigest()[:12],
+                'sql': sql[:300],
+                'vezes': vezes,
+            }
+            for sql, vezes in consultas.most_common()
+            if vezes > 1
+        ]
+        with _trava:
+            _registros.append({
+                'url': nome_url,
+                'consultas': total,
+                'tempo_ms': round(tempo_ms, 2),
+                'orcamento': orcamento,
+                'excedeu': excedeu,
+                'repetidas': repetidas,
+            })
+
+        if not excedeu:
+            return
+        mensagem = (
+            f'{nome_url}: {total} consultas SQL (orçamento {orcamento}, '
+            f'{tempo_ms:.2f} ms no banco)'
+        )
+        if repetidas:
+            mensagem += f"; repetida {repetidas[0]['vezes']}x: {repetidas[0]['sql']}"
+        if orcamento_obrigatorio(nome_url):
+            raise OrcamentoConsultasExcedido(mensagem)
+        logger.warning(mensagem, extra={
+            'url': nome_url, 'consultas': total, 'orcamento': orcamento, 'tempo_ms': tempo_ms,
+        })
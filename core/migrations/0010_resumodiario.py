@@ -0,0 +1,65 @@
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def popular_resumos(apps, schema_editor):
+    ResumoDiario = apps.get_model('core', 'ResumoDiario')
+    origens = (
+        ('CONSULTA', apps.get_model('core', 'Consulta'), ['veterinario', 'status', 'pet__especie']),
+        ('AGENDA', apps.get_model('core', 'Agenda'), ['veterinario', 'status', 'pet__especie', 'tipo']),
+    )
+
+    resumos = []
+    for origem, modelo, campos in origens:
+        linhas = (modelo.objects
+                  .annotate(dia=TruncDate('data_hora'))
+                  .values('dia', *campos)
+                  .annotate(quantidade=Count('id'))
+                  .order_by())
+        for linha in linhas:
+            resumos.append(ResumoDiario(
+                origem=origem,
+                dia=linha['dia'],
+                veterinario=linha['veterinario'],
+                status=linha['status'],
+                tipo=linha.get('tipo', ''),
+                especie=linha['pet__especie'],
+                quantidade=linha['quantidade'],
+            ))
+    ResumoDiario.objects.bulk_create(resumos, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_corrigir_nomes_veterinarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origem', models.CharField(choices=[('CONSULTA', 'Consulta'), ('AGENDA', 'Agenda')], max_length=10)),
+                ('dia', models.DateField()),
+                ('veterinario', models.CharField(max_length=100)),
+                ('status', models.CharField(max_length=20)),
+                ('tipo', models.CharField(blank=True, max_length=20)),
+                ('especie', models.CharField(max_length=20)),
+                ('quantidade', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumo diário',
+                'verbose_name_plural': 'Resumos diários',
+                'ordering': ['dia'],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('origem', 'dia', 'veterinario', 'status', 'tipo', 'especie'),
+                        name='resumo_diario_chave_unica',
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(popular_resumos, reverse_code=migrations.RunPython.noop),
+    ]
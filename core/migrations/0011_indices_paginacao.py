@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_resumodiario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dono',
+            index=models.Index(fields=['nome', 'id'], name='dono_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['nome', 'id'], name='pet_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['data_hora', 'id'], name='consulta_data_hora_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicacao',
+            index=models.Index(fields=['nome', 'id'], name='medicacao_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agenda',
+            index=models.Index(fields=['data_hora', 'id'], name='agenda_data_hora_id_idx'),
+        ),
+    ]
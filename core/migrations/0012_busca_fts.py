@@ -0,0 +1,119 @@
+from django.db import migrations
+
+# SQL fixo, sem importar core.busca: alterações posteriores no módulo não
+# mudam o que esta migração faz em bancos novos nem na reversão.
+
+TOKENIZADOR = "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'"
+
+
+def _so_digitos(coluna):
+    for caractere in '.-()/+ ':
+        coluna = f"replace({coluna}, '{caractere}', '')"
+    return coluna
+
+
+DIGITOS_NOVO = f"{_so_digitos('new.cpf')} || ' ' || {_so_digitos('new.telefone')}"
+DIGITOS = f"{_so_digitos('cpf')} || ' ' || {_so_digitos('telefone')}"
+
+INSERIR_PET = (
+    "INSERT INTO busca_pet(rowid, nome, dono, especie, raca) "
+    "SELECT new.id, new.nome, d.nome, new.especie, new.raca FROM core_dono d WHERE d.id = new.dono_id;"
+)
+INSERIR_DONO = (
+    "INSERT INTO busca_dono(rowid, nome, cpf, email, digitos) "
+    f"VALUES (new.id, new.nome, new.cpf, new.email, {DIGITOS_NOVO});"
+)
+
+CRIAR_TABELAS = [
+    "CREATE VIRTUAL TABLE busca_consulta USING fts5("
+    f"motivo, diagnostico, content='core_consulta', content_rowid='id', {TOKENIZADOR})",
+    "CREATE VIRTUAL TABLE busca_agenda USING fts5("
+    f"titulo, descricao, content='core_agenda', content_rowid='id', {TOKENIZADOR})",
+    "CREATE VIRTUAL TABLE busca_medicacao USING fts5("
+    f"nome, descricao, content='core_medicacao', content_rowid='id', {TOKENIZADOR})",
+    f"CREATE VIRTUAL TABLE busca_pet USING fts5(nome, dono, especie, raca, {TOKENIZADOR})",
+    f"CREATE VIRTUAL TABLE busca_dono USING fts5(nome, cpf, email, digitos, {TOKENIZADOR})",
+]
+
+CRIAR_GATILHOS = [
+    "CREATE TRIGGER busca_consulta_ai AFTER INSERT ON core_consulta BEGIN "
+    "INSERT INTO busca_consulta(rowid, motivo, diagnostico) VALUES (new.id, new.motivo, new.diagnostico); END",
+    "CREATE TRIGGER busca_consulta_ad AFTER DELETE ON core_consulta BEGIN "
+    "INSERT INTO busca_consulta(busca_consulta, rowid, motivo, diagnostico) "
+    "VALUES ('delete', old.id, old.motivo, old.diagnostico); END",
+    "CREATE TRIGGER busca_consulta_au AFTER UPDATE ON core_consulta BEGIN "
+    "INSERT INTO busca_consulta(busca_consulta, rowid, motivo, diagnostico) "
+    "VALUES ('delete', old.id, old.motivo, old.diagnostico); "
+    "INSERT INTO busca_consulta(rowid, motivo, diagnostico) VALUES (new.id, new.motivo, new.diagnostico); END",
+    "CREATE TRIGGER busca_agenda_ai AFTER INSERT ON core_agenda BEGIN "
+    "INSERT INTO busca_agenda(rowid, titulo, descricao) VALUES (new.id, new.titulo, new.descricao); END",
+    "CREATE TRIGGER busca_agenda_ad AFTER DELETE ON core_agenda BEGIN "
+    "INSERT INTO busca_agenda(busca_agenda, rowid, titulo, descricao) "
+    "VALUES ('delete', old.id, old.titulo, old.descricao); END",
+    "CREATE TRIGGER busca_agenda_au AFTER UPDATE ON core_agenda BEGIN "
+    "INSERT INTO busca_agenda(busca_agenda, rowid, titulo, descricao) "
+    "VALUES ('delete', old.id, old.titulo, old.descricao); "
+    "INSERT INTO busca_agenda(rowid, titulo, descricao) VALUES (new.id, new.titulo, new.descricao); END",
+    "CREATE TRIGGER busca_medicacao_ai AFTER INSERT ON core_medicacao BEGIN "
+    "INSERT INTO busca_medicacao(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao); END",
+    "CREATE TRIGGER busca_medicacao_ad AFTER DELETE ON core_medicacao BEGIN "
+    "INSERT INTO busca_medicacao(busca_medicacao, rowid, nome, descricao) "
+    "VALUES ('delete', old.id, old.nome, old.descricao); END",
+    "CREATE TRIGGER busca_medicacao_au AFTER UPDATE ON core_medicacao BEGIN "
+    "INSERT INTO busca_medicacao(busca_medicacao, rowid, nome, descricao) "
+    "VALUES ('delete', old.id, old.nome, old.descricao); "
+    "INSERT INTO busca_medicacao(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao); END",
+    f"CREATE TRIGGER busca_pet_ai AFTER INSERT ON core_pet BEGIN {INSERIR_PET} END",
+    "CREATE TRIGGER busca_pet_ad AFTER DELETE ON core_pet BEGIN DELETE FROM busca_pet WHERE rowid = old.id; END",
+    "CREATE TRIGGER busca_pet_au AFTER UPDATE ON core_pet BEGIN "
+    f"DELETE FROM busca_pet WHERE rowid = old.id; {INSERIR_PET} END",
+    f"CREATE TRIGGER busca_dono_ai AFTER INSERT ON core_dono BEGIN {INSERIR_DONO} END",
+    "CREATE TRIGGER busca_dono_ad AFTER DELETE ON core_dono BEGIN DELETE FROM busca_dono WHERE rowid = old.id; END",
+    "CREATE TRIGGER busca_dono_au AFTER UPDATE ON core_dono BEGIN "
+    f"DELETE FROM busca_dono WHERE rowid = old.id; {INSERIR_DONO} "
+    "UPDATE busca_pet SET dono = new.nome WHERE rowid IN (SELECT id FROM core_pet WHERE dono_id = new.id); END",
+]
+
+INDEXAR = [
+    "INSERT INTO busca_consulta(busca_consulta) VALUES ('rebuild')",
+    "INSERT INTO busca_agenda(busca_agenda) VALUES ('rebuild')",
+    "INSERT INTO busca_medicacao(busca_medicacao) VALUES ('rebuild')",
+    "INSERT INTO busca_pet(rowid, nome, dono, especie, raca) "
+    "SELECT p.id, p.nome, d.nome, p.especie, p.raca FROM core_pet p JOIN core_dono d ON d.id = p.dono_id",
+    f"INSERT INTO busca_dono(rowid, nome, cpf, email, digitos) SELECT id, nome, cpf, email, {DIGITOS} FROM core_dono",
+]
+
+GATILHOS = [
+    f'busca_{tabela}_{evento}'
+    for tabela in ('consulta', 'agenda', 'medicacao', 'pet', 'dono')
+    for evento in ('ai', 'ad', 'au')
+]
+TABELAS = ['busca_consulta', 'busca_agenda', 'busca_medicacao', 'busca_pet', 'busca_dono']
+
+REMOVER = (
+    [f'DROP TRIGGER IF EXISTS {gatilho}' for gatilho in GATILHOS]
+    + [f'DROP TABLE IF EXISTS {tabela}' for tabela in TABELAS]
+)
+
+
+class RunSQLSomenteSQLite(migrations.RunSQL):
+    """Tabelas FTS5 e gatilhos existem apenas no SQLite; nos demais bancos a busca usa icontains"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_indices_paginacao'),
+    ]
+
+    operations = [
+        RunSQLSomenteSQLite(sql=CRIAR_TABELAS + CRIAR_GATILHOS + INDEXAR, reverse_sql=REMOVER),
+    ]
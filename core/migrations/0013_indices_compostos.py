@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_busca_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agenda',
+            index=models.Index(fields=['data_hora', 'concluido'], name='agenda_data_hora_concluido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agenda',
+            index=models.Index(fields=['status', 'data_hora'], name='agenda_status_data_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agenda',
+            index=models.Index(fields=['pet', 'data_hora'], name='agenda_pet_data_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['veterinario', 'status'], name='consulta_vet_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['pet', 'data_hora'], name='consulta_pet_data_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['especie'], name='pet_especie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['raca'], name='pet_raca_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+# Gatilhos de busca criados pela 0012. Os AddField abaixo recriam as tabelas
+# no SQLite (cópia, DROP e RENAME), o que falha enquanto houver gatilhos que
+# citam a tabela removida; o post_migrate de core/busca.py os instala de novo
+# ao final do migrate.
+GATILHOS_BUSCA = [
+    f'busca_{tabela}_{evento}'
+    for tabela in ('consulta', 'agenda', 'medicacao', 'pet', 'dono')
+    for evento in ('ai', 'ad', 'au')
+]
+
+
+def remover_gatilhos_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for gatilho in GATILHOS_BUSCA:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {gatilho}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_gatilhos_busca, reverse_code=migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='agenda',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='consulta',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='dono',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='medicacao',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='prescricao',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
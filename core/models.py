@@ -4,6 +4,46 @@ from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+# QuerySets com os relacionamentos carregados para cada tipo de página.
+# As views devem partir deles para que um template que acesse, por exemplo,
+# ``consulta.pet.dono.nome`` não dispare uma consulta por linha.
+
+class DonoQuerySet(models.QuerySet):
+    def para_detalhe(self):
+        return self.prefetch_related('pets')
+
+class PetQuerySet(models.QuerySet):
+    def para_listagem(self):
+        return self.select_related('dono')
+
+    para_detalhe = para_listagem
+
+class ConsultaQuerySet(models.QuerySet):
+    def para_listagem(self):
+        return self.select_related('pet__dono')
+
+    def para_detalhe(self):
+        prescricoes = Prescricao.objects.select_related('medicacao')
+        return self.select_related('pet__dono').prefetch_related(
+            models.Prefetch('prescricoes', queryset=prescricoes)
+        )
+
+class MedicacaoQuerySet(models.QuerySet):
+    def para_detalhe(self):
+        return self.prefetch_related('prescricao_set')
+
+class PrescricaoQuerySet(models.QuerySet):
+    def para_listagem(self):
+        return self.select_related('consulta__pet__dono', 'medicacao')
+
+    para_detalhe = para_listagem
+
+class AgendaQuerySet(models.QuerySet):
+    def para_listagem(self):
+        return self.select_related('pet__dono')
+
+    para_detalhe = para_listagem
+
 class Dono(models.Model):
     nome = models.CharField(max_length=100)
     cpf = models.CharField(max_length=14, unique=True)
@@ -11,6 +51,9 @@ class Dono(models.Model):
     email = models.EmailField(unique=True)
     endereco = models.TextField()
     data_cadastro = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = DonoQuerySet.as_manager()
     
     def __str__(self):
         return self.nome
@@ -19,6 +62,10 @@ class Dono(models.Model):
         verbose_name = 'Dono'
         verbose_name_plural = 'Donos'
         ordering = ['nome']
+        indexes = [
+            # Paginação por cursor (core/paginacao.py)
+            models.Index(fields=['nome', 'id'], name='dono_nome_id_idx'),
+        ]
 
 class Pet(models.Model):
     ESPECIES = (
@@ -47,6 +94,8 @@ class Pet(models.Model):
     data_cadastro = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PetQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.nome} ({self.dono.nome})"
     
@@ -60,6 +109,12 @@ class Pet(models.Model):
         verbose_name = 'Pet'
         verbose_name_plural = 'Pets'
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='pet_nome_id_idx'),
+            # Agrupamentos por espécie e raça do dashboard de saúde
+            models.Index(fields=['especie'], name='pet_especie_idx'),
+            models.Index(fields=['raca'], name='pet_raca_idx'),
+        ]
 
 class Consulta(models.Model):
     STATUS = (
@@ -85,6 +140,9 @@ class Consulta(models.Model):
     status = models.CharField(max_length=20, choices=STATUS, default='AGENDADA')
     observacoes = models.TextField(blank=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ConsultaQuerySet.as_manager()
 
     def __str__(self):
         return f"Consulta de {self.pet.nome} em {self.data_hora.strftime('%d/%m/%Y %H:%M')}"
@@ -93,11 +151,21 @@ class Consulta(models.Model):
         verbose_name = 'Consulta'
         verbose_name_plural = 'Consultas'
         ordering = ['-data_hora']
+        indexes = [
+            models.Index(fields=['data_hora', 'id'], name='consulta_data_hora_id_idx'),
+            # Contagens por veterinário e status
+            models.Index(fields=['veterinario', 'status'], name='consulta_vet_status_idx'),
+            # Últimas consultas do pet (pet_detail, histórico)
+            models.Index(fields=['pet', 'data_hora'], name='consulta_pet_data_hora_idx'),
+        ]
 
 class Medicacao(models.Model):
     nome = models.CharField(max_length=100)
     descricao = models.TextField(blank=True)
     instrucoes = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = MedicacaoQuerySet.as_manager()
     
     def __str__(self):
         return self.nome
@@ -106,6 +174,9 @@ class Medicacao(models.Model):
         verbose_name = 'Medicação'
         verbose_name_plural = 'Medicações'
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='medicacao_nome_id_idx'),
+        ]
 
 class Prescricao(models.Model):
     FREQUENCIA = (
@@ -127,6 +198,9 @@ class Prescricao(models.Model):
     data_inicio = models.DateField()
     data_fim = models.DateField()
     observacoes = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = PrescricaoQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.medicacao.nome} - {self.dosagem} ({self.frequencia})"
@@ -168,6 +242,9 @@ class Agenda(models.Model):
     concluido = models.BooleanField(default=False)
     notificar = models.BooleanField(default=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AgendaQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.titulo} - {self.pet.nome} em {self.data_hora.strftime('%d/%m/%Y %H:%M')}"
@@ -176,6 +253,49 @@ class Agenda(models.Model):
         verbose_name = 'Agenda'
         verbose_name_plural = 'Agendas'
         ordering = ['data_hora']
+        indexes = [
+            models.Index(fields=['data_hora', 'id'], name='agenda_data_hora_id_idx'),
+            # Próximos agendamentos e agendamentos do dia não concluídos
+            models.Index(fields=['data_hora', 'concluido'], name='agenda_data_hora_concluido_idx'),
+            # Pendentes a partir de hoje e confirmados do feed de consultas
+            models.Index(fields=['status', 'data_hora'], name='agenda_status_data_hora_idx'),
+            # Últimos agendamentos do pet (pet_detail, histórico)
+            models.Index(fields=['pet', 'data_hora'], name='agenda_pet_data_hora_idx'),
+        ]
+
+class ResumoDiario(models.Model):
+    """
+    Contagens diárias de consultas e agendamentos usadas pelo dashboard.
+
+    Mantido pelos signals de core/resumos.py; pode ser reconstruído com
+    ``python manage.py reconstruir_resumos``.
+    """
+    ORIGENS = (
+        ('CONSULTA', 'Consulta'),
+        ('AGENDA', 'Agenda'),
+    )
+
+    origem = models.CharField(max_length=10, choices=ORIGENS)
+    dia = models.DateField()
+    veterinario = models.CharField(max_length=100)
+    status = models.CharField(max_length=20)
+    tipo = models.CharField(max_length=20, blank=True)
+    especie = models.CharField(max_length=20)
+    quantidade = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.get_origem_display()} {self.dia:%d/%m/%Y} ({self.quantidade})"
+
+    class Meta:
+        verbose_name = 'Resumo diário'
+        verbose_name_plural = 'Resumos diários'
+        ordering = ['dia']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['origem', 'dia', 'veterinario', 'status', 'tipo', 'especie'],
+                name='resumo_diario_chave_unica',
+            ),
+        ]
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
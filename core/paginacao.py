@@ -0,0 +1,161 @@
+"""
+Paginação por cursor (keyset) para as listagens.
+
+Em vez de OFFSET, cada página continua a partir dos valores de ordenação do
+último item exibido (``WHERE (nome, id) > (...)``), de modo que qualquer
+página custa o mesmo que a primeira. Os cursores são opacos para o
+template: JSON em base64 com a direção e os valores da chave.
+
+A ordenação precisa terminar em um campo único (normalmente ``id``) e os
+campos não podem ser nulos.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
+
+PROXIMA = 'n'
+ANTERIOR = 'p'
+
+# Acima deste número o total exibido é aproximado ("1000+")
+TOTAL_LIMITE = 1000
+
+
+def _campos(ordenacao):
+    return [(campo.lstrip('-'), campo.startswith('-')) for campo in ordenacao]
+
+
+def _inverter(ordenacao):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in ordenacao]
+
+
+def _serializar(valor):
+    # isoformat() completo: o DjangoJSONEncoder truncaria os microssegundos
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f'Valor não serializável no cursor: {valor!r}')
+
+
+def codificar_cursor(direcao, valores):
+    dados = json.dumps([direcao, valores], default=_serializar, separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, modelo, ordenacao):
+    """Retorna (direção, valores) do cursor, ou (None, None) se for inválido"""
+    if not cursor:
+        return None, None
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direcao, valores = json.loads(dados)
+        campos = _campos(ordenacao)
+        if direcao not in (PROXIMA, ANTERIOR) or len(valores) != len(campos):
+            return None, None
+        convertidos = []
+        for (campo, _), valor in zip(campos, valores):
+            try:
+                convertidos.append(modelo._meta.get_field(campo).to_python(valor))
+            except FieldDoesNotExist:
+                # Colunas anotadas (ex: ``origem`` do feed de consultas)
+                convertidos.append(valor)
+        return direcao, convertidos
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None, None
+
+
+def filtro_apos(ordenacao, valores):
+    """Condição dos itens posteriores a ``valores`` na ``ordenacao``"""
+    filtro = Q()
+    igualdade = Q()
+    for (campo, decrescente), valor in zip(_campos(ordenacao), valores):
+        operador = 'lt' if decrescente else 'gt'
+        filtro |= igualdade & Q(**{f'{campo}__{operador}': valor})
+        igualdade &= Q(**{campo: valor})
+    return filtro
+
+
+def total_aproximado(queryset, limite=TOTAL_LIMITE):
+    """Conta no máximo ``limite + 1`` linhas; retorna (total, excede_limite)"""
+    total = queryset.order_by()[:limite + 1].count()
+    return min(total, limite), total > limite
+
+
+class PaginaCursor:
+    """Página de uma listagem paginada por cursor, usada diretamente nos templates"""
+
+    def __init__(self, object_list, proximo, anterior, total=None, total_excede=False):
+        self.object_list = object_list
+        self.proximo = proximo
+        self.anterior = anterior
+        self.total = total
+        self.total_excede = total_excede
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    @property
+    def has_next(self):
+        return self.proximo is not None
+
+    @property
+    def has_previous(self):
+        return self.anterior is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def paginar_por_cursor(fonte, ordenacao, por_pagina, cursor=None, contar=True):
+    """
+    Retorna a página indicada pelo cursor.
+
+    Args:
+        fonte: QuerySet, ou função que recebe um ``Q`` (ou None) e retorna o
+            queryset já filtrado por ele (necessário em consultas com UNION)
+        ordenacao (list): campos de ordenação, terminando em um campo único
+        por_pagina (int): itens por página
+        cursor (str): valor de ``?cursor=`` da requisição
+        contar (bool): calcula o total aproximado (limitado a TOTAL_LIMITE)
+    """
+    if isinstance(fonte, QuerySet):
+        queryset = fonte
+        fonte = lambda filtro: queryset if filtro is None else queryset.filter(filtro)
+
+    base = fonte(None)
+    direcao, valores = decodificar_cursor(cursor, base.model, ordenacao)
+    ordem = _inverter(ordenacao) if direcao == ANTERIOR else list(ordenacao)
+    queryset = fonte(filtro_apos(ordem, valores)) if valores else base
+
+    linhas = list(queryset.order_by(*ordem)[:por_pagina + 1])
+    ha_mais = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    if direcao == ANTERIOR:
+        linhas.reverse()
+        tem_anterior, tem_proxima = ha_mais, True
+    else:
+        tem_anterior, tem_proxima = direcao is not None, ha_mais
+
+    def chave(linha):
+        if isinstance(linha, dict):
+            return [linha[campo] for campo, _ in _campos(ordenacao)]
+        return [getattr(linha, campo) for campo, _ in _campos(ordenacao)]
+
+    proximo = codificar_cursor(PROXIMA, chave(linhas[-1])) if tem_proxima and linhas else None
+    anterior = codificar_cursor(ANTERIOR, chave(linhas[0])) if tem_anterior and linhas else None
+
+    total, total_excede = total_aproximado(base) if contar else (None, False)
+    return PaginaCursor(linhas, proximo, anterior, total, total_excede)
@@ -0,0 +1,156 @@
+"""
+Manutenção incremental da tabela ResumoDiario.
+
+Cada Consulta/Agenda contribui com 1 na linha identificada por
+(origem, dia, veterinário, status, tipo, espécie do pet). Os signals abaixo
+ajustam essa contagem a cada criação, alteração ou exclusão, para que o
+dashboard leia O(dias) linhas em vez de percorrer as tabelas completas.
+
+Alterações feitas sem signals (``QuerySet.update()``, ``bulk_create``,
+migrações de dados) exigem ``python manage.py reconstruir_resumos``.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .dashboard_cache import invalidar_dashboard
+from .models import Agenda, Consulta, Pet, ResumoDiario
+
+ORIGENS = {
+    Consulta: 'CONSULTA',
+    Agenda: 'AGENDA',
+}
+
+
+def _especie(pet_id):
+    return Pet.objects.filter(pk=pet_id).values_list('especie', flat=True).first() or ''
+
+
+def chave_resumo(instance, especie=None):
+    """Retorna a chave de ResumoDiario à qual o registro pertence"""
+    if especie is None:
+        pet = instance._state.fields_cache.get('pet')
+        especie = pet.especie if pet is not None else _especie(instance.pet_id)
+    return {
+        'origem': ORIGENS[type(instance)],
+        'dia': timezone.localdate(instance.data_hora) if timezone.is_aware(instance.data_hora) else instance.data_hora.date(),
+        'veterinario': instance.veterinario,
+        'status': instance.status,
+        'tipo': getattr(instance, 'tipo', ''),
+        'especie': especie,
+    }
+
+
+def ajustar_resumo(chave, delta):
+    """Soma ``delta`` à contagem da chave, criando ou removendo a linha"""
+    if not delta:
+        return
+    atualizados = ResumoDiario.objects.filter(**chave).update(quantidade=F('quantidade') + delta)
+    if atualizados:
+        if delta < 0:
+            ResumoDiario.objects.filter(quantidade__lte=0, **chave).delete()
+        return
+    if delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            ResumoDiario.objects.create(quantidade=delta, **chave)
+    except IntegrityError:
+        # Outra requisição criou a linha ao mesmo tempo
+        ResumoDiario.objects.filter(**chave).update(quantidade=F('quantidade') + delta)
+
+
+def _linhas_agrupadas(modelo, queryset=None):
+    """Agrupa os registros de ``modelo`` pelas colunas da chave do resumo"""
+    campos = ['veterinario', 'status', 'pet__especie']
+    if modelo is Agenda:
+        campos.append('tipo')
+    if queryset is None:
+        queryset = modelo.objects.all()
+    return (queryset
+            .annotate(dia=TruncDate('data_hora'))
+            .values('dia', *campos)
+            .annotate(quantidade=Count('id'))
+            .order_by())
+
+
+def reconstruir_resumos():
+    """Recalcula toda a tabela ResumoDiario a partir de Consulta e Agenda"""
+    with transaction.atomic():
+        ResumoDiario.objects.all().delete()
+        resumos = []
+        for modelo, origem in ORIGENS.items():
+            for linha in _linhas_agrupadas(modelo):
+                resumos.append(ResumoDiario(
+                    origem=origem,
+                    dia=linha['dia'],
+                    veterinario=linha['veterinario'],
+                    status=linha['status'],
+                    tipo=linha.get('tipo', ''),
+                    especie=linha['pet__especie'],
+                    quantidade=linha['quantidade'],
+                ))
+        ResumoDiario.objects.bulk_create(resumos, batch_size=500)
+    invalidar_dashboard()
+    return len(resumos)
+
+
+@receiver(pre_save, sender=Consulta)
+@receiver(pre_save, sender=Agenda)
+def guardar_chave_anterior(sender, instance, raw=False, **kwargs):
+    instance._chave_resumo_anterior = None
+    if raw or instance.pk is None:
+        return
+    anterior = sender.objects.filter(pk=instance.pk).select_related('pet').first()
+    if anterior is not None:
+        instance._chave_resumo_anterior = chave_resumo(anterior, anterior.pet.especie)
+
+
+@receiver(post_save, sender=Consulta)
+@receiver(post_save, sender=Agenda)
+def atualizar_resumo(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_chave_resumo_anterior', None)
+    atual = chave_resumo(instance)
+    if anterior == atual:
+        return
+    if anterior is not None:
+        ajustar_resumo(anterior, -1)
+    ajustar_resumo(atual, 1)
+
+
+@receiver(post_delete, sender=Consulta)
+@receiver(post_delete, sender=Agenda)
+def remover_do_resumo(sender, instance, **kwargs):
+    ajustar_resumo(chave_resumo(instance), -1)
+
+
+@receiver(pre_save, sender=Pet)
+def guardar_especie_anterior(sender, instance, raw=False, **kwargs):
+    instance._especie_anterior = None
+    if not raw and instance.pk is not None:
+        instance._especie_anterior = _especie(instance.pk)
+
+
+@receiver(post_save, sender=Pet)
+def mover_resumos_do_pet(sender, instance, raw=False, **kwargs):
+    """Move as contagens do pet quando sua espécie é alterada"""
+    anterior = getattr(instance, '_especie_anterior', None)
+    if raw or not anterior or anterior == instance.especie:
+        return
+    for modelo, origem in ORIGENS.items():
+        for linha in _linhas_agrupadas(modelo, modelo.objects.filter(pet=instance)):
+            chave = {
+                'origem': origem,
+                'dia': linha['dia'],
+                'veterinario': linha['veterinario'],
+                'status': linha['status'],
+                'tipo': linha.get('tipo', ''),
+            }
+            ajustar_resumo({**chave, 'especie': anterior}, -linha['quantidade'])
+            ajustar_resumo({**chave, 'especie': instance.especie}, linha['quantidade'])
@@ -1,3 +1,1177 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from time import monotonic, sleep
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+
+from . import ao_vivo, captcha, dashboard_views, pet_tips, views
+from .benchmark import cache_isolado, consultas_quentes, gerar_dados, medir_alvos, quantidades
+from .busca import (
+    buscar, expressao_fts, fts_disponivel, recriar_gatilhos, remover_gatilhos_antes_de_migrar, sugestoes,
+)
+from .cache_backends import CacheEmCamadas, CacheSQLite
+from .dashboard_cache import chave_widget, estatisticas_cache, geracao_atual
+from .dashboard_views import (
+    get_clientes_valor_data, get_consultas_periodo_data, get_dashboard_data, get_overview_data,
+    get_procedimentos_tipos_data, get_saude_animal_data, get_tendencias_financeiro_data,
+    get_veterinarios_performance_data,
+)
+from .feeds import feed_consultas, historico_pet
+from .middleware import (
+    OrcamentoConsultasExcedido, OrcamentoConsultasMiddleware, impressao_digital, limpar_registros,
+    registros_recentes,
+)
+from .models import Agenda, Consulta, Dono, Medicacao, Pet, Prescricao, ResumoDiario
+from .paginacao import paginar_por_cursor, total_aproximado
+from .resumos import reconstruir_resumos
+from .timeseries import contar_por_periodo, intervalos_periodo, somar_meses
+
+
+def criar_pet(nome='Rex', especie='CACHORRO', cpf='000.000.000-00'):
+    dono = Dono.objects.create(
+        nome=f'Dono de {nome}', cpf=cpf, telefone='11999999999',
+        email=f'{cpf}@exemplo.com', endereco='Rua A, 1'
+    )
+    return Pet.objects.create(nome=nome, dono=dono, especie=especie, sexo='M')
+
+
+def criar_consulta(pet, dia, **campos):
+    data_hora = timezone.make_aware(datetime.combine(dia, time(10, 0)))
+    return Consulta.objects.create(pet=pet, data_hora=data_hora, motivo='Rotina', **campos)
+
+
+class TimeseriesTests(TestCase):
+    def setUp(self):
+        self.pet = criar_pet()
+
+    def test_intervalos_ancorados_no_fim(self):
+        intervalos = intervalos_periodo(date(2025, 1, 1), date(2025, 1, 20), 'week')
+        self.assertEqual(intervalos, [
+            (date(2025, 1, 1), date(2025, 1, 6)),
+            (date(2025, 1, 7), date(2025, 1, 13)),
+            (date(2025, 1, 14), date(2025, 1, 20)),
+        ])
+
+    def test_intervalos_mensais_seguem_o_calendario(self):
+        intervalos = intervalos_periodo(date(2024, 12, 15), date(2025, 2, 10), 'month')
+        self.assertEqual(intervalos, [
+            (date(2024, 12, 15), date(2024, 12, 31)),
+            (date(2025, 1, 1), date(2025, 1, 31)),
+            (date(2025, 2, 1), date(2025, 2, 10)),
+        ])
+
+    def test_somar_meses(self):
+        self.assertEqual(somar_meses(date(2025, 3, 31), -5), date(2024, 10, 1))
+        self.assertEqual(somar_meses(date(2025, 11, 2), 2), date(2026, 1, 1))
+
+    def test_contagem_com_preenchimento_de_zeros(self):
+        for dia in (date(2025, 1, 2), date(2025, 1, 2), date(2025, 1, 9)):
+            criar_consulta(self.pet, dia)
+        criar_consulta(self.pet, date(2025, 2, 1))  # fora do período
+
+        with self.assertNumQueries(1):
+            serie = contar_por_periodo(
+                Consulta.objects.all(), date(2025, 1, 1), date(2025, 1, 14), 'week'
+            )
+        self.assertEqual([intervalo['total'] for intervalo in serie], [2, 1])
+
+        diaria = contar_por_periodo(Consulta.objects.all(), date(2025, 1, 1), date(2025, 1, 3))
+        self.assertEqual([intervalo['total'] for intervalo in diaria], [0, 2, 0])
+
+    def test_overview_sem_deriva_de_meses(self):
+        hoje = timezone.localdate()
+        criar_consulta(self.pet, hoje)
+        criar_consulta(self.pet, somar_meses(hoje, -5))
+
+        with self.assertNumQueries(1):
+            data = get_overview_data()
+        self.assertEqual(len(data['meses']), 6)
+        self.assertEqual(len(set(data['meses'])), 6)
+        self.assertEqual(data['consultas_mensais'][0], 1)
+        self.assertEqual(data['consultas_mensais'][-1], 1)
+
+    def test_consultas_periodo_uma_consulta(self):
+        hoje = timezone.localdate()
+        criar_consulta(self.pet, hoje - timedelta(days=40))
+
+        for days in (7, 90, 180, 365):
+            with self.assertNumQueries(1):
+                data = get_consultas_periodo_data(days)
+            self.assertEqual(len(data['consultas_periodo']), len(data['datas_periodo']))
+        self.assertEqual(sum(get_consultas_periodo_data(90)['consultas_periodo']), 1)
+        self.assertEqual(len(get_consultas_periodo_data(7)['consultas_periodo']), 8)
+
+
+class ResumoDiarioTests(TestCase):
+    def setUp(self):
+        self.pet = criar_pet()
+        self.hoje = timezone.localdate()
+
+    def resumos(self):
+        return sorted(ResumoDiario.objects.values_list(
+            'origem', 'dia', 'veterinario', 'status', 'tipo', 'especie', 'quantidade'
+        ))
+
+    def test_signals_mantem_contagens(self):
+        consulta = criar_consulta(self.pet, self.hoje)
+        criar_consulta(self.pet, self.hoje, status='REALIZADA')
+        Agenda.objects.create(
+            pet=self.pet, tipo='VACINA', titulo='V10',
+            data_hora=consulta.data_hora
+        )
+        self.assertEqual(get_dashboard_data()['total_consultas'], 2)
+
+        consulta.status = 'REALIZADA'
+        consulta.save()
+        vets = get_veterinarios_performance_data()['veterinarios']
+        self.assertEqual(vets[0]['consultas_realizadas'], 2)
+        self.assertEqual(vets[0]['taxa_realizacao'], 100.0)
+
+        consulta.delete()
+        self.assertEqual(get_dashboard_data()['total_consultas'], 1)
+        self.assertEqual(get_procedimentos_tipos_data()['tipos'], [{'tipo': 'VACINA', 'total': 1}])
+        self.assertFalse(ResumoDiario.objects.filter(quantidade__lte=0).exists())
+
+    def test_alteracao_de_especie_e_reconstrucao(self):
+        criar_consulta(self.pet, self.hoje)
+        criar_consulta(self.pet, self.hoje - timedelta(days=3))
+        self.pet.especie = 'GATO'
+        self.pet.save()
+        incremental = self.resumos()
+        self.assertEqual({linha[5] for linha in incremental}, {'GATO'})
+
+        reconstruir_resumos()
+        self.assertEqual(self.resumos(), incremental)
+
+    def test_exclusao_em_cascata(self):
+        criar_consulta(self.pet, self.hoje)
+        self.pet.dono.delete()
+        self.assertFalse(ResumoDiario.objects.exists())
+
+
+class DashboardApiLoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        pet = criar_pet()
+        criar_consulta(pet, timezone.localdate(), status='REALIZADA')
+        Agenda.objects.create(pet=pet, tipo='EXAME', titulo='Hemograma', data_hora=timezone.now())
+
+    def test_lote_compartilha_consultas_base(self):
+        tipos = 'veterinarios_performance,veterinarios_financeiro,procedimentos_tipos,procedimentos_financeiro,inexistente'
+        # Veterinários e agendamentos por tipo são lidos uma única vez; status da agenda à parte
+        with self.assertNumQueries(3):
+            response = self.client.get('/core/dashboard-api/', {'types': tipos})
+        data = response.json()
+        self.assertEqual(list(data), tipos.split(','))
+        self.assertEqual(data['veterinarios_performance']['veterinarios'][0]['consultas_realizadas'], 1)
+        self.assertEqual(data['veterinarios_financeiro']['faturamentos'], [150])
+        self.assertEqual(data['procedimentos_financeiro']['quantidades'], [1])
+        self.assertIn('error', data['inexistente'])
+
+    def test_tipo_unico_continua_disponivel(self):
+        response = self.client.get('/core/dashboard-api/', {'type': 'consultas_periodo', 'days': 15})
+        self.assertEqual(response.json()['total_dias'], 15)
+
+
+class DashboardApiAsyncTests(TransactionTestCase):
+    # Os widgets são calculados em outras threads, com outras conexões: os
+    # dados precisam estar gravados (TransactionTestCase)
+    def setUp(self):
+        cache.clear()
+        pet = criar_pet()
+        criar_consulta(pet, timezone.localdate(), status='REALIZADA')
+        Agenda.objects.create(pet=pet, tipo='EXAME', titulo='Hemograma', data_hora=timezone.now())
+
+    def test_resultados_iguais_aos_da_api_sincrona(self):
+        tipos = 'overview,veterinarios_performance,veterinarios_financeiro,clientes_fidelizacao,inexistente'
+        assincrona = self.client.get('/core/dashboard-api/async/', {'types': tipos}).json()
+        cache.clear()
+        sincrona = self.client.get('/core/dashboard-api/', {'types': tipos}).json()
+        self.assertEqual(assincrona, sincrona)
+        self.assertEqual(assincrona['veterinarios_financeiro']['faturamentos'], [150])
+
+        resposta = self.client.get('/core/dashboard-api/async/', {'type': 'consultas_periodo', 'days': 15})
+        self.assertEqual(resposta.json()['total_dias'], 15)
+        self.assertTrue(resposta.has_header('ETag'))
+
+    def test_consultas_do_pool_entram_no_orcamento(self):
+        limpar_registros()
+        self.client.get('/core/dashboard-api/async/', {'types': 'overview,especies_racas'})
+        registro = registros_recentes()[-1]
+        self.assertEqual(registro['url'], 'core:dashboard_api_async')
+        # overview: 1; especies_racas: 2 (espécies e raças), feitas nas threads do pool
+        self.assertEqual(registro['consultas'], 3)
+
+    @override_settings(DASHBOARD_WIDGET_TIMEOUTS={'lento': 0.1})
+    def test_widget_lento_nao_bloqueia_os_demais(self):
+        liberar = threading.Event()
+        chamadas = []
+
+        def lento():
+            chamadas.append(1)
+            liberar.wait(5)
+            return {'valor': 42}
+
+        with mock.patch.dict(dashboard_views.WIDGETS, {'lento': lento}):
+            for _ in range(2):
+                data = self.client.get('/core/dashboard-api/async/', {'types': 'lento,overview,especies_racas'}).json()
+                self.assertTrue(data['lento']['pendente'])
+                self.assertEqual(sum(data['overview']['consultas_mensais']), 1)
+                self.assertEqual(data['especies_racas']['especies'], [{'especie': 'CACHORRO', 'total': 1}])
+            # A segunda requisição esperou o mesmo cálculo, sem ocupar outra thread
+            self.assertEqual(len(chamadas), 1)
+            self.assertEqual(dashboard_views.widgets_em_andamento(), [{'type': 'lento', 'params': {}}])
+
+            # O cálculo continua em segundo plano e vai para o cache
+            liberar.set()
+            chave = chave_widget('lento', {}, geracao_atual())
+            limite = monotonic() + 5
+            while cache.get(chave) is None and monotonic() < limite:
+                sleep(0.01)
+            data = self.client.get('/core/dashboard-api/async/', {'types': 'lento'}).json()
+        self.assertEqual(data['lento'], {'valor': 42})
+        self.assertEqual(len(chamadas), 1)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pet = criar_pet()
+
+    def test_cache_invalidado_por_signals(self):
+        url = '/core/dashboard-api/'
+        params = {'type': 'consultas_periodo', 'days': 7}
+        self.assertEqual(sum(self.client.get(url, params).json()['consultas_periodo']), 0)
+        with self.assertNumQueries(0):
+            self.client.get(url, params)
+        # Outro valor de ``days`` é outra entrada de cache
+        with self.assertNumQueries(1):
+            self.client.get(url, {**params, 'days': 30})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            criar_consulta(self.pet, timezone.localdate())
+        self.assertEqual(sum(self.client.get(url, params).json()['consultas_periodo']), 1)
+
+        estatisticas = estatisticas_cache()
+        self.assertEqual((estatisticas['acertos'], estatisticas['falhas']), (1, 3))
+        self.assertEqual(estatisticas['taxa_acerto'], 25.0)
+
+
+class ClientesValorTests(TestCase):
+    def test_faixas_em_uma_consulta(self):
+        hoje = timezone.localdate()
+        for indice, consultas in enumerate((0, 1, 2, 4, 5, 7)):
+            pet = criar_pet(nome=f'Pet {indice}', cpf=f'000.000.000-{indice:02d}')
+            for _ in range(consultas):
+                criar_consulta(pet, hoje)
+
+        with self.assertNumQueries(1):
+            data = get_clientes_valor_data()
+        self.assertEqual(data['values'], [2, 2, 2])
+
+        data = get_clientes_valor_data(alto=7, medio=1)
+        self.assertEqual(data['values'], [1, 4, 1])
+        self.assertEqual(data['limites'], {'alto': 7, 'medio': 1})
+
+
+class DashboardDataTests(TestCase):
+    def test_numero_fixo_de_consultas(self):
+        hoje = timezone.localdate()
+        for indice in range(3):
+            pet = criar_pet(nome=f'Pet {indice}', cpf=f'000.000.000-{indice:02d}')
+            criar_consulta(pet, hoje, status='REALIZADA')
+            criar_consulta(pet, hoje - timedelta(days=400), veterinario='MV Camila Banborra')
+
+        with self.assertNumQueries(4):
+            data = get_dashboard_data()
+        self.assertEqual((data['total_donos'], data['total_pets'], data['total_consultas']), (3, 3, 6))
+        self.assertEqual(data['consultas_ano'], 3)
+        self.assertEqual(data['consultas_realizadas'], 3)
+        self.assertEqual(data['consultas_agendadas'], 3)
+        self.assertEqual(len(data['veterinarios_count']), 2)
+
+    def test_debug_consultas_da_requisicao_atual(self):
+        cache.clear()
+        criar_consulta(criar_pet(), timezone.localdate())
+        with self.settings(DEBUG=True):
+            primeira = self.client.get('/core/dashboard-debug/')
+            segunda = self.client.get('/core/dashboard-debug/')
+        self.assertEqual(primeira.context['debug_consultas']['consultas'], 4)
+        # Do cache: a medição é a desta requisição, não a de quem o preencheu
+        self.assertEqual(segunda.context['debug_consultas']['consultas'], 0)
+        self.assertNotIn('debug_consultas', get_dashboard_data())
+
+
+class SaudeAnimalTests(TestCase):
+    def test_faixas_e_pesos_com_consultas_fixas(self):
+        hoje = timezone.localdate()
+        for indice, (especie, anos, peso) in enumerate((
+            ('CACHORRO', 1, 10), ('CACHORRO', 3, 20), ('CACHORRO', 9, 30),
+            ('GATO', 5, 4), ('AVE', 1, None),
+        )):
+            pet = criar_pet(nome=f'Pet {indice}', especie=especie, cpf=f'000.000.000-{indice:02d}')
+            pet.data_nascimento = hoje - timedelta(days=365 * anos + 10)
+            pet.peso = peso
+            pet.save()
+
+        with self.assertNumQueries(3):
+            data = get_saude_animal_data()
+        self.assertEqual([faixa['total'] for faixa in data['pets_idade']], [2, 1, 1, 0, 1])
+        self.assertEqual(data['pets_idade'][-1]['faixa'], '8-+ anos')
+        cachorro, gato = data['pets_peso']
+        self.assertEqual((cachorro['especie'], cachorro['peso_medio'], cachorro['peso_mediano']), ('CACHORRO', 20.0, 20.0))
+        self.assertEqual((cachorro['peso_p10'], cachorro['peso_p90']), (12.0, 28.0))
+        self.assertEqual(gato['total'], 1)
+
+        faixas = get_saude_animal_data(faixas_idade=[0, 5])['pets_idade']
+        self.assertEqual([faixa['total'] for faixa in faixas], [3, 2])
+
+
+class InstrumentacaoTests(TestCase):
+    def test_registro_estruturado_em_debug(self):
+        with self.assertLogs('core.dashboard', level='DEBUG') as logs:
+            get_tendencias_financeiro_data()
+        registro = logs.records[0]
+        self.assertEqual(registro.funcao, 'get_tendencias_financeiro_data')
+        self.assertEqual((registro.consultas, registro.linhas), (1, 0))
+        self.assertGreaterEqual(registro.tempo_ms, 0)
+
+
+class OrcamentoConsultasTests(TestCase):
+    def setUp(self):
+        limpar_registros()
+        self.usuario = User.objects.create_user('equipe', password='senha', is_staff=True)
+        self.client.force_login(self.usuario)
+        for indice in range(3):
+            criar_pet(nome=f'Pet {indice}', cpf=f'000.000.000-{indice:02d}')
+
+    def test_impressao_digital_ignora_parametros(self):
+        self.assertEqual(
+            impressao_digital('SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 10'),
+            impressao_digital('SELECT * FROM t WHERE id IN (%s) AND x = 7'),
+        )
+
+    @override_settings(ORCAMENTO_CONSULTAS={'core:pet_list': 1}, ORCAMENTO_CONSULTAS_ERRO=True)
+    def test_orcamento_excedido_levanta_erro(self):
+        with self.assertRaises(OrcamentoConsultasExcedido):
+            self.client.get('/core/pets/')
+
+    @override_settings(ORCAMENTO_CONSULTAS={}, ORCAMENTO_CONSULTAS_PADRAO=1, ORCAMENTO_CONSULTAS_ERRO=True)
+    def test_orcamento_padrao_apenas_registra(self):
+        with self.assertLogs('core.orcamento', level='WARNING'):
+            response = self.client.get('/core/pets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(registros_recentes()[-1]['excedeu'])
+
+    @override_settings(ORCAMENTO_CONSULTAS={'core:pet_list': 1}, ORCAMENTO_CONSULTAS_ERRO=False)
+    def test_relatorio_mostra_piores_endpoints(self):
+        with self.assertLogs('core.orcamento', level='WARNING'):
+            self.client.get('/core/pets/')
+        self.client.get('/core/medicacoes/')
+
+        response = self.client.get('/core/orcamento-consultas/')
+        endpoints = response.context['endpoints']
+        pet_list = next(item for item in endpoints if item['url'] == 'core:pet_list')
+        self.assertEqual((pet_list['requisicoes'], pet_list['excedidas']), (1, 1))
+        self.assertGreater(pet_list['max_consultas'], 1)
+
+    async def test_middleware_atende_views_assincronas_sem_adaptacao(self):
+        async def view(request):
+            await sync_to_async(list)(Pet.objects.all())
+            return HttpResponse()
+
+        middleware = OrcamentoConsultasMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/core/pets/')
+        request.resolver_match = resolve('/core/pets/')
+        await middleware(request)
+        self.assertEqual(registros_recentes()[-1]['consultas'], 1)
+
+    def test_relatorio_restrito_a_equipe(self):
+        self.usuario.is_staff = False
+        self.usuario.save()
+        response = self.client.get('/core/orcamento-consultas/')
+        self.assertEqual(response.status_code, 302)
+
+
+class BenchmarkTests(TestCase):
+    def test_dados_deterministicos_e_medicao(self):
+        referencia = date(2025, 6, 30)
+        totais = gerar_dados(400, semente=7, referencia=referencia)
+        self.assertEqual(totais, quantidades(400))
+        self.assertEqual(Consulta.objects.count(), 400)
+        self.assertEqual(Agenda.objects.count(), 200)
+        self.assertEqual(ResumoDiario.objects.filter(origem='CONSULTA').aggregate(total=Sum('quantidade'))['total'], 400)
+        primeira = Consulta.objects.order_by('id').values('pet__nome', 'data_hora', 'motivo').first()
+
+        with override_settings(ORCAMENTO_CONSULTAS_ERRO=False):
+            resultados = medir_alvos(repeticoes=1)
+        self.assertEqual({medicao['status'] for medicao in resultados.values()}, {200})
+        self.assertEqual(resultados['dashboard_api:overview']['consultas'], 1)
+
+        for modelo in (Prescricao, Agenda, Consulta, Pet, Dono, Medicacao):
+            modelo.objects.all().delete()
+        gerar_dados(400, semente=7, referencia=referencia)
+        self.assertEqual(
+            Consulta.objects.order_by('id').values('pet__nome', 'data_hora', 'motivo').first(), primeira
+        )
+
+    def test_medicao_nao_altera_o_cache_configurado(self):
+        cache.set('dashboard:widget:existente', 'servidor')
+        geracao = geracao_atual()
+        with cache_isolado():
+            gerar_dados(40, semente=7, referencia=date(2025, 6, 30))
+            with override_settings(ORCAMENTO_CONSULTAS_ERRO=False):
+                medir_alvos(repeticoes=1)
+        self.assertEqual(geracao_atual(), geracao)
+        self.assertEqual(cache.get('dashboard:widget:existente'), 'servidor')
+
+
+class FeedConsultasTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('recepcao'))
+        self.pet = criar_pet()
+        hoje = timezone.localdate()
+        for dias in range(8):
+            criar_consulta(self.pet, hoje - timedelta(days=dias * 2), status='REALIZADA')
+        for dias, status in ((1, 'CONFIRMADO'), (3, 'CONFIRMADO'), (5, 'PENDENTE')):
+            Agenda.objects.create(
+                pet=self.pet, tipo='VACINA', titulo=f'Vacina {dias}', status=status,
+                data_hora=timezone.make_aware(datetime.combine(hoje - timedelta(days=dias), time(9, 0)))
+            )
+
+    def test_feed_ordenado_no_banco(self):
+        linhas = list(feed_consultas())
+        self.assertEqual(len(linhas), 10)
+        self.assertEqual([linha['data_hora'] for linha in linhas],
+                         sorted((linha['data_hora'] for linha in linhas), reverse=True))
+        self.assertEqual([linha['origem'] for linha in linhas[1:4]], ['agenda', 'consulta', 'agenda'])
+        self.assertEqual(linhas[1]['resumo'], 'Vacina 1')
+        self.assertEqual(linhas[0]['dono_nome'], self.pet.dono.nome)
+
+        self.assertEqual(len(list(feed_consultas(query='Vacina'))), 2)
+        self.assertEqual(len(list(feed_consultas(status='CANCELADA'))), 2)
+
+    def test_pagina_com_consultas_fixas(self):
+        primeira = self.client.get('/core/consultas/').context['page_obj']
+        # Sessão, usuário, perfil (base.html), página e total limitado
+        with self.assertNumQueries(5):
+            response = self.client.get('/core/consultas/', {'cursor': primeira.proximo})
+        pagina = response.context['page_obj']
+        self.assertEqual(len(pagina), 4)
+        self.assertEqual((pagina.total, pagina.has_next, pagina.has_previous), (10, False, True))
+        self.assertContains(response, self.pet.dono.nome)
+
+
+class PaginacaoCursorTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('recepcao'))
+        # Nomes repetidos exercitam o desempate por id
+        for indice in range(13):
+            Dono.objects.create(
+                nome=f'Dono {indice // 2:02d}', cpf=f'000.000.000-{indice:02d}', telefone='11999999999',
+                email=f'dono{indice}@exemplo.com', endereco='Rua A, 1'
+            )
+
+    def test_percorre_para_frente_e_para_tras(self):
+        esperado = list(Dono.objects.order_by('nome', 'id').values_list('id', flat=True))
+        vistos, cursores, cursor = [], [], None
+        while True:
+            pagina = paginar_por_cursor(Dono.objects.all(), ['nome', 'id'], 5, cursor)
+            vistos += [dono.id for dono in pagina]
+            cursores.append(pagina)
+            if not pagina.has_next:
+                break
+            cursor = pagina.proximo
+        self.assertEqual(vistos, esperado)
+        self.assertEqual([len(pagina) for pagina in cursores], [5, 5, 3])
+
+        anterior = paginar_por_cursor(Dono.objects.all(), ['nome', 'id'], 5, cursores[-1].anterior)
+        self.assertEqual([dono.id for dono in anterior], esperado[5:10])
+        self.assertTrue(anterior.has_previous)
+        primeira = paginar_por_cursor(Dono.objects.all(), ['nome', 'id'], 5, anterior.anterior)
+        self.assertEqual([dono.id for dono in primeira], esperado[:5])
+        self.assertFalse(primeira.has_previous)
+
+    def test_total_aproximado_e_cursor_invalido(self):
+        pagina = paginar_por_cursor(Dono.objects.all(), ['nome', 'id'], 5, 'invalido!')
+        self.assertEqual(len(pagina), 5)
+        self.assertFalse(pagina.has_previous)
+        self.assertEqual(total_aproximado(Dono.objects.all(), limite=10), (10, True))
+        self.assertEqual(total_aproximado(Dono.objects.all()), (13, False))
+
+    def test_cursor_com_data_hora(self):
+        pet = criar_pet(cpf='111.111.111-11')
+        base = timezone.now().replace(microsecond=123456)
+        for minutos in range(7):
+            Agenda.objects.create(pet=pet, tipo='EXAME', titulo=f'Exame {minutos}',
+                                  data_hora=base - timedelta(minutes=minutos // 2))
+        response = self.client.get('/core/agenda/')
+        proxima = self.client.get('/core/agenda/', {'cursor': response.context['page_obj'].proximo})
+        titulos = [agenda.titulo for agenda in response.context['page_obj']]
+        titulos += [agenda.titulo for agenda in proxima.context['page_obj']]
+        self.assertEqual(sorted(titulos), sorted(f'Exame {minutos}' for minutos in range(7)))
+        self.assertContains(response, 'cursor=')
+
+
+class ConsultasPorPaginaTests(TestCase):
+    """Cada página custa um número fixo de consultas, qualquer que seja o número de linhas"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('recepcao'))
+        medicacao = Medicacao.objects.create(nome='Vermífugo')
+        agora = timezone.now()
+        for indice in range(8):
+            pet = criar_pet(nome=f'Pet {indice}', cpf=f'000.000.000-{indice:02d}')
+            consulta = criar_consulta(pet, timezone.localdate())
+            Prescricao.objects.create(
+                consulta=consulta, medicacao=medicacao, dosagem='1 cp', frequencia='1X',
+                duracao=3, data_inicio=timezone.localdate(), data_fim=timezone.localdate()
+            )
+            Agenda.objects.create(pet=pet, tipo='VACINA', titulo='V10', data_hora=agora + timedelta(hours=indice))
+        self.pet = pet
+        self.consulta = consulta
+        self.medicacao = medicacao
+
+    def test_listagens_e_detalhes(self):
+        # Sessão, usuário e perfil (base.html) entram em todas as contagens
+        paginas = {
+            '/core/pets/': 5,
+            '/core/donos/': 5,
+            '/core/consultas/': 5,
+            '/core/agenda/': 5,
+            '/core/agenda/calendario/': 3,
+            '/core/dashboard/': 6,
+            # Detalhes: mais a consulta de versão do ETag (core/condicional.py)
+            f'/core/donos/{self.pet.dono_id}/': 6,
+            f'/core/consultas/{self.consulta.pk}/': 6,
+            f'/core/medicacoes/{self.medicacao.pk}/': 5,
+        }
+        for url, esperado in paginas.items():
+            with self.subTest(url=url), self.assertNumQueries(esperado):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_prescricoes_ordenadas_por_inicio(self):
+        # O modelo não tem data_prescricao (a ordenação antiga levantava FieldError)
+        request = RequestFactory().get('/core/prescricoes/')
+        request.user = User.objects.create_user('prescricoes')
+        with mock.patch('core.views.render') as render:
+            views.prescricao_list(request)
+        prescricoes = render.call_args.args[2]['prescricoes']
+        self.assertEqual(prescricoes.query.order_by, ('-data_inicio',))
+        with self.assertNumQueries(1):
+            self.assertEqual(len({prescricao.consulta.pet.dono.nome for prescricao in prescricoes}), 8)
+
+    def test_querysets_carregam_relacionamentos(self):
+        with self.assertNumQueries(1):
+            nomes = [str(agenda) for agenda in Agenda.objects.para_listagem()]
+        self.assertEqual(len(nomes), 8)
+        with self.assertNumQueries(1):
+            donos = [str(pet) for pet in Pet.objects.para_listagem()]
+        self.assertIn(str(self.pet), donos)
+        with self.assertNumQueries(1):
+            [str(prescricao) + prescricao.consulta.pet.dono.nome for prescricao in Prescricao.objects.para_listagem()]
+
+
+class BuscaTextualTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('recepcao'))
+        self.assertTrue(fts_disponivel())
+        self.rex = criar_pet(nome='Rex', cpf='123.456.789-00')
+        self.thor = criar_pet(nome='Thor', cpf='987.654.321-00')
+        self.thor.dono.nome = 'José Antônio'
+        self.thor.dono.save()
+        self.consulta = Consulta.objects.create(
+            pet=self.rex, data_hora=timezone.now(), motivo='Vacinação anual', diagnostico='Saudável'
+        )
+
+    def ids(self, queryset, tabela, termo, campos, **opcoes):
+        return list(buscar(queryset, tabela, termo, campos, **opcoes)
+                    .order_by('relevancia', 'id').values_list('id', flat=True))
+
+    def test_expressao_fts(self):
+        self.assertEqual(expressao_fts('vac "an'), '"vac"* AND "an"*')
+        self.assertEqual(expressao_fts('rex', colunas=['nome']), '{nome} : ("rex"*)')
+        self.assertEqual(expressao_fts('123.456', digitos=True), '("123"* AND "456"*) OR digitos : "123456"*')
+        self.assertIsNone(expressao_fts('"*()'))
+
+    def test_sem_acentos_e_por_prefixo(self):
+        self.assertEqual(self.ids(Pet.objects.all(), 'busca_pet', 'jose anto', ['nome']), [self.thor.pk])
+        self.assertCountEqual(self.ids(Pet.objects.all(), 'busca_pet', 'cachor', ['nome']), [self.rex.pk, self.thor.pk])
+        campos = ['nome', 'cpf', 'email']
+        self.assertEqual(self.ids(Dono.objects.all(), 'busca_dono', '12345678', campos, digitos=True),
+                         [self.rex.dono_id])
+        self.assertCountEqual(self.ids(Dono.objects.all(), 'busca_dono', '119999', campos, digitos=True),
+                              [self.rex.dono_id, self.thor.dono_id])
+
+    def test_relevancia_sem_subconsulta_por_linha(self):
+        # Filtro e BM25 saem de um único MATCH, inclusive na página seguinte
+        pets = buscar(Pet.objects.all(), 'busca_pet', 'cachorro', ['nome'])
+        with CaptureQueriesContext(connection) as consultas:
+            pagina = paginar_por_cursor(pets, ['relevancia', 'nome', 'id'], 1)
+            seguinte = paginar_por_cursor(pets, ['relevancia', 'nome', 'id'], 1, pagina.proximo)
+        self.assertEqual([consulta['sql'].count('MATCH') for consulta in consultas], [1, 1, 1, 1])
+        self.assertCountEqual([pagina[0].pk, seguinte[0].pk], [self.rex.pk, self.thor.pk])
+
+    def test_gatilhos_acompanham_alteracoes(self):
+        Consulta.objects.filter(pk=self.consulta.pk).update(motivo='Retorno cirúrgico')
+        resposta = self.client.get('/core/consultas/', {'q': 'cirurgico'})
+        self.assertEqual([item['id'] for item in resposta.context['page_obj']], [self.consulta.pk])
+        self.assertEqual(len(self.client.get('/core/consultas/', {'q': 'vacinacao'}).context['page_obj']), 0)
+
+        self.rex.dono.nome = 'Maria'
+        self.rex.dono.save()
+        self.assertEqual(self.ids(Pet.objects.all(), 'busca_pet', 'maria', ['nome']), [self.rex.pk])
+        self.rex.delete()
+        self.assertEqual(self.ids(Pet.objects.all(), 'busca_pet', 'maria', ['nome']), [])
+        self.assertEqual(self.ids(Consulta.objects.all(), 'busca_consulta', 'retorno', ['motivo']), [])
+
+    def test_migrate_recria_gatilhos_sem_reindexar(self):
+        core = apps.get_app_config('core')
+        plano = [(MigrationLoader(connection).get_migration('core', '0014_updated_at'), False)]
+        remover_gatilhos_antes_de_migrar(sender=core, plan=plano)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM busca_pet WHERE rowid = %s', [self.rex.pk])
+        recriar_gatilhos(sender=core, plan=plano)
+        # Sem reindexação: o registro removido do índice continua fora dele
+        self.assertEqual(self.ids(Pet.objects.all(), 'busca_pet', 'rex', ['nome']), [])
+        self.rex.save()
+        self.assertEqual(self.ids(Pet.objects.all(), 'busca_pet', 'rex', ['nome']), [self.rex.pk])
+
+    def test_listagens_ordenadas_por_relevancia(self):
+        for nome in ['Vermífugo', 'Antibiótico', 'Anti-inflamatório']:
+            Medicacao.objects.create(nome=nome, descricao='Uso veterinário; não é vermífugo' if nome != 'Vermífugo' else '')
+        resposta = self.client.get('/core/medicacoes/', {'q': 'vermifugo'})
+        nomes = [medicacao.nome for medicacao in resposta.context['page_obj']]
+        self.assertEqual(nomes[0], 'Vermífugo')
+        self.assertEqual(len(nomes), 3)
+        resposta = self.client.get('/core/pets/', {'search': 'thor'})
+        self.assertEqual([pet.pk for pet in resposta.context['pets']], [self.thor.pk])
+        resposta = self.client.get('/core/donos/', {'q': '987.654'})
+        self.assertEqual([dono.pk for dono in resposta.context['donos']], [self.thor.dono_id])
+
+    def test_busca_rapida(self):
+        cache.clear()
+        Agenda.objects.create(pet=self.thor, tipo='VACINA', titulo='Vacina V10',
+                              data_hora=timezone.now() + timedelta(days=1))
+        Agenda.objects.create(pet=self.thor, tipo='VACINA', titulo='Vacina antiga',
+                              data_hora=timezone.now() - timedelta(days=1))
+        resposta = self.client.get('/core/busca/', {'q': 'thor'}).json()
+        self.assertTrue(resposta['completo'])
+        self.assertEqual([(item['tipo'], item['titulo']) for item in resposta['resultados']],
+                         [('pet', 'Thor'), ('agendamento', 'Vacina V10')])
+        self.assertEqual(resposta['resultados'][0]['url'], f'/core/pets/{self.thor.pk}/')
+
+        # CPF digitado sem pontuação; a segunda chamada vem do cache
+        self.assertEqual(sugestoes('9876543')['resultados'][0]['id'], self.thor.dono_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(sugestoes('  9876543 ')['resultados']), 1)
+        self.assertEqual(sugestoes('t')['resultados'], [])
+
+    @override_settings(BUSCA_RAPIDA_ORCAMENTO_MS=0)
+    def test_busca_rapida_respeita_prazo(self):
+        cache.clear()
+        resposta = sugestoes('rex')
+        self.assertFalse(resposta['completo'])
+        self.assertEqual(resposta['resultados'], [])
+
+
+class IndicesTests(TestCase):
+    def test_consultas_quentes_usam_indices(self):
+        criar_consulta(criar_pet(), timezone.localdate())
+        for nome, queryset in consultas_quentes().items():
+            with self.subTest(consulta=nome):
+                plano = queryset.explain()
+                self.assertIn('INDEX', plano)
+                # Varredura da tabela sem índice
+                self.assertNotRegex(plano, r'(?m)SCAN core_\w+$')
+
+
+class HistoricoPetTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('recepcao'))
+        self.pet = criar_pet()
+        outro = criar_pet(nome='Outro', cpf='111.111.111-11')
+        inicio = timezone.make_aware(datetime(2023, 12, 20, 10, 0))
+        for indice in range(15):
+            data_hora = inicio + timedelta(days=indice)
+            Consulta.objects.create(pet=self.pet, data_hora=data_hora, motivo=f'Consulta {indice}')
+            Agenda.objects.create(pet=self.pet, tipo='VACINA', titulo=f'Vacina {indice}', data_hora=data_hora)
+        criar_consulta(outro, date(2024, 1, 1))
+
+    def test_historico_ordenado_e_filtrado_no_banco(self):
+        linhas = list(historico_pet(self.pet.pk))
+        self.assertEqual(len(linhas), 30)
+        # Mesmo horário: a ordem entre as origens é fixa (agenda, consulta)
+        self.assertEqual([linhas[0]['resumo'], linhas[1]['resumo']], ['Vacina 14', 'Consulta 14'])
+        self.assertEqual(linhas[0]['categoria'], 'VACINA')
+        self.assertEqual(len(historico_pet(self.pet.pk, ano=2023)), 24)
+        self.assertEqual(len(historico_pet(self.pet.pk, ano=2024, origem='agenda')), 3)
+
+    def test_pagina_inicial_e_carregar_mais(self):
+        url = f'/core/pets/{self.pet.pk}/historico/'
+        # Sessão, usuário, pet (com os anos do histórico), página, total e perfil
+        with self.assertNumQueries(6):
+            resposta = self.client.get(url)
+        pagina = resposta.context['historico']
+        self.assertEqual(len(pagina), 10)
+        self.assertEqual(pagina.total, 30)
+        self.assertEqual(resposta.context['anos'], [2024, 2023])
+        self.assertContains(resposta, 'Carregar mais')
+
+        vistos = [linha['id'] for linha in pagina]
+        cursor = pagina.proximo
+        while cursor:
+            dados = self.client.get(f'{url}itens/', {'cursor': cursor}).json()
+            vistos += [item['id'] for item in dados['itens']]
+            self.assertIn('list-group-item', dados['html'])
+            cursor = dados['proximo']
+        self.assertEqual(len(vistos), 30)
+
+        filtrado = self.client.get(url, {'ano': '2024', 'tipo': 'consulta'}).context['historico']
+        self.assertEqual([linha['resumo'] for linha in filtrado],
+                         [f'Consulta {indice}' for indice in range(14, 11, -1)])
+        self.assertEqual(self.client.get('/core/pets/0/historico/itens/').status_code, 404)
+
+
+class CalendarioEventosTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('recepcao'))
+        pet = criar_pet()
+        base = timezone.make_aware(datetime(2025, 3, 10, 9, 0))
+        Agenda.objects.create(pet=pet, tipo='VACINA', titulo='V10', data_hora=base,
+                              veterinario='MV Camila Banborra', concluido=True)
+        Agenda.objects.create(pet=pet, tipo='EXAME', titulo='Hemograma', data_hora=base + timedelta(days=1))
+        Agenda.objects.create(pet=pet, tipo='VACINA', titulo='Fora', data_hora=base + timedelta(days=60))
+        Consulta.objects.create(pet=pet, data_hora=base + timedelta(hours=2), motivo='Rotina', status='REALIZADA')
+
+    def eventos(self, **params):
+        params = {'start': '2025-03-01T00:00:00-03:00', 'end': '2025-04-01T00:00:00-03:00', **params}
+        resposta = self.client.get('/core/agenda/eventos/', params)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def test_eventos_do_intervalo(self):
+        with self.assertNumQueries(4):
+            eventos = self.eventos()
+        self.assertEqual([evento['title'] for evento in eventos],
+                         ['V10 (Rex) - MV Camila Banborra', 'Hemograma (Rex) - MV Paulo Alelúia', 'Consulta: Rex'])
+        self.assertEqual(eventos[0]['color'], '#28a745')
+        self.assertEqual(eventos[2]['color'], '#28a745')
+        self.assertTrue(eventos[0]['start'].startswith('2025-03-10T'))
+
+    def test_filtros_e_parametros_invalidos(self):
+        self.assertEqual([evento['title'] for evento in self.eventos(tipo='EXAME')],
+                         ['Hemograma (Rex) - MV Paulo Alelúia'])
+        self.assertEqual(len(self.eventos(veterinario='MV Camila Banborra')), 1)
+        self.assertEqual(len(self.eventos(start='2025-03-11', end='2025-03-12')), 1)
+        for params in ({'start': 'ontem', 'end': '2025-04-01'}, {'start': '2025-01-01', 'end': '2025-12-31'}):
+            self.assertEqual(self.client.get('/core/agenda/eventos/', params).status_code, 400)
+
+
+
+class RespostaCondicionalTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('recepcao'))
+        self.pet = criar_pet()
+        self.consulta = criar_consulta(self.pet, date(2025, 3, 10))
+
+    def test_detalhe_responde_304_sem_renderizar(self):
+        url = f'/core/pets/{self.pet.pk}/'
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('private', resposta['Cache-Control'])
+        self.assertIn('no-cache', resposta['Cache-Control'])
+        etag = resposta['ETag']
+
+        # Sessão, usuário e a consulta de versão
+        with self.assertNumQueries(3):
+            resposta = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(self.client.get(url, headers={'if-modified-since': resposta['Last-Modified']}).status_code, 304)
+
+        # Alterações em registros relacionados mudam a versão
+        Consulta.objects.filter(pk=self.consulta.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        resposta = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+        etag = resposta['ETag']
+        self.consulta.delete()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_detalhes_de_dono_e_consulta(self):
+        consulta_url = f'/core/consultas/{self.consulta.pk}/'
+        etag = self.client.get(consulta_url)['ETag']
+        self.assertEqual(self.client.get(consulta_url, headers={'if-none-match': etag}).status_code, 304)
+        self.pet.dono.save()
+        self.assertEqual(self.client.get(consulta_url, headers={'if-none-match': etag}).status_code, 200)
+
+        dono_url = f'/core/donos/{self.pet.dono_id}/'
+        etag = self.client.get(dono_url)['ETag']
+        Pet.objects.create(nome='Bidu', dono=self.pet.dono, especie='CACHORRO', sexo='M')
+        self.assertEqual(self.client.get(dono_url, headers={'if-none-match': etag}).status_code, 200)
+
+        resposta = self.client.get('/core/pets/999999/')
+        self.assertEqual(resposta.status_code, 404)
+        self.assertFalse(resposta.has_header('ETag'))
+
+    def test_etag_depende_do_usuario(self):
+        url = f'/core/pets/{self.pet.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(User.objects.create_user('veterinario'))
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_feeds_usam_a_geracao(self):
+        for url, params in (('/core/dashboard-api/', {'type': 'overview'}),
+                            ('/core/agenda/eventos/', {'start': '2025-03-01', 'end': '2025-04-01'})):
+            etag = self.client.get(url, params)['ETag']
+            self.assertEqual(self.client.get(url, params, headers={'if-none-match': etag}).status_code, 304)
+            outros = {**params, 'type': 'pets'} if 'type' in params else {**params, 'tipo': 'VACINA'}
+            self.assertEqual(self.client.get(url, outros, headers={'if-none-match': etag}).status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                Agenda.objects.create(pet=self.pet, tipo='VACINA', titulo='V10',
+                                      data_hora=timezone.make_aware(datetime(2025, 3, 11, 9, 0)))
+            self.assertEqual(self.client.get(url, params, headers={'if-none-match': etag}).status_code, 200)
+
+
+class IndexFragmentosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('recepcao'))
+        self.pet = criar_pet()
+        Consulta.objects.create(pet=self.pet, data_hora=timezone.now() + timedelta(days=1), motivo='Retorno')
+
+    def test_fragmentos_em_cache_ate_alteracao(self):
+        resposta = self.client.get('/core/')
+        self.assertContains(resposta, 'Rex')
+        # Apenas sessão, usuário e perfil (base.html): os fragmentos vêm do cache
+        with self.assertNumQueries(3):
+            self.assertContains(self.client.get('/core/'), 'Rex')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.nome = 'Thor'
+            self.pet.save()
+        # Pets e próximas consultas (que exibem o nome do pet) são refeitos;
+        # donos e agendamentos continuam em cache
+        with self.assertNumQueries(7):
+            resposta = self.client.get('/core/')
+        self.assertContains(resposta, 'Thor')
+        self.assertNotContains(resposta, '>Rex<')
+
+
+class CacheDosTestesTests(TestCase):
+    def test_testes_nao_usam_o_l2_configurado(self):
+        # core/executor_testes.py: o arquivo/memcached do servidor fica intocado
+        self.assertEqual(type(caches['compartilhado']).__name__, 'LocMemCache')
+        self.assertIsInstance(caches['default'], CacheEmCamadas)
+        self.assertEqual(caches['default'].l2, caches['compartilhado'])
+
+
+class CacheEmCamadasTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.arquivo = Path(diretorio.name) / 'cache.sqlite3'
+        configuracao = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'l2_teste': {'BACKEND': 'core.cache_backends.CacheSQLite', 'LOCATION': self.arquivo},
+        })
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def worker(self, nome, **opcoes):
+        """Simula um processo: L1 próprio, L2 compartilhado"""
+        opcoes = {'L2': 'l2_teste', 'NAMESPACES': {'contador': {'l1_timeout': 0}, 'curto:': {'timeout': 1}}, **opcoes}
+        return CacheEmCamadas(f'{self.id()}-{nome}', {'OPTIONS': opcoes})
+
+    def test_sqlite_compartilhado_e_atomico(self):
+        a, b = CacheSQLite(self.arquivo, {}), CacheSQLite(self.arquivo, {})
+        a.set('dica', {'texto': 'Água fresca'}, 30)
+        self.assertEqual(b.get('dica'), {'texto': 'Água fresca'})
+        self.assertFalse(b.add('dica', 'outra'))
+        self.assertEqual(b.get_many(['dica', 'nenhuma']), {'dica': {'texto': 'Água fresca'}})
+        a.set('expirada', 1, -1)
+        self.assertTrue(b.add('expirada', 2))
+        with self.assertRaises(ValueError):
+            a.incr('nenhuma')
+
+        a.set('total', 0, None)
+
+        def incrementar():
+            backend = CacheSQLite(self.arquivo, {})
+            for _ in range(50):
+                backend.incr('total')
+
+        threads = [threading.Thread(target=incrementar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(b.get('total'), 200)
+
+    def test_sqlite_limita_entradas(self):
+        backend = CacheSQLite(self.arquivo, {'OPTIONS': {'MAX_ENTRIES': 10}})
+        for indice in range(CacheSQLite.ESCRITAS_POR_LIMPEZA):
+            backend.set(f'chave{indice}', indice, 60 + indice)
+        self.assertLessEqual(len(backend.get_many([f'chave{indice}' for indice in range(100)])), 10)
+        self.assertEqual(backend.get('chave99'), 99)
+
+    def test_sqlite_limpeza_com_escritas_concorrentes(self):
+        # Backend compartilhado pelas threads: nenhuma escrita se perde na contagem
+        backend = CacheSQLite(self.arquivo, {})
+        with mock.patch.object(backend, '_limpar') as limpar:
+            threads = [
+                threading.Thread(target=lambda: [backend._escreveu() for _ in range(1000)])
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(limpar.call_count, 8000 // CacheSQLite.ESCRITAS_POR_LIMPEZA)
+
+    def test_camadas_entre_workers(self):
+        a, b = self.worker('a'), self.worker('b')
+        a.set('dica', 'Escove os dentes', 30)
+        self.assertEqual(b.get('dica'), 'Escove os dentes')
+        self.assertEqual(b.get('dica'), 'Escove os dentes')
+        self.assertEqual(b.estatisticas()['namespaces']['outros'], {'l1': 1, 'l2': 1, 'falhas': 0, 'taxa_acerto': 100.0})
+
+        # Contadores sem L1: a alteração feita em um worker é vista na hora
+        a.set('contador', 1, None)
+        self.assertEqual(b.get('contador'), 1)
+        a.incr('contador')
+        self.assertEqual(b.get('contador'), 2)
+        self.assertEqual(b.get_many(['contador', 'dica']), {'contador': 2, 'dica': 'Escove os dentes'})
+
+        # Timeout do namespace quando a chamada não informa um
+        a.set('curto:x', 'valor')
+        self.assertEqual(CacheSQLite(self.arquivo, {}).get('curto:x'), 'valor')
+        expira = CacheSQLite(self.arquivo, {})._conexao().execute(
+            "SELECT expira FROM cache WHERE chave LIKE '%curto:x'").fetchone()[0]
+        self.assertAlmostEqual(expira - timezone.now().timestamp(), 1, delta=0.5)
+
+        a.delete('dica')
+        self.assertIsNone(a.get('dica'))
+
+    def test_lru_limitado(self):
+        worker = self.worker('lru', L1_MAX_ENTRADAS=2)
+        for chave in ('a', 'b', 'c'):
+            worker.set(chave, chave, 30)
+        self.assertEqual(worker.estatisticas()['l1']['entradas'], 2)
+        self.assertEqual(worker.get('a'), 'a')
+        self.assertEqual(worker.estatisticas()['namespaces']['outros']['l2'], 1)
+
+
+class PetTipsTests(TestCase):
+    def test_rotacao_deterministica(self):
+        total = len(pet_tips.CATALOGO)
+        self.assertEqual({pet_tips.dica_do_periodo(periodo) for periodo in range(total)}, set(pet_tips.CATALOGO))
+        self.assertEqual(pet_tips.dica_do_periodo(7), pet_tips.dica_do_periodo(7 + total))
+
+        for dica in pet_tips.selecionar_dicas('GATO'):
+            self.assertTrue(not dica.especies or 'GATO' in dica.especies)
+        self.assertEqual({dica.categoria for dica in pet_tips.selecionar_dicas('CACHORRO', 'Cuidados com Cães')},
+                         {'Cuidados com Cães'})
+        self.assertEqual(pet_tips.selecionar_dicas('DRAGAO'), pet_tips.CATALOGO)
+
+    @override_settings(PET_TIPS_INTERVALO=10)
+    def test_lote_sem_cache_e_com_validade(self):
+        agora = 1_700_000_003
+        dicas = pet_tips.proximas_dicas(3, agora=agora)
+        self.assertEqual([(dica['inicio'], dica['fim']) for dica in dicas],
+                         [(1_700_000_000, 1_700_000_010), (1_700_000_010, 1_700_000_020), (1_700_000_020, 1_700_000_030)])
+        self.assertEqual(dicas[1]['tip'], pet_tips.dica_do_periodo(170_000_001).texto)
+
+        cache.clear()
+        with self.assertNumQueries(0):
+            resposta = self.client.get('/api/pet-tip/', {'quantidade': 4, 'especie': 'GATO'})
+        self.assertEqual(cache.get_many(['current_pet_tip']), {})
+        dados = resposta.json()
+        self.assertEqual(len(dados['dicas']), 4)
+        self.assertEqual(dados['tip'], dados['dicas'][0]['tip'])
+        self.assertIn('public', resposta['Cache-Control'])
+        self.assertLessEqual(int(resposta['Cache-Control'].split('max-age=')[1]), 10)
+        self.assertTrue(resposta.has_header('Expires'))
+        self.assertEqual(self.client.get('/api/pet-tip/', {'quantidade': 'x'}).status_code, 400)
+
+
+class EventosAoVivoTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('recepcao')
+        self.pet = criar_pet()
+
+    def test_signals_publicam_alteracoes(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def assinar():
+            return ao_vivo.assinar(['dashboard'])
+
+        assinatura = loop.run_until_complete(assinar())
+        self.addCleanup(ao_vivo.cancelar, assinatura)
+        with self.captureOnCommitCallbacks(execute=True):
+            consulta = criar_consulta(self.pet, date(2025, 3, 10))
+        with self.captureOnCommitCallbacks(execute=True):
+            consulta.status = 'REALIZADA'
+            consulta.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            consulta.delete()
+        # Entrega os eventos agendados com call_soon_threadsafe
+        loop.run_until_complete(asyncio.sleep(0))
+
+        eventos = []
+        while not assinatura.fila.empty():
+            evento = assinatura.fila.get_nowait()
+            self.assertIn('event: dashboard', evento)
+            eventos.append(json.loads(evento.split('data: ', 1)[1]))
+        self.assertEqual([(evento['acao'], evento['status_anterior']) for evento in eventos],
+                         [('criado', None), ('status', 'AGENDADA'), ('excluido', None)])
+        self.assertEqual(eventos[1]['status'], 'REALIZADA')
+
+    async def test_fluxo_asgi(self):
+        await self.async_client.aforce_login(self.usuario)
+        resposta = await self.async_client.get('/core/eventos/', {'canais': 'dicas,dashboard'})
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        fluxo = aiter(resposta.streaming_content)
+        self.assertTrue((await anext(fluxo)).startswith(b'retry:'))
+        self.assertIn(b'event: dica', await anext(fluxo))
+
+        proximo = asyncio.ensure_future(anext(fluxo))
+        while not ao_vivo.conexoes():
+            await asyncio.sleep(0)
+        # Publicação a partir de outra thread, como nos signals das views síncronas
+        await asyncio.to_thread(ao_vivo.publicar, 'dashboard', 'dashboard', {'acao': 'criado'})
+        evento = await asyncio.wait_for(proximo, timeout=5)
+        self.assertIn(b'event: dashboard', evento)
+        self.assertIn(b'"acao": "criado"', evento)
+        # Na desconexão o servidor ASGI cancela a espera pelo próximo evento
+        pendente = asyncio.ensure_future(anext(fluxo))
+        await asyncio.sleep(0)
+        pendente.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pendente
+        self.assertEqual(ao_vivo.conexoes(), 0)
+
+    def test_wsgi_envia_apenas_o_inicio(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.get('/core/eventos/', {'canais': 'dicas'})
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        self.assertIn(b'event: dica', resposta.content)
+        self.assertTrue(resposta.content.decode().endswith(ao_vivo.encerrado('wsgi')))
+        self.assertEqual(self.client.get('/core/eventos/', {'canais': 'outro'}).status_code, 400)
+
+
+class RotaEventosAoVivoTests(TransactionTestCase):
+    # A sessão é lida em outra thread: os dados precisam estar gravados
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('recepcao'))
+        self.sessao = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    async def abrir(self, query=b'canais=dashboard', sessao=None):
+        """Conexão ASGI com a aplicação de pet_vet_project/asgi.py"""
+        from pet_vet_project.asgi import application
+
+        entrada, saida = asyncio.Queue(), asyncio.Queue()
+        entrada.put_nowait({'type': 'http.request', 'body': b'', 'more_body': False})
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': '/core/eventos/', 'raw_path': b'/core/eventos/',
+            'query_string': query, 'root_path': '', 'client': ('127.0.0.1', 5000),
+            'server': ('testserver', 80),
+            'headers': [(b'cookie', f'{settings.SESSION_COOKIE_NAME}={sessao or self.sessao}'.encode())],
+        }
+        tarefa = asyncio.create_task(application(scope, entrada.get, saida.put))
+        inicio = await asyncio.wait_for(saida.get(), 5)
+        return tarefa, entrada, saida, inicio
+
+    def test_conexoes_ociosas_nao_ocupam_threads(self):
+        # Loop próprio, como o de um servidor ASGI (um teste async rodaria
+        # dentro de async_to_sync, que concentra o código síncrono na thread
+        # do teste e esconderia as threads por conexão)
+        asyncio.run(self.conexoes_ociosas())
+
+    async def conexoes_ociosas(self):
+        # A autenticação usa o pool padrão do loop, limitado aqui a 2 threads
+        pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(pool.shutdown)
+        asyncio.get_running_loop().set_default_executor(pool)
+        threads = threading.active_count()
+        conexoes = []
+        for _ in range(25):
+            conexoes.append(await self.abrir())
+        for tarefa, entrada, saida, inicio in conexoes:
+            self.assertEqual(inicio['status'], 200)
+            self.assertIn((b'content-type', b'text/event-stream'), inicio['headers'])
+            self.assertTrue((await saida.get())['body'].startswith(b'retry:'))
+        while ao_vivo.conexoes() < 25:
+            await asyncio.sleep(0)
+        self.assertLessEqual(threading.active_count(), threads + 2)
+
+        await asyncio.to_thread(ao_vivo.publicar, 'dashboard', 'dashboard', {'acao': 'criado'})
+        tarefa, entrada, saida, inicio = conexoes[-1]
+        self.assertIn(b'event: dashboard', (await asyncio.wait_for(saida.get(), 5))['body'])
+
+        for tarefa, entrada, saida, inicio in conexoes:
+            entrada.put_nowait({'type': 'http.disconnect'})
+        await asyncio.wait_for(asyncio.gather(*(conexao[0] for conexao in conexoes)), 5)
+        self.assertEqual(ao_vivo.conexoes(), 0)
+
+    async def test_sem_sessao_ou_canal_segue_para_o_django(self):
+        tarefa, entrada, saida, inicio = await self.abrir(sessao='invalida')
+        await tarefa
+        self.assertEqual(inicio['status'], 302)
+        tarefa, entrada, saida, inicio = await self.abrir(query=b'canais=outro')
+        await tarefa
+        self.assertEqual(inicio['status'], 400)
+
+
+@override_settings(CAPTCHA_POOL_TAMANHO=3)
+class CaptchaTests(TestCase):
+    def setUp(self):
+        captcha._estoque.clear()
+        self.addCleanup(captcha._estoque.clear)
+
+    def test_captcha_gerado(self):
+        texto, imagem = captcha.gerar()
+        self.assertRegex(texto, r'^[A-Z0-9]{6}$')
+        self.assertTrue(imagem.startswith('data:image/png;base64,'))
+        png = Image.open(io.BytesIO(base64.b64decode(imagem.split(',', 1)[1])))
+        self.assertEqual(png.size, (200, 80))
+
+    def test_view_retira_do_estoque(self):
+        captcha.encher()
+        self.assertEqual(captcha.tamanho_estoque(), 3)
+        primeiro = captcha._estoque[0]
+        data = self.client.get('/core/generate-captcha/').json()
+        self.assertEqual(data['image'], primeiro.imagem)
+        self.assertEqual(self.client.session[f"captcha_{data['captcha_id']}"], primeiro.texto)
+        # Cada captcha é entregue uma única vez
+        self.assertNotEqual(self.client.get('/core/generate-captcha/').json()['image'], primeiro.imagem)
+
+    def test_estoque_vazio_gera_na_requisicao(self):
+        with mock.patch.object(captcha, '_iniciar_reposicao'):
+            texto, imagem = captcha.obter()
+        self.assertEqual(len(texto), 6)
+        self.assertEqual(captcha.tamanho_estoque(), 0)
@@ -0,0 +1,144 @@
+"""
+Agrupamento de registros em séries temporais para os gráficos do dashboard.
+
+Cada série é calculada com uma única consulta agrupada ao banco; os
+intervalos sem registros são preenchidos com zero em Python.
+"""
+
+from datetime import date, datetime, timedelta
+
+from django.db import models
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+# Tamanho (em dias) dos intervalos de granularidade fixa
+PASSOS = {
+    'day': 1,
+    'week': 7,
+    'fortnight': 14,
+}
+
+GRANULARIDADES = tuple(PASSOS) + ('month',)
+
+
+def somar_meses(data, meses):
+    """Retorna o primeiro dia do mês deslocado ``meses`` a partir de ``data``"""
+    indice = data.year * 12 + (data.month - 1) + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def intervalos_periodo(inicio, fim, granularidade='day'):
+    """
+    Divide o período [inicio, fim] (datas inclusivas) em intervalos.
+
+    Para 'month' os intervalos seguem o calendário; para as demais
+    granularidades são ancorados no fim do período, de modo que apenas o
+    intervalo mais antigo pode ser parcial.
+
+    Returns:
+        list[tuple[date, date]]: pares (início, fim) em ordem cronológica
+    """
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f'Granularidade inválida: {granularidade}')
+    if inicio > fim:
+        return []
+
+    intervalos = []
+    if granularidade == 'month':
+        mes = inicio.replace(day=1)
+        while mes <= fim:
+            proximo = somar_meses(mes, 1)
+            intervalos.append((max(mes, inicio), min(proximo - timedelta(days=1), fim)))
+            mes = proximo
+        return intervalos
+
+    passo = PASSOS[granularidade]
+    intervalo_fim = fim
+    while intervalo_fim >= inicio:
+        intervalo_inicio = max(intervalo_fim - timedelta(days=passo - 1), inicio)
+        intervalos.append((intervalo_inicio, intervalo_fim))
+        intervalo_fim = intervalo_inicio - timedelta(days=1)
+    return intervalos[::-1]
+
+
+def intervalo_do_dia(dia):
+    """Retorna (início, fim) do dia no fuso local, para filtros ``gte``/``lt`` que usam índices"""
+    inicio = timezone.make_aware(datetime.combine(dia, datetime.min.time()))
+    return inicio, timezone.make_aware(datetime.combine(dia + timedelta(days=1), datetime.min.time()))
+
+
+def _como_data(valor):
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.date()
+    return valor
+
+
+def contar_por_periodo(queryset, inicio, fim, granularidade='day', campo='data_hora', agregado=None):
+    """
+    Conta os registros de ``queryset`` em cada intervalo do período.
+
+    Args:
+        queryset: QuerySet base (filtros adicionais já aplicados)
+        inicio, fim (date): limites do período, inclusivos
+        granularidade (str): 'day', 'week', 'fortnight' ou 'month'
+        campo (str): campo de data/data-hora usado para agrupar
+        agregado: expressão de agregação (padrão: ``Count('id')``)
+
+    Returns:
+        list[dict]: ``{'inicio', 'fim', 'total'}`` para cada intervalo,
+        em ordem cronológica, incluindo os intervalos sem registros
+    """
+    intervalos = intervalos_periodo(inicio, fim, granularidade)
+    if not intervalos:
+        return []
+
+    if agregado is None:
+        agregado = Count('id')
+
+    # Campos DateTimeField são comparados/agrupados pela data local
+    com_hora = isinstance(queryset.model._meta.get_field(campo), models.DateTimeField)
+    filtro = f'{campo}__date__range' if com_hora else f'{campo}__range'
+
+    if granularidade == 'month':
+        chave = TruncMonth(campo, output_field=models.DateField())
+    elif com_hora:
+        chave = TruncDate(campo)
+    else:
+        chave = models.F(campo)
+
+    linhas = (queryset
+              .filter(**{filtro: (inicio, fim)})
+              .annotate(periodo=chave)
+              .values('periodo')
+              .annotate(total=agregado)
+              .order_by())
+
+    totais = {}
+    for linha in linhas:
+        periodo = _como_data(linha['periodo'])
+        totais[periodo] = totais.get(periodo, 0) + (linha['total'] or 0)
+
+    serie = []
+    if granularidade == 'month':
+        for intervalo_inicio, intervalo_fim in intervalos:
+            serie.append({
+                'inicio': intervalo_inicio,
+                'fim': intervalo_fim,
+                'total': totais.get(intervalo_inicio.replace(day=1), 0),
+            })
+        return serie
+
+    # Soma os totais diários dentro de cada intervalo
+    dias = sorted(totais)
+    posicao = 0
+    for intervalo_inicio, intervalo_fim in intervalos:
+        total = 0
+        while posicao < len(dias) and dias[posicao] <= intervalo_fim:
+            if dias[posicao] >= intervalo_inicio:
+                total += totais[dias[posicao]]
+            posicao += 1
+        serie.append({'inicio': intervalo_inicio, 'fim': intervalo_fim, 'total': total})
+    return serie
@@ -11,6 +11,9 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('dashboard/estatisticas/', views.dashboard_estatisticas, name='dashboard_estatisticas'),
+    path('orcamento-consultas/', views.orcamento_consultas, name='orcamento_consultas'),
+    path('busca/', views.busca_rapida, name='busca_rapida'),
+    path('eventos/', views.eventos_ao_vivo, name='eventos_ao_vivo'),
     
     # Dashboard Veterinário
     path('dashboard-veterinario/', dashboard_views.dashboard_home, name='dashboard_veterinario'),
@@ -19,6 +22,8 @@ urlpatterns = [
     path('dashboard-debug/', dashboard_views.dashboard_debug, name='dashboard_debug'),
     path('dashboard-simple/', dashboard_views.dashboard_simple, name='dashboard_simple'),
     path('dashboard-api/', dashboard_views.dashboard_api, name='dashboard_api'),
+    path('dashboard-api/async/', dashboard_views.dashboard_api_async, name='dashboard_api_async'),
+    path('dashboard-cache/', dashboard_views.dashboard_cache_stats, name='dashboard_cache_stats'),
     
     # Donos
     path('donos/', views.dono_list, name='dono_list'),
@@ -32,6 +37,7 @@ urlpatterns = [
     path('pets/novo/', views.pet_create, name='pet_create'),
     path('pets/<int:pk>/', views.pet_detail, name='pet_detail'),
     path('pets/<int:pk>/historico/', views.pet_historico, name='pet_historico'),
+    path('pets/<int:pk>/historico/itens/', views.pet_historico_itens, name='pet_historico_itens'),
     path('pets/<int:pk>/editar/', views.pet_update, name='pet_update'),
     path('pets/<int:pk>/excluir/', views.pet_delete, name='pet_delete'),
     
@@ -67,6 +73,7 @@ urlpatterns = [
     path('agenda/<int:pk>/delete/', views.agenda_delete, name='agenda_delete'),
     path('agenda/<int:pk>/confirmar/', views.agenda_confirmar, name='agenda_confirmar'),
     path('agenda/calendario/', views.agenda_calendario, name='agenda_calendario'),
+    path('agenda/eventos/', views.agenda_eventos, name='agenda_eventos'),
     path('agenda/<int:pk>/concluir/', views.agenda_concluir, name='agenda_concluir'),
     path('consulta/<int:pk>/', views.consulta_detalhe, name='consulta_detalhe'),
     path('profile/edit/', views.profile_edit, name='profile_edit'),
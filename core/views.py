@@ -1,60 +1,69 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Q, Count, F, ExpressionWrapper, DurationField, DateTimeField
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models import Count, F, ExpressionWrapper, DurationField, DateTimeField, OuterRef, Subquery
 from django.db.models.functions import TruncDate, TruncHour, TruncMonth
-from django.http import JsonResponse, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate, login
 from .models import Dono, Pet, Consulta, Medicacao, Prescricao, Agenda
 from .forms import DonoForm, PetForm, ConsultaForm, MedicacaoForm, PrescricaoForm, AgendaForm, ProfileForm, UserForm
-from django.core.paginator import Paginator
 from django.views.generic import TemplateView
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.contrib.admin.views.decorators import staff_member_required
 from django.conf import settings
-from itertools import chain
-from operator import attrgetter
 from datetime import datetime, timedelta
-import random
+import secrets
 import json
 
 # Importa o módulo de dicas de pets
-from . import pet_tips
+from . import ao_vivo, captcha, pet_tips
+from .busca import buscar, filtro_busca, sugestoes
+from .condicional import condicional, versao_consulta, versao_dono, versao_pet, versao_por_geracao
+from .feeds import ORDENACAO_FEED, descrever_historico, eventos_calendario, feed_consultas, historico_pet
+from .fragmentos import versoes_modelos
+from .middleware import limpar_registros, resumo_por_url
+from .paginacao import paginar_por_cursor
+from .timeseries import intervalo_do_dia
 
 # Páginas principais
 @login_required
 def index(request):
     """Página inicial do sistema"""
-    total_pets = Pet.objects.count()
-    total_donos = Dono.objects.count()
-    total_consultas = Consulta.objects.count()
-    total_agendamentos = Agenda.objects.count()
-    proximas_consultas = Consulta.objects.filter(
-        data_hora__gte=timezone.now(),
+    # Contagens e listas são passadas sem avaliar (métodos e querysets): os
+    # blocos {% cache %} do template só as executam quando o fragmento não
+    # está em cache para as versões atuais dos modelos
+    agora = timezone.now()
+    proximas_consultas = Consulta.objects.para_listagem().filter(
+        data_hora__gte=agora,
         status__in=['AGENDADA', 'CONFIRMADA']
     ).order_by('data_hora')[:5]
     
-    proximos_agendamentos = Agenda.objects.filter(
-        data_hora__gte=timezone.now(),
+    proximos_agendamentos = Agenda.objects.para_listagem().filter(
+        data_hora__gte=agora,
         concluido=False
     ).order_by('data_hora')[:5]
     
-    pets = Pet.objects.all().order_by('-id')[:3]
+    pets = Pet.objects.para_listagem().order_by('-id')[:3]
     donos = Dono.objects.all().order_by('-id')[:3]
     
-    # Obtém uma dica de cuidado com pets
-    pet_tip = pet_tips.get_random_pet_tip()
+    # Dica de cuidado com pets do período atual
+    pet_tip = pet_tips.dica_atual()
     
     context = {
-        'total_pets': total_pets,
-        'total_donos': total_donos,
-        'total_consultas': total_consultas,
-        'total_agendamentos': total_agendamentos,
+        'total_pets': Pet.objects.count,
+        'total_donos': Dono.objects.count,
+        'total_consultas': Consulta.objects.count,
+        'total_agendamentos': Agenda.objects.count,
         'proximas_consultas': proximas_consultas,
         'proximos_agendamentos': proximos_agendamentos,
         'pets': pets,
         'donos': donos,
         'pet_tip': pet_tip,
+        'versoes': versoes_modelos(),
+        'fragmentos_timeout': settings.INDEX_FRAGMENTOS_TIMEOUT,
     }
     return render(request, 'core/index.html', context)
 
@@ -62,21 +71,24 @@ def index(request):
 @login_required
 def dashboard(request):
     """Dashboard com estatísticas e informações gerais"""
-    hoje = timezone.now().date()
+    hoje = timezone.localdate()
+    # Intervalo do dia em vez de data_hora__date, que aplica uma função à
+    # coluna e impede o uso dos índices
+    inicio, fim = intervalo_do_dia(hoje)
     
     # Consultas do dia
-    consultas_hoje = Consulta.objects.filter(
-        data_hora__date=hoje
+    consultas_hoje = Consulta.objects.para_listagem().filter(
+        data_hora__gte=inicio, data_hora__lt=fim
     ).order_by('data_hora')
     
     # Agendamentos do dia
-    agendamentos_hoje = Agenda.objects.filter(
-        data_hora__date=hoje,
+    agendamentos_hoje = Agenda.objects.para_listagem().filter(
+        data_hora__gte=inicio, data_hora__lt=fim,
         concluido=False
     ).order_by('data_hora')
     
     # Pets recentemente cadastrados
-    pets_recentes = Pet.objects.all().order_by('-data_cadastro')[:5]
+    pets_recentes = Pet.objects.para_listagem().order_by('-data_cadastro')[:5]
     
     context = {
         'consultas_hoje': consultas_hoje,
@@ -144,24 +156,60 @@ def dashboard_estatisticas(request):
         'dados_graficos': json.dumps(dados_graficos),
     })
 
+@staff_member_required
+def orcamento_consultas(request):
+    """Endpoints com mais consultas SQL nas requisições recentes"""
+    if request.method == 'POST':
+        limpar_registros()
+        messages.success(request, 'Medições de consultas descartadas.')
+        return redirect('core:orcamento_consultas')
+
+    return render(request, 'core/orcamento_consultas.html', {
+        'endpoints': resumo_por_url(),
+    })
+
+@login_required
+def busca_rapida(request):
+    """Sugestões da busca da barra de navegação (donos, pets e próximos agendamentos)"""
+    return JsonResponse(sugestoes(request.GET.get('q', '')))
+
+@login_required
+async def eventos_ao_vivo(request):
+    """
+    Server-sent events (core/ao_vivo.py): ?canais=dicas,dashboard e
+    ?especie= para restringir as dicas. Sob ASGI os fluxos autenticados são
+    atendidos antes, por ``ao_vivo.com_eventos_ao_vivo``.
+    """
+    pedidos = ao_vivo.parametros(request.GET)
+    if pedidos is None:
+        return JsonResponse({'error': 'Nenhum canal válido'}, status=400)
+    canais, especie = pedidos
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(ao_vivo.fluxo(canais, especie), content_type='text/event-stream')
+    else:
+        # Sob WSGI uma resposta sem fim prenderia uma thread; ver core/ao_vivo.py
+        partes = [*ao_vivo.inicio(canais, especie), ao_vivo.encerrado('wsgi')]
+        response = HttpResponse(''.join(partes), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Desliga o buffer de proxies (nginx)
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # Views para Donos
 @login_required
 def dono_list(request):
     """Lista todos os donos cadastrados"""
     query = request.GET.get('q', '')
     if query:
-        donos = Dono.objects.filter(
-            Q(nome__icontains=query) | 
-            Q(cpf__icontains=query) | 
-            Q(email__icontains=query)
-        ).order_by('nome')
+        # Busca textual (nome, CPF, e-mail e telefone) ordenada por relevância
+        donos = buscar(Dono.objects.all(), 'busca_dono', query, ['nome', 'cpf', 'email'], digitos=True)
+        ordenacao = ['relevancia', 'nome', 'id']
     else:
-        donos = Dono.objects.all().order_by('nome')
+        donos = Dono.objects.all()
+        ordenacao = ['nome', 'id']
     
-    # Paginação: 10 donos por página
-    paginator = Paginator(donos, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor: 10 donos por página
+    page_obj = paginar_por_cursor(donos, ordenacao, 10, request.GET.get('cursor'))
     
     context = {
         'donos': page_obj,
@@ -188,10 +236,11 @@ def dono_create(request):
     return render(request, 'core/dono/form.html', context)
 
 @login_required
+@condicional(versao_dono)
 def dono_detail(request, pk):
     """Exibe detalhes de um dono"""
-    dono = get_object_or_404(Dono, pk=pk)
-    pets = Pet.objects.filter(dono=dono).order_by('nome')
+    dono = get_object_or_404(Dono.objects.para_detalhe(), pk=pk)
+    pets = dono.pets.all()
     
     context = {
         'dono': dono,
@@ -242,24 +291,21 @@ def pet_list(request):
     """Lista todos os pets"""
     search_query = request.GET.get('search', '')
     if search_query:
-        pets = Pet.objects.filter(
-            Q(nome__icontains=search_query) |
-            Q(dono__nome__icontains=search_query) |
-            Q(especie__icontains=search_query) |
-            Q(raca__icontains=search_query)
-        ).order_by('nome')
+        pets = buscar(
+            Pet.objects.para_listagem(), 'busca_pet', search_query,
+            ['nome', 'dono__nome', 'especie', 'raca'],
+        )
+        ordenacao = ['relevancia', 'nome', 'id']
     else:
-        pets = Pet.objects.all().order_by('nome')
+        pets = Pet.objects.para_listagem()
+        ordenacao = ['nome', 'id']
     
-    # Paginação
-    paginator = Paginator(pets, 6)  # 6 pets por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor
+    page_obj = paginar_por_cursor(pets, ordenacao, 6, request.GET.get('cursor'))  # 6 pets por página
     
     context = {
         'pets': page_obj,
         'search_query': search_query,
-        'total_pets': pets.count(),
     }
     return render(request, 'core/pet/list.html', context)
 
@@ -282,9 +328,10 @@ def pet_create(request):
     return render(request, 'core/pet/form.html', context)
 
 @login_required
+@condicional(versao_pet)
 def pet_detail(request, pk):
     """Exibe detalhes de um pet"""
-    pet = get_object_or_404(Pet, pk=pk)
+    pet = get_object_or_404(Pet.objects.para_detalhe(), pk=pk)
     consultas = Consulta.objects.filter(pet=pet).order_by('-data_hora')[:5]  # Mostra apenas as 5 mais recentes
     agendamentos = Agenda.objects.filter(pet=pet).order_by('-data_hora')[:5]  # Mostra apenas os 5 mais recentes
     
@@ -295,32 +342,72 @@ def pet_detail(request, pk):
     }
     return render(request, 'core/pet/detail.html', context)
 
+# Entradas do histórico por página (render inicial e "carregar mais")
+HISTORICO_POR_PAGINA = 10
+
+
+def _pagina_historico(request, pet_id, contar=True):
+    """Página do histórico do pet conforme ?ano=, ?tipo= e ?cursor="""
+    ano = request.GET.get('ano', '')
+    ano = int(ano) if ano.isdigit() and 1 <= int(ano) < 9999 else None
+    tipo = request.GET.get('tipo', '')
+    pagina = paginar_por_cursor(
+        lambda filtro: historico_pet(pet_id, ano, tipo, filtro),
+        ORDENACAO_FEED, HISTORICO_POR_PAGINA, request.GET.get('cursor'), contar=contar,
+    )
+    for linha in pagina:
+        descrever_historico(linha)
+    return pagina, ano, tipo
+
+
+def _anos_historico(pet):
+    """Anos do primeiro ao último registro do pet (anotados em pet_historico), do mais recente ao mais antigo"""
+    datas = [data for data in (pet.primeira_consulta, pet.primeiro_agendamento,
+                               pet.ultima_consulta, pet.ultimo_agendamento) if data]
+    if not datas:
+        return []
+    anos = [timezone.localtime(data).year for data in datas]
+    return list(range(max(anos), min(anos) - 1, -1))
+
+
 @login_required
 def pet_historico(request, pk):
-    """Exibe o histórico completo de consultas e agendamentos do pet"""
-    pet = get_object_or_404(Pet, pk=pk)
-    
-    # Obtém todas as consultas e agendamentos ordenados por data (mais recente primeiro)
-    consultas = Consulta.objects.filter(pet=pet).order_by('-data_hora')
-    agendamentos = Agenda.objects.filter(pet=pet).order_by('-data_hora')
-    
-    # Combina as consultas e agendamentos em uma única lista ordenada por data
-    historico = sorted(
-        list(consultas) + list(agendamentos),
-        key=lambda x: x.data_hora,
-        reverse=True
-    )
+    """Exibe o histórico de consultas e agendamentos do pet, paginado"""
+    def extremo(modelo, ordem):
+        return Subquery(modelo.objects.filter(pet=OuterRef('pk')).order_by(ordem).values('data_hora')[:1])
+
+    pet = get_object_or_404(Pet.objects.para_detalhe().annotate(
+        primeira_consulta=extremo(Consulta, 'data_hora'),
+        ultima_consulta=extremo(Consulta, '-data_hora'),
+        primeiro_agendamento=extremo(Agenda, 'data_hora'),
+        ultimo_agendamento=extremo(Agenda, '-data_hora'),
+    ), pk=pk)
+    pagina, ano, tipo = _pagina_historico(request, pet.pk)
     
     context = {
         'pet': pet,
-        'historico': historico,
+        'historico': pagina,
+        'anos': _anos_historico(pet),
+        'ano': ano,
+        'tipo': tipo,
     }
     return render(request, 'core/pet/historico.html', context)
 
+@login_required
+def pet_historico_itens(request, pk):
+    """Próxima página do histórico em JSON (botão Carregar mais)"""
+    pet = get_object_or_404(Pet.objects.only('pk'), pk=pk)
+    pagina, _, _ = _pagina_historico(request, pet.pk, contar=False)
+    return JsonResponse({
+        'itens': pagina.object_list,
+        'html': render_to_string('core/pet/_historico_itens.html', {'historico': pagina}, request=request),
+        'proximo': pagina.proximo,
+    })
+
 @login_required
 def pet_update(request, pk):
     """Atualiza dados de um pet"""
-    pet = get_object_or_404(Pet, pk=pk)
+    pet = get_object_or_404(Pet.objects.para_detalhe(), pk=pk)
     
     if request.method == 'POST':
         form = PetForm(request.POST, request.FILES, instance=pet)
@@ -341,7 +428,7 @@ def pet_update(request, pk):
 @login_required
 def pet_delete(request, pk):
     """Remove um pet"""
-    pet = get_object_or_404(Pet, pk=pk)
+    pet = get_object_or_404(Pet.objects.para_detalhe(), pk=pk)
     
     if request.method == 'POST':
         nome = pet.nome
@@ -361,42 +448,12 @@ def consulta_list(request):
     status = request.GET.get('status', '')
     query = request.GET.get('q', '')
     
-    # Busca consultas
-    consultas = Consulta.objects.all()
-    if status:
-        consultas = consultas.filter(status=status)
-    if query:
-        consultas = consultas.filter(
-            Q(pet__nome__icontains=query) | 
-            Q(motivo__icontains=query) | 
-            Q(diagnostico__icontains=query)
-        )
-    consultas = consultas.order_by('-data_hora')
-    
-    # Busca agendamentos confirmados
-    agendamentos = Agenda.objects.filter(status='CONFIRMADO')
-    if query:
-        agendamentos = agendamentos.filter(
-            Q(pet__nome__icontains=query) |
-            Q(titulo__icontains=query) |
-            Q(descricao__icontains=query)
-        )
-    agendamentos = agendamentos.order_by('-data_hora')
-    
-    # Combina os resultados
-    from itertools import chain
-    from operator import attrgetter
-    resultados = sorted(
-        chain(consultas, agendamentos),
-        key=attrgetter('data_hora'),
-        reverse=True
+    # Consultas e agendamentos unidos, ordenados e paginados pelo banco
+    page_obj = paginar_por_cursor(
+        lambda filtro: feed_consultas(status, query, filtro),
+        ORDENACAO_FEED, 6, request.GET.get('cursor')  # 6 itens por página
     )
     
-    # Paginação
-    paginator = Paginator(resultados, 6)  # 6 itens por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
     context = {
         'page_obj': page_obj,
         'status': status,
@@ -428,10 +485,11 @@ def consulta_create(request):
     return render(request, 'core/consulta/form.html', context)
 
 @login_required
+@condicional(versao_consulta)
 def consulta_detail(request, pk):
     """Exibe detalhes de uma consulta"""
-    consulta = get_object_or_404(Consulta, pk=pk)
-    prescricoes = Prescricao.objects.filter(consulta=consulta)
+    consulta = get_object_or_404(Consulta.objects.para_detalhe(), pk=pk)
+    prescricoes = consulta.prescricoes.all()
     
     context = {
         'consulta': consulta,
@@ -442,7 +500,7 @@ def consulta_detail(request, pk):
 @login_required
 def consulta_update(request, pk):
     """Atualiza dados de uma consulta"""
-    consulta = get_object_or_404(Consulta, pk=pk)
+    consulta = get_object_or_404(Consulta.objects.para_listagem(), pk=pk)
     
     if request.method == 'POST':
         form = ConsultaForm(request.POST, instance=consulta)
@@ -463,7 +521,7 @@ def consulta_update(request, pk):
 @login_required
 def consulta_delete(request, pk):
     """Remove uma consulta"""
-    consulta = get_object_or_404(Consulta, pk=pk)
+    consulta = get_object_or_404(Consulta.objects.para_listagem(), pk=pk)
     
     if request.method == 'POST':
         pet_nome = consulta.pet.nome
@@ -478,7 +536,7 @@ def consulta_delete(request, pk):
 
 @login_required
 def consulta_confirmar(request, pk):
-    consulta = get_object_or_404(Consulta, pk=pk)
+    consulta = get_object_or_404(Consulta.objects.para_listagem(), pk=pk)
     if request.method == 'POST':
         consulta.status = 'CONFIRMADA'
         consulta.save()
@@ -488,7 +546,7 @@ def consulta_confirmar(request, pk):
 
 @login_required
 def consulta_realizar(request, pk):
-    consulta = get_object_or_404(Consulta, pk=pk)
+    consulta = get_object_or_404(Consulta.objects.para_listagem(), pk=pk)
     if request.method == 'POST':
         consulta.status = 'REALIZADA'
         consulta.save()
@@ -498,7 +556,7 @@ def consulta_realizar(request, pk):
 
 @login_required
 def consulta_cancelar(request, pk):
-    consulta = get_object_or_404(Consulta, pk=pk)
+    consulta = get_object_or_404(Consulta.objects.para_listagem(), pk=pk)
     if request.method == 'POST':
         consulta.status = 'CANCELADA'
         consulta.save()
@@ -512,17 +570,14 @@ def medicacao_list(request):
     """Lista todas as medicações"""
     query = request.GET.get('q', '')
     if query:
-        medicacoes = Medicacao.objects.filter(
-            Q(nome__icontains=query) | 
-            Q(descricao__icontains=query)
-        ).order_by('nome')
+        medicacoes = buscar(Medicacao.objects.all(), 'busca_medicacao', query, ['nome', 'descricao'])
+        ordenacao = ['relevancia', 'nome', 'id']
     else:
-        medicacoes = Medicacao.objects.all().order_by('nome')
+        medicacoes = Medicacao.objects.all()
+        ordenacao = ['nome', 'id']
     
-    # Paginação
-    paginator = Paginator(medicacoes, 6)  # 6 medicações por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor
+    page_obj = paginar_por_cursor(medicacoes, ordenacao, 6, request.GET.get('cursor'))  # 6 medicações por página
     
     context = {
         'page_obj': page_obj,
@@ -551,8 +606,8 @@ def medicacao_create(request):
 @login_required
 def medicacao_detail(request, pk):
     """Exibe detalhes de uma medicação"""
-    medicacao = get_object_or_404(Medicacao, pk=pk)
-    prescricoes = Prescricao.objects.filter(medicacao=medicacao).order_by('-data_inicio')
+    medicacao = get_object_or_404(Medicacao.objects.para_detalhe(), pk=pk)
+    prescricoes = Prescricao.objects.para_listagem().filter(medicacao=medicacao).order_by('-data_inicio')
     
     context = {
         'medicacao': medicacao,
@@ -605,7 +660,7 @@ def agenda_list(request):
     concluido = request.GET.get('concluido', '')
     query = request.GET.get('q', '')
     
-    agendamentos = Agenda.objects.all()
+    agendamentos = Agenda.objects.para_listagem()
     
     if tipo:
         agendamentos = agendamentos.filter(tipo=tipo)
@@ -616,17 +671,12 @@ def agenda_list(request):
     
     if query:
         agendamentos = agendamentos.filter(
-            Q(titulo__icontains=query) | 
-            Q(pet__nome__icontains=query) | 
-            Q(descricao__icontains=query)
+            filtro_busca('busca_agenda', query, ['titulo', 'descricao']) |
+            filtro_busca('busca_pet', query, ['pet__nome'], campo_id='pet_id', colunas=['nome'])
         )
     
-    agendamentos = agendamentos.order_by('-data_hora')
-    
-    # Paginação
-    paginator = Paginator(agendamentos, 6)  # 6 agendamentos por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor
+    page_obj = paginar_por_cursor(agendamentos, ['-data_hora', '-id'], 6, request.GET.get('cursor'))  # 6 agendamentos por página
     
     context = {
         'page_obj': page_obj,
@@ -662,7 +712,7 @@ def agenda_create(request):
 @login_required
 def agenda_detail(request, pk):
     """Exibe detalhes de um agendamento"""
-    agenda = get_object_or_404(Agenda, pk=pk)
+    agenda = get_object_or_404(Agenda.objects.para_detalhe(), pk=pk)
     
     context = {
         'agenda': agenda,
@@ -672,7 +722,7 @@ def agenda_detail(request, pk):
 @login_required
 def agenda_update(request, pk):
     """Atualiza dados de um agendamento"""
-    agenda = get_object_or_404(Agenda, pk=pk)
+    agenda = get_object_or_404(Agenda.objects.para_detalhe(), pk=pk)
     
     if request.method == 'POST':
         form = AgendaForm(request.POST, instance=agenda)
@@ -693,7 +743,7 @@ def agenda_update(request, pk):
 @login_required
 def agenda_delete(request, pk):
     """Remove um agendamento"""
-    agenda = get_object_or_404(Agenda, pk=pk)
+    agenda = get_object_or_404(Agenda.objects.para_detalhe(), pk=pk)
     
     if request.method == 'POST':
         titulo = agenda.titulo
@@ -709,26 +759,57 @@ def agenda_delete(request, pk):
 
 @login_required
 def agenda_calendario(request):
-    """Exibe calendário com todos os agendamentos"""
-    agendamentos = Agenda.objects.all().order_by('data_hora')
-    consultas = Consulta.objects.all().order_by('data_hora')
-    
+    """Exibe o calendário; os eventos são carregados de agenda_eventos conforme a navegação"""
     context = {
-        'agendamentos': agendamentos,
-        'consultas': consultas,
+        'veterinarios': Agenda.VETERINARIOS,
+        'tipos': Agenda.TIPO,
     }
     return render(request, 'core/agenda/calendario.html', context)
 
+# Maior intervalo aceito por agenda_eventos (a visão mensal mostra até 6 semanas)
+EVENTOS_JANELA_MAXIMA = timedelta(days=62)
+
+
+def _data_hora_parametro(valor):
+    """Converte ``start``/``end`` do FullCalendar (data ou data e hora ISO) em datetime com fuso"""
+    data_hora = parse_datetime(valor)
+    if data_hora is None:
+        data = parse_date(valor)
+        if data is None:
+            return None
+        data_hora = datetime.combine(data, datetime.min.time())
+    if timezone.is_naive(data_hora):
+        data_hora = timezone.make_aware(data_hora)
+    return data_hora
+
+@login_required
+@condicional(versao_por_geracao, por_usuario=False)
+def agenda_eventos(request):
+    """Eventos do calendário no intervalo ?start=&end=, com filtros ?veterinario= e ?tipo="""
+    try:
+        inicio = _data_hora_parametro(request.GET.get('start', ''))
+        fim = _data_hora_parametro(request.GET.get('end', ''))
+    except ValueError:
+        inicio = fim = None
+    if inicio is None or fim is None or not inicio < fim <= inicio + EVENTOS_JANELA_MAXIMA:
+        return JsonResponse({'erro': 'Informe start e end válidos (intervalo de até 62 dias).'}, status=400)
+
+    eventos = eventos_calendario(
+        inicio, fim, request.GET.get('veterinario', ''), request.GET.get('tipo', ''),
+    )
+    # Lista na raiz, como o FullCalendar espera
+    return JsonResponse(eventos, safe=False)
+
 @login_required
 def agenda_detalhe(request, pk):
-    agendamento = get_object_or_404(Agenda, pk=pk)
+    agendamento = get_object_or_404(Agenda.objects.para_detalhe(), pk=pk)
     return render(request, 'core/agenda/detalhe.html', {
         'agendamento': agendamento
     })
 
 @login_required
 def consulta_detalhe(request, pk):
-    consulta = get_object_or_404(Consulta, pk=pk)
+    consulta = get_object_or_404(Consulta.objects.para_listagem(), pk=pk)
     return render(request, 'core/consulta/detalhe.html', {
         'consulta': consulta
     })
@@ -736,7 +817,7 @@ def consulta_detalhe(request, pk):
 @login_required
 def agenda_concluir(request, pk):
     """Marca um agendamento como concluído e redireciona para a tela de consulta"""
-    agenda = get_object_or_404(Agenda, pk=pk)
+    agenda = get_object_or_404(Agenda.objects.para_detalhe(), pk=pk)
     
     if request.method == 'POST':
         agenda.concluido = True
@@ -761,7 +842,7 @@ def agenda_concluir(request, pk):
 @login_required
 def agenda_confirmar(request, pk):
     """Confirma um agendamento"""
-    agenda = get_object_or_404(Agenda, pk=pk)
+    agenda = get_object_or_404(Agenda.objects.para_detalhe(), pk=pk)
     
     if request.method == 'POST':
         agenda.status = 'CONFIRMADO'
@@ -774,7 +855,7 @@ def agenda_confirmar(request, pk):
 # Views para Prescrições
 @login_required
 def prescricao_list(request):
-    prescricoes = Prescricao.objects.all().order_by('-data_prescricao')
+    prescricoes = Prescricao.objects.para_listagem().order_by('-data_inicio')
     context = {
         'prescricoes': prescricoes,
     }
@@ -811,7 +892,7 @@ def prescricao_create(request):
 
 @login_required
 def prescricao_detail(request, pk):
-    prescricao = get_object_or_404(Prescricao, pk=pk)
+    prescricao = get_object_or_404(Prescricao.objects.para_detalhe(), pk=pk)
     context = {
         'prescricao': prescricao,
     }
@@ -819,7 +900,7 @@ def prescricao_detail(request, pk):
 
 @login_required
 def prescricao_update(request, pk):
-    prescricao = get_object_or_404(Prescricao, pk=pk)
+    prescricao = get_object_or_404(Prescricao.objects.para_detalhe(), pk=pk)
     if request.method == 'POST':
         form = PrescricaoForm(request.POST, instance=prescricao)
         if form.is_valid():
@@ -837,7 +918,7 @@ def prescricao_update(request, pk):
 
 @login_required
 def prescricao_delete(request, pk):
-    prescricao = get_object_or_404(Prescricao, pk=pk)
+    prescricao = get_object_or_404(Prescricao.objects.para_detalhe(), pk=pk)
     if request.method == 'POST':
         prescricao.delete()
         messages.success(request, 'Prescrição excluída com sucesso!')
@@ -857,13 +938,13 @@ class IndexView(TemplateView):
         context['total_donos'] = Dono.objects.count()
         context['total_consultas'] = Consulta.objects.count()
         context['total_agendamentos'] = Agenda.objects.count()
-        context['proximas_consultas'] = Consulta.objects.filter(
+        context['proximas_consultas'] = Consulta.objects.para_listagem().filter(
             data_hora__gte=timezone.now()
         ).order_by('data_hora')[:5]
-        context['proximos_agendamentos'] = Agenda.objects.filter(
+        context['proximos_agendamentos'] = Agenda.objects.para_listagem().filter(
             data_hora__gte=timezone.now()
         ).order_by('data_hora')[:5]
-        context['pets'] = Pet.objects.all().order_by('-id')[:3]
+        context['pets'] = Pet.objects.para_listagem().order_by('-id')[:3]
         context['donos'] = Dono.objects.all().order_by('-id')[:3]
         return context
 
@@ -970,76 +1051,19 @@ def validate_captcha(request, captcha_id, user_answer):
 
 def generate_captcha(request):
     """
-    Gera um novo captcha de imagem com caracteres distorcidos
+    Entrega um novo captcha de imagem com caracteres distorcidos, retirado
+    do estoque de captchas pré-gerados (core/captcha.py)
     """
-    from PIL import Image, ImageDraw, ImageFont
-    import string
-    import io
-    import base64
-    
-    # Gerar texto aleatório (6 caracteres)
-    characters = string.ascii_uppercase + string.digits
-    captcha_text = ''.join(random.choice(characters) for _ in range(6))
+    captcha_text, imagem = captcha.obter()
     
     # Gerar ID único para o captcha
-    captcha_id = f"captcha_{random.randint(1000, 9999)}"
-    
-    # Criar imagem do captcha
-    width, height = 200, 80
-    image = Image.new('RGB', (width, height), color='white')
-    draw = ImageDraw.Draw(image)
-    
-    # Adicionar ruído (pontos)
-    for _ in range(1000):
-        x = random.randint(0, width)
-        y = random.randint(0, height)
-        draw.point((x, y), fill='black')
-    
-    # Adicionar linhas distorcidas
-    for _ in range(5):
-        x1 = random.randint(0, width)
-        y1 = random.randint(0, height)
-        x2 = random.randint(0, width)
-        y2 = random.randint(0, height)
-        draw.line([(x1, y1), (x2, y2)], fill='black', width=2)
-    
-    # Adicionar texto distorcido
-    try:
-        # Tentar usar uma fonte do sistema
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 32)
-    except:
-        # Fallback para fonte padrão
-        font = ImageFont.load_default()
-    
-    # Calcular posição do texto
-    bbox = draw.textbbox((0, 0), captcha_text, font=font)
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
-    
-    x = (width - text_width) // 2
-    y = (height - text_height) // 2
-    
-    # Desenhar texto com distorção
-    for i, char in enumerate(captcha_text):
-        char_x = x + i * (text_width // len(captcha_text))
-        char_y = y + random.randint(-5, 5)
-        draw.text((char_x, char_y), char, fill='black', font=font)
-    
-    # Converter para base64
-    buffer = io.BytesIO()
-    image.save(buffer, format='PNG')
-    img_str = base64.b64encode(buffer.getvalue()).decode()
+    captcha_id = f"captcha_{secrets.token_hex(4)}"
     
     # Armazenar resposta na sessão
     request.session[f'captcha_{captcha_id}'] = captcha_text
     
     return JsonResponse({
         'captcha_id': captcha_id,
-        'image': f"data:image/png;base64,{img_str}",
-        'text': captcha_text  # Em produção, não enviar o texto
-    })
-    return JsonResponse({
-        'captcha_id': captcha_id,
-        'image': f"data:image/png;base64,{img_str}",
+        'image': imagem,
         'text': captcha_text  # Em produção, não enviar o texto
     })
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pet_vet_project.settings')
 
 application = get_asgi_application()
+
+# Fluxo de eventos ao vivo atendido antes do Django, sem prender uma thread
+# por conexão (core/ao_vivo.py)
+from core.ao_vivo import com_eventos_ao_vivo  # noqa: E402
+
+application = com_eventos_ao_vivo(application)
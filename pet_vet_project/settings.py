@@ -43,19 +43,100 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.OrcamentoConsultasMiddleware',
 ]
 
 # --- Configuração de Cache ---
+# L1 em memória em cada worker na frente de um L2 compartilhado (arquivo
+# SQLite, ou memcached com PETVET_MEMCACHED=host:porta). Ver core/cache_backends.py.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.CacheEmCamadas',
         'LOCATION': 'petvet-cache',
-    }
+        'OPTIONS': {
+            'L2': 'compartilhado',
+            'L1_MAX_ENTRADAS': 1000,
+            # Tempo máximo em que um worker pode ver um valor já alterado por outro
+            'L1_TIMEOUT': 5,
+            'NAMESPACES': {
+                # Contadores lidos a cada requisição precisam ser os do L2
+                'dashboard:geracao': {'l1_timeout': 0},
+                'dashboard:acertos': {'l1_timeout': 0},
+                'dashboard:falhas': {'l1_timeout': 0},
+                'fragmentos:versao:': {'l1_timeout': 0},
+                'dashboard:widget:': {'timeout': 300},
+                'busca:': {'timeout': 30},
+                'template.cache.': {'timeout': 600},
+            },
+        },
+    },
+    'compartilhado': (
+        {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['PETVET_MEMCACHED'],
+        } if os.environ.get('PETVET_MEMCACHED') else {
+            'BACKEND': 'core.cache_backends.CacheSQLite',
+            'LOCATION': os.environ.get('PETVET_CACHE_ARQUIVO', BASE_DIR / 'cache.sqlite3'),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    ),
 }
 
+# Os testes usam um cache em memória, sem tocar no L2 acima
+TEST_RUNNER = 'core.executor_testes.ExecutorTestes'
+
 # Tempo de vida do cache em segundos (30 segundos)
 CACHE_TTL = 30
 
+# Tempo máximo de vida dos resultados do dashboard em cache (segundos).
+# Alterações em Dono, Pet, Consulta e Agenda invalidam o cache imediatamente.
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# API assíncrona do dashboard (dashboard-api/async/): threads que calculam os
+# widgets em paralelo e prazo de cada widget em segundos. Os que passam do
+# prazo vêm como pendentes e terminam em segundo plano, indo para o cache.
+DASHBOARD_WIDGETS_THREADS = 4
+DASHBOARD_WIDGET_TIMEOUT = 5
+DASHBOARD_WIDGET_TIMEOUTS = {
+    'clientes_fidelizacao': 3,
+}
+
+# Fragmentos em cache da página inicial (core/fragmentos.py). As chaves
+# incluem a versão dos modelos exibidos, então edições aparecem na hora; as
+# listas de próximos eventos também mudam de chave a cada minuto.
+INDEX_FRAGMENTOS_TIMEOUT = 600
+
+# Dicas de cuidados (core/pet_tips.py): segundos de exibição de cada dica e
+# quantas dicas a API envia por lote ao navegador
+PET_TIPS_INTERVALO = 5
+PET_TIPS_LOTE = 12
+
+# Captchas do login (core/captcha.py): quantos ficam prontos em memória por
+# processo e quantos são gerados por segundo para repor o estoque
+CAPTCHA_POOL_TAMANHO = 50
+CAPTCHA_POOL_REPOSICAO = 20
+
+# Eventos ao vivo (core/ao_vivo.py, requer servidor ASGI): intervalo dos
+# comentários de keepalive (s), eventos pendentes por conexão antes de
+# encerrá-la e espera sugerida ao navegador para reconectar (ms)
+SSE_KEEPALIVE = 15
+SSE_FILA_MAXIMA = 100
+SSE_RECONEXAO_MS = 5000
+
+# Busca rápida da barra de navegação (core/busca.py): prazo por requisição
+# em milissegundos e tempo de vida das respostas em cache (segundos)
+BUSCA_RAPIDA_ORCAMENTO_MS = 150
+BUSCA_RAPIDA_CACHE_TIMEOUT = 30
+
+# Mínimo de consultas para classificar um cliente como de alto/médio valor
+DASHBOARD_CLIENTES_VALOR_LIMITES = {
+    'alto': 5,
+    'medio': 2,
+}
+
+# Limites (em anos) das faixas de idade do dashboard de saúde; a última é "N+"
+DASHBOARD_FAIXAS_IDADE = [0, 2, 4, 6, 8]
+
 # --- Configuração de URLs ---
 ROOT_URLCONF = 'pet_vet_project.urls'
 
@@ -139,6 +220,61 @@ MESSAGE_TAGS = {
     messages.ERROR: 'alert-danger',
 }
 
+# --- Orçamento de consultas SQL por view (core/middleware.py) ---
+# Limite de consultas por requisição, pelo nome da URL. Em DEBUG um excesso
+# nas URLs listadas abaixo levanta OrcamentoConsultasExcedido; fora dele, e
+# nas demais URLs (admin, terceiros, limitadas pelo padrão), é só registrado.
+ORCAMENTO_CONSULTAS = {
+    'core:index': 12,
+    'core:dashboard': 8,
+    'core:dono_list': 6,
+    'core:dono_detail': 6,
+    'core:pet_list': 6,
+    'core:pet_detail': 8,
+    'core:pet_historico': 8,
+    'core:consulta_list': 6,
+    'core:consulta_detail': 6,
+    'core:medicacao_list': 6,
+    'core:medicacao_detail': 6,
+    'core:agenda_list': 6,
+    'core:agenda_detail': 6,
+    'core:agenda_calendario': 6,
+    'core:agenda_eventos': 6,
+    'core:dashboard_api': 20,
+    'core:dashboard_api_async': 20,
+    'core:busca_rapida': 6,
+    'core:eventos_ao_vivo': 3,
+}
+ORCAMENTO_CONSULTAS_PADRAO = 50
+ORCAMENTO_CONSULTAS_ERRO = DEBUG
+
+# --- Logging ---
+# Os getters do dashboard registram tempo, consultas SQL e linhas em nível DEBUG
+# no logger 'core.dashboard'. Use DJANGO_LOG_LEVEL_CORE=DEBUG para exibi-los.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simples': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simples',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.environ.get('DJANGO_LOG_LEVEL_CORE', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # --- Configurações de Autenticação ---
 LOGIN_URL = 'login' # Nome da URL para a página de login
 LOGIN_REDIRECT_URL = 'core:index' # Nome da URL para redirecionar após login bem-sucedido
@@ -0,0 +1,112 @@
+// Busca rápida da barra de navegação: sugere donos, pets e próximos
+// agendamentos a cada tecla, usando /core/busca/
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('form.busca-rapida');
+    if (!form) {
+        return;
+    }
+
+    const input = form.querySelector('input[type="search"]');
+    const menu = form.querySelector('.dropdown-menu');
+    const MINIMO = 2;
+    const ATRASO = 80; // ms; agrupa teclas digitadas em sequência
+    const ROTULOS = {dono: 'Donos', pet: 'Pets', agendamento: 'Próximos agendamentos'};
+    const respostas = new Map(); // cache local por termo
+    let controlador = null;
+    let temporizador = null;
+
+    function fechar() {
+        menu.classList.remove('show');
+        menu.innerHTML = '';
+    }
+
+    function exibir(dados) {
+        menu.innerHTML = '';
+        if (!dados.resultados.length) {
+            const vazio = document.createElement('span');
+            vazio.className = 'dropdown-item-text text-muted';
+            vazio.textContent = 'Nenhum resultado';
+            menu.appendChild(vazio);
+        }
+        let tipoAtual = null;
+        dados.resultados.forEach(function(item) {
+            if (item.tipo !== tipoAtual) {
+                tipoAtual = item.tipo;
+                const cabecalho = document.createElement('h6');
+                cabecalho.className = 'dropdown-header';
+                cabecalho.textContent = ROTULOS[item.tipo] || item.tipo;
+                menu.appendChild(cabecalho);
+            }
+            const link = document.createElement('a');
+            link.className = 'dropdown-item';
+            link.href = item.url;
+            link.setAttribute('role', 'option');
+            link.textContent = item.titulo;
+            const detalhe = document.createElement('small');
+            detalhe.textContent = item.detalhe;
+            link.appendChild(detalhe);
+            menu.appendChild(link);
+        });
+        menu.classList.add('show');
+    }
+
+    function buscar(termo) {
+        if (respostas.has(termo)) {
+            exibir(respostas.get(termo));
+            return;
+        }
+        // Cancela a requisição da tecla anterior
+        if (controlador) {
+            controlador.abort();
+        }
+        controlador = new AbortController();
+        fetch(`${form.dataset.url}?q=${encodeURIComponent(termo)}`, {signal: controlador.signal})
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Erro HTTP: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(dados => {
+                if (dados.completo) {
+                    respostas.set(termo, dados);
+                }
+                if (input.value.trim() === termo) {
+                    exibir(dados);
+                }
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error('Erro na busca rápida:', error);
+                }
+            });
+    }
+
+    input.addEventListener('input', function() {
+        const termo = input.value.trim();
+        clearTimeout(temporizador);
+        if (termo.length < MINIMO) {
+            fechar();
+            return;
+        }
+        temporizador = setTimeout(() => buscar(termo), ATRASO);
+    });
+
+    input.addEventListener('keydown', function(event) {
+        if (event.key === 'Escape') {
+            fechar();
+        } else if (event.key === 'ArrowDown' && menu.classList.contains('show')) {
+            const primeiro = menu.querySelector('.dropdown-item');
+            if (primeiro) {
+                event.preventDefault();
+                primeiro.focus();
+            }
+        }
+    });
+
+    document.addEventListener('click', function(event) {
+        if (!form.contains(event.target)) {
+            fechar();
+        }
+    });
+});
@@ -1,71 +1,72 @@
 document.addEventListener('DOMContentLoaded', function() {
     const petTipElement = document.getElementById('pet-tip');
-    const UPDATE_INTERVAL = 5000; // 5 segundos em milissegundos
-    let tipInterval;
-    
-    // Função para buscar a próxima dica
-    function fetchNextTip() {
-        // Mostra o indicador de carregamento
-        petTipElement.innerHTML = '<i class="fas fa-spinner fa-spin" aria-hidden="true"></i> Carregando dica...';
-        
-        // Adiciona um timestamp para evitar cache do navegador
-        const timestamp = new Date().getTime();
-        
-        // Faz uma requisição para obter uma nova dica
-        fetch(`/api/pet-tip/?t=${timestamp}`, {
-            method: 'GET',
-            headers: {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
-        })
-        .then(response => {
-            if (!response.ok) {
-                throw new Error(`Erro HTTP: ${response.status}`);
-            }
-            return response.json();
-        })
-        .then(data => {
-            // Atualiza o texto da dica
-            if (data && data.tip && data.tip.trim() !== '') {
-                petTipElement.textContent = data.tip;
-                console.log('Nova dica carregada com sucesso');
-            } else {
-                throw new Error('Dica vazia ou formato inválido');
-            }
-        })
-        .catch(error => {
-            console.error('Erro ao carregar dica:', error);
-            // Usa uma dica padrão em caso de erro
-            const defaultTips = [
-                "A escovação diária dos dentes do seu pet pode prevenir doenças periodontais graves.",
-                "A vacinação anual é essencial para prevenir doenças como raiva e cinomose.",
-                "Mantenha sempre água limpa e fresca disponível para o seu pet.",
-                "A obesidade em pets pode reduzir significativamente a expectativa de vida.",
-                "Consulte regularmente um médico veterinário para check-ups preventivos."
-            ];
-            const randomIndex = Math.floor(Math.random() * defaultTips.length);
-            petTipElement.textContent = defaultTips[randomIndex];
-        });
+    if (!petTipElement) {
+        return;
+    }
+
+    // A API envia a dica atual e as próximas, com o início e o fim de cada
+    // período (timestamps em segundos). As dicas são trocadas localmente e
+    // um novo lote só é pedido quando o atual acaba; a resposta pode vir do
+    // cache do navegador, que a guarda até o fim do período atual.
+    let dicas = [];
+    let timer;
+
+    function mostrarDicaAtual() {
+        const agora = Date.now() / 1000;
+        dicas = dicas.filter(dica => dica.fim > agora);
+        if (!dicas.length) {
+            buscarLote();
+            return;
+        }
+        petTipElement.textContent = dicas[0].tip;
+        timer = setTimeout(mostrarDicaAtual, Math.max(0, (dicas[0].fim - agora) * 1000));
     }
-    
-    // Inicia a troca automática de dicas
-    function startTipRotation() {
-        // Busca a primeira dica imediatamente
-        fetchNextTip();
-        
-        // Configura o intervalo para trocar as dicas
-        tipInterval = setInterval(fetchNextTip, UPDATE_INTERVAL);
+
+    function buscarLote() {
+        fetch('/api/pet-tip/')
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Erro HTTP: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (!data || !Array.isArray(data.dicas) || !data.dicas.length) {
+                    throw new Error('Lote de dicas vazio ou formato inválido');
+                }
+                dicas = data.dicas;
+                if (dicas[dicas.length - 1].fim <= Date.now() / 1000) {
+                    // Relógio local adiantado em relação ao servidor: exibe a
+                    // dica recebida e espera um período antes de pedir outra
+                    petTipElement.textContent = dicas[0].tip;
+                    timer = setTimeout(buscarLote, data.intervalo * 1000);
+                    return;
+                }
+                mostrarDicaAtual();
+            })
+            .catch(error => {
+                // Mantém a dica exibida e tenta de novo mais tarde
+                console.error('Erro ao carregar dicas:', error);
+                timer = setTimeout(buscarLote, 30000);
+            });
     }
-    
-    // Inicia o carrossel de dicas
-    startTipRotation();
-    
-    // Limpa o intervalo quando a página for descarregada
+
+    // Com servidor ASGI as dicas chegam por server-sent events; sem ele
+    // (evento 'encerrado') ou sem suporte no navegador, usa os lotes
+    if (window.EventSource) {
+        const eventos = new EventSource('/core/eventos/?canais=dicas');
+        eventos.addEventListener('dica', function(evento) {
+            petTipElement.textContent = JSON.parse(evento.data).tip;
+        });
+        eventos.addEventListener('encerrado', function() {
+            eventos.close();
+            buscarLote();
+        });
+    } else {
+        buscarLote();
+    }
+
     window.addEventListener('beforeunload', function() {
-        if (tipInterval) {
-            clearInterval(tipInterval);
-        }
+        clearTimeout(timer);
     });
 });
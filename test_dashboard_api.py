@@ -37,9 +37,9 @@ def test_dashboard_apis():
     print("\n2️⃣ Testando get_consultas_periodo_data()...")
     try:
         data = get_consultas_periodo_data()
-        print(f"✅ Sucesso: {len(data['consultas_semana'])} dias, {len(data['datas_semana'])} datas")
-        print(f"   Consultas: {data['consultas_semana']}")
-        print(f"   Datas: {data['datas_semana']}")
+        print(f"✅ Sucesso: {len(data['consultas_periodo'])} dias, {len(data['datas_periodo'])} datas")
+        print(f"   Consultas: {data['consultas_periodo']}")
+        print(f"   Datas: {data['datas_periodo']}")
     except Exception as e:
         print(f"❌ Erro: {e}")
     